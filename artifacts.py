@@ -0,0 +1,170 @@
+# Artifacts - per-file listing and direct serving of a result folder's outputs
+# Each artifact is described with its type, size, source page and SHA-256 (also its ETag),
+# and can be fetched on its own, in byte ranges, without going through the results ZIP.
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+# Artifact types clients can filter on: type -> file suffixes
+ARTIFACT_TYPES = {
+    "markdown": {".md"},
+    "csv": {".csv"},
+    "html": {".html"},
+    "images": {".png", ".jpg", ".jpeg", ".webp"},
+    "json": {".json"},
+    "profile": {".prof"},
+}
+
+MEDIA_TYPES = {
+    ".md": "text/markdown; charset=utf-8",
+    ".csv": "text/csv; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".prof": "application/octet-stream",
+}
+
+# Per result folder: "<stem>-pages.json" maps each table / image artifact (name without the
+# stem and suffix, e.g. "table-2") to the PDF page it came from
+PAGE_INDEX_SUFFIX = "-pages.json"
+
+# Per result folder: "<stem>-images.json" lists each lazy image's page and bounding box
+IMAGE_MANIFEST_SUFFIX = "-images.json"
+
+# Bookkeeping written next to the artifacts, never listed, served or zipped as one
+SIDECAR_SUFFIXES = (PAGE_INDEX_SUFFIX, IMAGE_MANIFEST_SUFFIX)
+
+READ_CHUNK_SIZE = 256 * 1024
+
+def page_index_path(output_dir, doc_filename):
+    return Path(output_dir) / f"{doc_filename}{PAGE_INDEX_SUFFIX}"
+
+def write_page_index(output_dir, doc_filename, pages):
+    with page_index_path(output_dir, doc_filename).open("w", encoding="utf-8") as fp:
+        json.dump(pages, fp, indent=2)
+
+def _load_page_index(result_folder, stem):
+    try:
+        return json.loads(page_index_path(result_folder, stem).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def is_internal(relative_path):
+    """Whether a path inside a result folder is bookkeeping: a sidecar, or under a dot directory (checkpoints)"""
+    parts = Path(relative_path).parts
+    return any(part.startswith(".") for part in parts) or parts[-1].endswith(SIDECAR_SUFFIXES)
+
+def artifact_type(path):
+    suffix = Path(path).suffix.lower()
+    return next((name for name, suffixes in ARTIFACT_TYPES.items() if suffix in suffixes), None)
+
+# path -> (size, mtime_ns, sha256), so listing a result twice doesn't rehash every image
+_checksums = {}
+_checksums_lock = threading.Lock()
+
+def file_sha256(path):
+    """SHA-256 of a file, recomputed only when its size or mtime changes"""
+    path = Path(path)
+    stat = path.stat()
+    with _checksums_lock:
+        cached = _checksums.get(path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    sha256 = hashlib.sha256()
+    with path.open("rb") as fp:
+        while chunk := fp.read(READ_CHUNK_SIZE):
+            sha256.update(chunk)
+    with _checksums_lock:
+        _checksums[path] = (stat.st_size, stat.st_mtime_ns, sha256.hexdigest())
+    return sha256.hexdigest()
+
+def find_artifact(result_folder, name):
+    """The artifact file called `name` in result_folder, or None (never escapes the folder)"""
+    if not name or name != Path(name).name or is_internal(name) or artifact_type(name) is None:
+        return None
+    path = Path(result_folder) / name
+    return path if path.is_file() else None
+
+def list_artifacts(result_folder, stem, suffixes=None):
+    """
+    Describe every artifact in one result folder: name, type, media type, size, page and sha256.
+    `suffixes` limits the listing to those file suffixes (default: all artifact types).
+    """
+    result_folder = Path(result_folder)
+    pages = _load_page_index(result_folder, stem)
+
+    artifacts = []
+    for path in sorted(result_folder.iterdir()):
+        if find_artifact(result_folder, path.name) is None:
+            continue
+        if suffixes is not None and path.suffix.lower() not in suffixes:
+            continue
+
+        key = path.stem[len(stem) + 1:] if path.stem.startswith(f"{stem}-") else None
+        artifacts.append({
+            "name": path.name,
+            "type": artifact_type(path),
+            "media_type": MEDIA_TYPES[path.suffix.lower()],
+            "size": path.stat().st_size,
+            "page": pages.get(key),
+            "sha256": file_sha256(path),
+        })
+    return artifacts
+
+def result_files(result_folder, suffixes=None):
+    """
+    (path, relative path) of every file in a result folder, subfolders included, without the
+    internal bookkeeping. `suffixes` limits it to those file suffixes (default: all files).
+    """
+    result_folder = Path(result_folder)
+    for path in sorted(result_folder.rglob("*")):
+        relative = path.relative_to(result_folder)
+        if not path.is_file() or is_internal(relative):
+            continue
+        if suffixes is None or path.suffix.lower() in suffixes:
+            yield path, relative
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+def parse_range(header, size):
+    """
+    Parse a "bytes=start-end" Range header into an inclusive (start, end) pair for a file of
+    `size` bytes. Returns None when there's no usable single range (serve the whole file);
+    raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start:
+            start, end = int(start), (int(end) if end else size - 1)
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(end)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(f"bytes {start}-{end} outside of {size} bytes")
+    return start, min(end, size - 1)
+
+def iter_file(path, start=0, end=None, chunk_size=READ_CHUNK_SIZE):
+    """Yield bytes start..end (inclusive, default: to the end) of a file chunk by chunk"""
+    with open(path, "rb") as fp:
+        fp.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = fp.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
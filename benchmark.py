@@ -0,0 +1,882 @@
+# Benchmarks for the PDF processing pipeline
+#
+# Engine matrix - every PDF × OCR engine × force setting, in parallel isolated processes:
+#   python benchmark.py matrix /path/to/pdfs --parallel 4 --timeout 600 --output-dir bench/
+#   python benchmark.py matrix /path/to/pdfs --baseline bench/results.json   # flag regressions
+#
+# Page-range sharding - wall-clock scaling against shard count:
+#   python benchmark.py shards document.pdf --shards 1,2,4,8 --engine rapidocr
+#
+# Fast mode - text-layer-only throughput against the full docling pipeline:
+#   python benchmark.py fast /path/to/pdfs --engine rapidocr --repeat 3
+#
+# Scheduler - wait times per priority class while one client floods the queue with bulk work,
+# simulated on the real worker pool (fifo vs fair) or sent to a running server:
+#   python benchmark.py scheduler --workers 2
+#   python benchmark.py loadtest http://localhost:8000 --small small.pdf --large large.pdf
+#
+# Startup - import time of the processor and the API in fresh interpreters (docling must not
+# load at import), plus the time to a warm converter per engine:
+#   python benchmark.py imports --engines rapidocr,tesseract --repeat 5
+#
+# Memory - RSS / PSS of every server process with N uvicorn workers, each loading its own
+# models (thread mode) against one shared model server (server mode; Linux only):
+#   python benchmark.py memory --workers 4
+
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from pathlib import Path
+
+OCR_ENGINES = ["rapidocr", "tesseract", "easyocr", "ocrmac"]
+FORCE_SETTINGS = [True, False]
+
+def _print_table(rows, columns):
+    widths = [max(len(str(col)), *(len(str(row.get(col, ""))) for row in rows)) for col in columns]
+    print("  ".join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for row in rows:
+        print("  ".join(str(row.get(col, "")).ljust(width) for col, width in zip(columns, widths)))
+
+def _write_json(rows, output):
+    if output:
+        Path(output).write_text(json.dumps(rows, indent=2))
+        print(f"\n💾 Results written to {output}")
+
+# ================== ENGINE MATRIX ==================
+
+MATRIX_FIELDS = [
+    "pdf", "engine", "force_full_page_ocr", "status", "pages", "wall_seconds", "cpu_seconds",
+    "peak_rss_mb", "pages_per_second", "tables", "images", "error"
+]
+
+def engine_available(engine):
+    """(available, reason) for an OCR engine on this machine"""
+    if engine == "rapidocr":
+        ok = importlib.util.find_spec("rapidocr_onnxruntime") or importlib.util.find_spec("rapidocr")
+        return (bool(ok), None if ok else "rapidocr is not installed")
+    if engine == "easyocr":
+        ok = importlib.util.find_spec("easyocr")
+        return (bool(ok), None if ok else "easyocr is not installed")
+    if engine == "tesseract":
+        ok = shutil.which("tesseract") or importlib.util.find_spec("tesserocr")
+        return (bool(ok), None if ok else "tesseract binary not found")
+    if engine == "ocrmac":
+        if sys.platform != "darwin":
+            return (False, "ocrmac only runs on macOS")
+        ok = importlib.util.find_spec("ocrmac")
+        return (bool(ok), None if ok else "ocrmac is not installed")
+    return (False, f"unknown engine {engine}")
+
+def _peak_rss_mb(usage):
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _run_cell(conn, pdf_path, output_dir, engine, force_full_page_ocr, extract_tables, extract_images):
+    """Child process: one conversion, measured from the inside and reported through conn"""
+    import resource
+    from simple_pdf_processor import _process_pdf_with_engine
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        result = _process_pdf_with_engine(
+            Path(pdf_path), output_dir, engine, force_full_page_ocr, extract_tables, extract_images
+        )
+        report = {"status": "ok", "tables": result.get("tables", 0), "images": result.get("images", 0)}
+    except Exception as e:
+        report = {"status": "failed", "error": str(e)[:500]}
+
+    report["wall_seconds"] = round(time.perf_counter() - start_wall, 3)
+    report["cpu_seconds"] = round(time.process_time() - start_cpu, 3)
+    report["peak_rss_mb"] = _peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF))
+    conn.send(report)
+    conn.close()
+
+def run_benchmark_matrix(
+    pdf_paths,
+    output_root,
+    engines=OCR_ENGINES,
+    force_settings=FORCE_SETTINGS,
+    extract_tables=True,
+    extract_images=True,
+    parallel=None,
+    timeout=600,
+    on_result=None
+):
+    """
+    Run every PDF × engine × force setting in its own worker process, `parallel` at a time.
+    A cell that exceeds `timeout` seconds is killed (works for native OCR code too, unlike
+    SIGALRM). Engines missing on this platform are recorded as "skipped".
+    Returns one row per cell (see MATRIX_FIELDS).
+    """
+    from simple_pdf_processor import get_page_count, result_folder_name
+
+    parallel = max(1, int(parallel or (os.cpu_count() or 4) // 4))
+    output_root = Path(output_root)
+    rows = []
+    pending = []
+
+    for pdf_path in pdf_paths:
+        pdf_path = Path(pdf_path)
+        try:
+            pages = get_page_count(pdf_path)
+        except Exception:
+            pages = None
+        for engine in engines:
+            available, reason = engine_available(engine)
+            for force in force_settings:
+                row = {"pdf": pdf_path.name, "engine": engine, "force_full_page_ocr": force, "pages": pages}
+                if not available:
+                    row.update(status="skipped", error=reason)
+                    rows.append(row)
+                    if on_result:
+                        on_result(row)
+                    continue
+                output_dir = output_root / result_folder_name(pdf_path.stem, engine, force)
+                pending.append((row, pdf_path, output_dir))
+
+    ctx = multiprocessing.get_context("spawn")
+    running = []  # (process, conn, row, started_at)
+
+    while pending or running:
+        while pending and len(running) < parallel:
+            row, pdf_path, output_dir = pending.pop(0)
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_run_cell,
+                args=(child_conn, str(pdf_path), str(output_dir), row["engine"],
+                      row["force_full_page_ocr"], extract_tables, extract_images),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            running.append((process, parent_conn, row, time.perf_counter()))
+
+        still_running = []
+        for process, conn, row, started_at in running:
+            elapsed = time.perf_counter() - started_at
+            if conn.poll():
+                try:
+                    row.update(conn.recv())
+                except EOFError:
+                    row.update(status="failed", error="worker exited without a report")
+                process.join(5)
+            elif not process.is_alive():
+                row.update(status="failed", wall_seconds=round(elapsed, 3),
+                           error=f"worker crashed (exit code {process.exitcode})")
+            elif elapsed > timeout:
+                process.kill()
+                process.join(5)
+                row.update(status="timeout", wall_seconds=round(elapsed, 3),
+                           error=f"killed after {timeout}s")
+            else:
+                still_running.append((process, conn, row, started_at))
+                continue
+
+            conn.close()
+            if row.get("status") == "ok" and row.get("pages") and row.get("wall_seconds"):
+                row["pages_per_second"] = round(row["pages"] / row["wall_seconds"], 3)
+            rows.append(row)
+            if on_result:
+                on_result(row)
+
+        running = still_running
+        if running:
+            time.sleep(0.05)
+
+    rows.sort(key=lambda r: (r["pdf"], OCR_ENGINES.index(r["engine"]) if r["engine"] in OCR_ENGINES else 99,
+                             not r["force_full_page_ocr"]))
+    return rows
+
+def _print_matrix_row(row):
+    label = f"{row['pdf']} {row['engine']} force={row['force_full_page_ocr']}"
+    if row["status"] == "ok":
+        print(f"   ✅ {label}: {row['wall_seconds']}s wall, {row['cpu_seconds']}s CPU, {row['peak_rss_mb']} MB peak RSS")
+    elif row["status"] == "skipped":
+        print(f"   ⏭️  {label}: skipped ({row['error']})")
+    else:
+        print(f"   ❌ {label}: {row['status']} - {row.get('error', '')}")
+
+def write_matrix_results(rows, output_dir):
+    """Write results.json and results.csv; returns their paths"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    json_path = output_dir / "results.json"
+    csv_path = output_dir / "results.csv"
+
+    json_path.write_text(json.dumps(rows, indent=2))
+    with csv_path.open("w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=MATRIX_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return json_path, csv_path
+
+def compare_to_baseline(rows, baseline_rows, threshold=0.2):
+    """
+    Cells that got slower than baseline by more than `threshold` (0.2 = 20%), or that
+    passed in the baseline and don't pass now.
+    """
+    key = lambda r: (r["pdf"], r["engine"], bool(r["force_full_page_ocr"]))
+    baseline = {key(r): r for r in baseline_rows}
+    regressions = []
+
+    for row in rows:
+        before = baseline.get(key(row))
+        if before is None or before.get("status") != "ok":
+            continue
+        if row.get("status") != "ok":
+            if row.get("status") != "skipped":
+                regressions.append({**row, "baseline_status": "ok", "regression": f"status {row.get('status')}"})
+            continue
+        old, new = before.get("wall_seconds"), row.get("wall_seconds")
+        if old and new and new > old * (1 + threshold):
+            regressions.append({
+                **row,
+                "baseline_wall_seconds": old,
+                "regression": f"wall time {(new / old - 1) * 100:+.0f}% ({old}s -> {new}s)"
+            })
+    return regressions
+
+# ================== SHARD SCALING ==================
+
+def benchmark_shards(
+    pdf_path,
+    shard_counts=(1, 2, 4, 8),
+    ocr_engine="rapidocr",
+    force_full_page_ocr=True,
+    extract_tables=True,
+    extract_images=True,
+    repeat=1,
+    warmup=True
+):
+    """
+    Time one PDF at each shard count. With warmup=True every shard count gets one
+    untimed run first, so model loading in the shard workers isn't measured.
+    """
+    from simple_pdf_processor import _process_pdf_with_engine, get_page_count
+
+    pdf_path = Path(pdf_path)
+    page_count = get_page_count(pdf_path)
+    rows = []
+
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as output_dir:
+            run = lambda: _process_pdf_with_engine(
+                pdf_path, output_dir, ocr_engine, force_full_page_ocr,
+                extract_tables, extract_images, shards=shards
+            )
+            if warmup:
+                run()
+
+            timings = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                result = run()
+                timings.append(time.perf_counter() - start_time)
+
+        wall = statistics.median(timings)
+        rows.append({
+            "shards": shards,
+            "pages": page_count,
+            "wall_seconds": round(wall, 2),
+            "pages_per_second": round(page_count / wall, 2) if wall else None,
+            "tables": result.get("tables", 0),
+            "images": result.get("images", 0),
+        })
+
+    baseline = rows[0]["wall_seconds"] if rows else None
+    for row in rows:
+        speedup = baseline / row["wall_seconds"] if baseline and row["wall_seconds"] else None
+        row["speedup"] = round(speedup, 2) if speedup else None
+        row["efficiency"] = round(speedup / row["shards"], 2) if speedup else None
+
+    return rows
+
+# ================== FAST MODE ==================
+
+def _timed_runs(run, repeat, warmup):
+    if warmup:
+        run()
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings), result
+
+def _text_chars(result):
+    text_file = result.get("text_file")
+    return len(Path(text_file).read_text(encoding="utf-8")) if text_file else 0
+
+def benchmark_fast_mode(
+    pdf_paths,
+    ocr_engine="rapidocr",
+    force_full_page_ocr=True,
+    extract_tables=True,
+    extract_images=True,
+    repeat=1,
+    warmup=True
+):
+    """
+    Time each PDF through the full pipeline and through fast mode. With warmup=True each gets
+    one untimed run first, so model loading isn't measured. Rows note when fast mode fell back
+    to the full pipeline (its time then includes the text-layer check).
+    """
+    from simple_pdf_processor import _process_pdf_fast, _process_pdf_with_engine, get_page_count
+
+    rows = []
+    for pdf_path in map(Path, pdf_paths):
+        page_count = get_page_count(pdf_path)
+        with tempfile.TemporaryDirectory() as output_dir:
+            full_dir, fast_dir = Path(output_dir) / "full", Path(output_dir) / "fast"
+            full_dir.mkdir()
+            fast_dir.mkdir()
+            full_wall, full_result = _timed_runs(lambda: _process_pdf_with_engine(
+                pdf_path, full_dir, ocr_engine, force_full_page_ocr, extract_tables, extract_images
+            ), repeat, warmup)
+            fast_wall, fast_result = _timed_runs(lambda: _process_pdf_fast(
+                pdf_path, fast_dir, ocr_engine, force_full_page_ocr, extract_tables, extract_images
+            ), repeat, warmup)
+            full_chars, fast_chars = _text_chars(full_result), _text_chars(fast_result)
+
+        rows.append({
+            "pdf": pdf_path.name,
+            "pages": page_count,
+            "fast_mode": fast_result.get("mode"),
+            "full_seconds": round(full_wall, 3),
+            "fast_seconds": round(fast_wall, 3),
+            "full_pages_per_second": round(page_count / full_wall, 2) if full_wall else None,
+            "fast_pages_per_second": round(page_count / fast_wall, 2) if fast_wall else None,
+            "speedup": round(full_wall / fast_wall, 1) if fast_wall else None,
+            "full_chars": full_chars,
+            "fast_chars": fast_chars,
+        })
+    return rows
+
+# ================== SCHEDULER LOAD TEST ==================
+
+def _percentiles(values):
+    if not values:
+        return None, None
+    ordered = sorted(values)
+    pick = lambda fraction: round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+    return pick(0.5), pick(0.99)
+
+def simulate_scheduler(
+    policies=("fifo", "fair"),
+    workers=2,
+    bulk_jobs=40,
+    bulk_pages=100,
+    interactive_jobs=30,
+    interactive_pages=2,
+    interactive_interval=0.1,
+    seconds_per_cost=0.002
+):
+    """
+    Replay one flood on the real worker pool per scheduling policy: a bulk client queues
+    bulk_jobs large full-OCR documents at once, then interactive clients send small ones every
+    interactive_interval seconds. Conversions sleep for cost × seconds_per_cost.
+    Returns one row per policy and class with p50 / p99 wait for a worker.
+    """
+    from scheduler import FairQueue, classify, estimate_cost
+    from worker_pool import ConversionWorkerPool
+
+    options = {"force_full_page_ocr": True, "extract_tables": True}
+    bulk_cost = estimate_cost(bulk_pages, options)
+    interactive_cost = estimate_cost(interactive_pages, options)
+    rows = []
+
+    for policy in policies:
+        pool = ConversionWorkerPool(
+            mode="thread", max_workers=workers, max_queue=bulk_jobs + interactive_jobs,
+            scheduler=FairQueue(policy=policy)
+        )
+        futures = []
+        start_time = time.perf_counter()
+        for _ in range(bulk_jobs):
+            futures.append(pool.schedule(
+                time.sleep, (bulk_cost * seconds_per_cost,),
+                priority=classify("bulk", bulk_cost, 10), client="backfill", cost=bulk_cost
+            ))
+        for i in range(interactive_jobs):
+            time.sleep(interactive_interval)
+            futures.append(pool.schedule(
+                time.sleep, (interactive_cost * seconds_per_cost,),
+                priority=classify("auto", interactive_cost, 10), client=f"user-{i % 5}", cost=interactive_cost
+            ))
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start_time
+
+        for name, stats in pool.stats()["scheduler"]["classes"].items():
+            if stats["started"]:
+                rows.append({
+                    "policy": policy,
+                    "priority": name,
+                    "conversions": stats["started"],
+                    "wait_p50": stats["wait_seconds_p50"],
+                    "wait_p99": stats["wait_seconds_p99"],
+                    "total_seconds": round(elapsed, 2),
+                })
+        pool.shutdown()
+    return rows
+
+def _post(url, data=None, headers=None, timeout=3600):
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def _upload(base_url, pdf_path):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{Path(pdf_path).name}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + Path(pdf_path).read_bytes() + f"\r\n--{boundary}--\r\n".encode()
+    return _post(f"{base_url}/upload-pdf/", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})["file_id"]
+
+def run_load_test(base_url, small_pdf, large_pdf, flood_requests=20, interactive_requests=20, interval=1.0):
+    """
+    Against a running server: one client ("flood") sends flood_requests large documents at
+    once with priority=bulk, while interactive clients send the small one every `interval`
+    seconds. Each upload is converted once per request (profile=true bypasses the result
+    cache). Returns p50 / p99 end-to-end latency and 503 counts per client type.
+    """
+    base_url = base_url.rstrip("/")
+    small_id, large_id = _upload(base_url, small_pdf), _upload(base_url, large_pdf)
+    latencies = {"flood": [], "interactive": []}
+    rejected = {"flood": 0, "interactive": 0}
+    lock = threading.Lock()
+
+    def request(kind, file_id, client, priority):
+        query = urllib.parse.urlencode({"file_id": file_id, "priority": priority, "profile": "true"})
+        start_time = time.perf_counter()
+        try:
+            _post(f"{base_url}/process-pdf/?{query}", headers={"X-Client-ID": client})
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                with lock:
+                    rejected[kind] += 1
+                return
+            raise
+        with lock:
+            latencies[kind].append(time.perf_counter() - start_time)
+
+    threads = [
+        threading.Thread(target=request, args=("flood", large_id, "flood", "bulk"))
+        for _ in range(flood_requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for i in range(interactive_requests):
+        time.sleep(interval)
+        thread = threading.Thread(target=request, args=("interactive", small_id, f"user-{i % 5}", "auto"))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    rows = []
+    for kind in ("interactive", "flood"):
+        p50, p99 = _percentiles(latencies[kind])
+        rows.append({
+            "client": kind, "completed": len(latencies[kind]), "rejected_503": rejected[kind],
+            "latency_p50": p50, "latency_p99": p99,
+        })
+    return rows
+
+# ================== STARTUP ==================
+
+# Modules that must only load on first use (or warm-up), never on import
+HEAVY_MODULES = [
+    "docling", "docling_core", "torch", "transformers", "easyocr", "rapidocr_onnxruntime", "onnxruntime", "tesserocr"
+]
+
+_IMPORT_PROBE = """
+import json, resource, sys, time
+start_time = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - start_time
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+warm_seconds = None
+if {engine!r}:
+    import simple_pdf_processor
+    start_time = time.perf_counter()
+    with simple_pdf_processor.checkout_converter({engine!r}, True):
+        pass
+    warm_seconds = time.perf_counter() - start_time
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps({{"import_seconds": import_seconds, "warm_seconds": warm_seconds, "heavy": heavy, "rss_mb": round(rss_mb, 1)}}))
+"""
+
+def _probe_import(module, engine=None):
+    """Import module (then warm up engine) in a fresh interpreter; returns the probe's measurements"""
+    code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES, engine=engine)
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parent,
+        capture_output=True, text=True, timeout=900
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def benchmark_imports(modules=("simple_pdf_processor", "main"), engines=(), repeat=3):
+    """
+    Cold-start cost: median import time and RSS of each module in a fresh interpreter, which
+    heavy modules the import pulled in (should be none), and the time to a warm converter per
+    engine - what a worker pays before /health/ready turns green.
+    """
+    rows = []
+    for module in modules:
+        runs = [_probe_import(module) for _ in range(repeat)]
+        rows.append({
+            "module": module,
+            "engine": "",
+            "import_seconds": round(statistics.median(run["import_seconds"] for run in runs), 3),
+            "warm_seconds": "",
+            "rss_mb": runs[-1]["rss_mb"],
+            "heavy_modules": ",".join(runs[-1]["heavy"]) or "-",
+        })
+
+    for engine in engines:
+        available, reason = engine_available(engine)
+        if not available:
+            rows.append({"module": "simple_pdf_processor", "engine": engine, "heavy_modules": f"skipped: {reason}"})
+            continue
+        try:
+            run = _probe_import("simple_pdf_processor", engine)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            rows.append({"module": "simple_pdf_processor", "engine": engine, "heavy_modules": f"failed: {e}"})
+            continue
+        rows.append({
+            "module": "simple_pdf_processor",
+            "engine": engine,
+            "import_seconds": round(run["import_seconds"], 3),
+            "warm_seconds": round(run["warm_seconds"], 3),
+            "rss_mb": run["rss_mb"],
+            "heavy_modules": ",".join(run["heavy"]) or "-",
+        })
+    return rows
+
+# ================== MEMORY ==================
+
+def _process_memory_mb(pid):
+    """(rss_mb, pss_mb) of a process; PSS splits shared pages between the processes mapping them"""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        name, _, rest = line.partition(":")
+        if name in ("Rss", "Pss"):
+            values[name] = int(rest.split()[0]) / 1024
+    return round(values.get("Rss", 0.0), 1), round(values.get("Pss", 0.0), 1)
+
+def _child_pids():
+    """parent pid -> child pids, for every process on the machine"""
+    children = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    return children
+
+def _process_tree(pid, role, children, child_role):
+    """[(role, pid)] for pid and all of its descendants"""
+    tree = [(role, pid)]
+    for child in children.get(pid, []):
+        tree.extend(_process_tree(child, child_role, children, "helper"))
+    return tree
+
+def _wait_ready(base_url, workers, timeout):
+    """Until /health/ready answers 200 several times in a row (each uvicorn worker has its own)"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 3:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{base_url} not ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health/ready", timeout=5):
+                streak += 1
+            continue
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+        time.sleep(0.5)
+
+def measure_server_memory(modes=("thread", "server"), workers=4, port=8765, warmup="rapidocr:true:true:true", timeout=600):
+    """
+    Start the API with `workers` uvicorn workers in each worker mode, wait until every worker is
+    ready (models loaded), and read RSS and PSS of every process in the tree. In server mode
+    the model server is started first and counted too. Returns one row per process plus a
+    "total" row per mode - total PSS is the real footprint of the deployment.
+    """
+    root = Path(__file__).parent
+    rows = []
+    for mode in modes:
+        env = {**os.environ, "PDF_WORKER_MODE": mode, "PDF_CONVERTER_WARMUP": warmup}
+        servers = []
+        with tempfile.TemporaryDirectory() as socket_dir:
+            try:
+                if mode == "server":
+                    env["PDF_MODEL_SERVER"] = str(Path(socket_dir) / "models.sock")
+                    env["PDF_MODEL_SERVER_AUTHKEY"] = secrets.token_hex(32)
+                    servers.append(("model_server", subprocess.Popen(
+                        [sys.executable, "model_server.py", "--workers", str(workers)], cwd=root, env=env
+                    )))
+                servers.append(("uvicorn", subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers)],
+                    cwd=root, env=env
+                )))
+                _wait_ready(f"http://127.0.0.1:{port}", workers, timeout)
+                time.sleep(2)
+                
+                children = _child_pids()
+                processes = []
+                for role, server in servers:
+                    processes.extend(_process_tree(
+                        server.pid, role, children, "api_worker" if role == "uvicorn" else "helper"
+                    ))
+                mode_rows = []
+                for role, pid in processes:
+                    try:
+                        rss_mb, pss_mb = _process_memory_mb(pid)
+                    except OSError:
+                        continue
+                    mode_rows.append({"mode": mode, "role": role, "pid": pid, "rss_mb": rss_mb, "pss_mb": pss_mb})
+                rows.extend(mode_rows)
+                rows.append({
+                    "mode": mode,
+                    "role": "total",
+                    "pid": f"{len(mode_rows)} procs",
+                    "rss_mb": round(sum(row["rss_mb"] for row in mode_rows), 1),
+                    "pss_mb": round(sum(row["pss_mb"] for row in mode_rows), 1),
+                })
+            finally:
+                for _role, server in reversed(servers):
+                    server.terminate()
+                    try:
+                        server.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF processing benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    shards_parser = subparsers.add_parser("shards", help="Wall-clock scaling against page-range shard count")
+    shards_parser.add_argument("pdf", help="PDF to convert")
+    shards_parser.add_argument("--shards", default="1,2,4,8", help="Comma-separated shard counts (default: 1,2,4,8)")
+    shards_parser.add_argument("--engine", default="rapidocr", choices=["rapidocr", "tesseract", "easyocr", "ocrmac"])
+    shards_parser.add_argument("--no-force-ocr", action="store_true", help="Use force_full_page_ocr=False")
+    shards_parser.add_argument("--no-tables", action="store_true", help="Skip table extraction")
+    shards_parser.add_argument("--no-images", action="store_true", help="Skip image extraction")
+    shards_parser.add_argument("--repeat", type=int, default=1, help="Timed runs per shard count (median is reported)")
+    shards_parser.add_argument("--no-warmup", action="store_true", help="Include model loading in the timings")
+    shards_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    fast_parser = subparsers.add_parser("fast", help="Fast (text layer) mode against the full pipeline")
+    fast_parser.add_argument("folder", help="Folder with the PDFs to convert")
+    fast_parser.add_argument("--engine", default="rapidocr", choices=OCR_ENGINES)
+    fast_parser.add_argument("--no-force-ocr", action="store_true", help="Full pipeline with force_full_page_ocr=False")
+    fast_parser.add_argument("--no-tables", action="store_true", help="Full pipeline without table extraction")
+    fast_parser.add_argument("--no-images", action="store_true", help="Full pipeline without image extraction")
+    fast_parser.add_argument("--repeat", type=int, default=1, help="Timed runs per PDF and mode (median is reported)")
+    fast_parser.add_argument("--no-warmup", action="store_true", help="Include model loading in the timings")
+    fast_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Simulated flood on the worker pool: fifo vs fair scheduling")
+    scheduler_parser.add_argument("--workers", type=int, default=2, help="Worker threads")
+    scheduler_parser.add_argument("--bulk-jobs", type=int, default=40, help="Large documents the flooding client queues at once")
+    scheduler_parser.add_argument("--bulk-pages", type=int, default=100, help="Pages per large document")
+    scheduler_parser.add_argument("--interactive-jobs", type=int, default=30, help="Small documents sent by interactive clients")
+    scheduler_parser.add_argument("--interval", type=float, default=0.1, help="Seconds between interactive requests")
+    scheduler_parser.add_argument("--seconds-per-cost", type=float, default=0.002, help="Simulated seconds per unit of cost (one full-OCR page)")
+    scheduler_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    loadtest_parser = subparsers.add_parser("loadtest", help="Flood a running server and measure interactive tail latency")
+    loadtest_parser.add_argument("url", help="Server base URL, e.g. http://localhost:8000")
+    loadtest_parser.add_argument("--small", required=True, help="Small PDF sent by interactive clients")
+    loadtest_parser.add_argument("--large", required=True, help="Large PDF sent by the flooding client")
+    loadtest_parser.add_argument("--flood", type=int, default=20, help="Large-document requests sent at once")
+    loadtest_parser.add_argument("--interactive", type=int, default=20, help="Small-document requests")
+    loadtest_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between small-document requests")
+    loadtest_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    imports_parser = subparsers.add_parser("imports", help="Import time and memory in a fresh interpreter, time to a warm converter")
+    imports_parser.add_argument("--modules", default="simple_pdf_processor,main", help="Comma-separated modules to import")
+    imports_parser.add_argument("--engines", default="", help="Comma-separated OCR engines to time a warm converter for")
+    imports_parser.add_argument("--repeat", type=int, default=3, help="Imports per module (median is reported)")
+    imports_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    memory_parser = subparsers.add_parser("memory", help="RSS / PSS per process: per-worker models vs one model server")
+    memory_parser.add_argument("--workers", type=int, default=4, help="uvicorn workers")
+    memory_parser.add_argument("--modes", default="thread,server", help="Comma-separated PDF_WORKER_MODE values to compare")
+    memory_parser.add_argument("--warmup", default="rapidocr:true:true:true", help="PDF_CONVERTER_WARMUP for the servers")
+    memory_parser.add_argument("--port", type=int, default=8765, help="Port to start the servers on")
+    memory_parser.add_argument("--timeout", type=int, default=600, help="Seconds to wait for all workers to be ready")
+    memory_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    matrix_parser = subparsers.add_parser("matrix", help="PDFs × OCR engines × force settings in parallel")
+    matrix_parser.add_argument("folder", help="Folder with the PDFs to convert")
+    matrix_parser.add_argument("--engines", default=",".join(OCR_ENGINES), help="Comma-separated OCR engines")
+    matrix_parser.add_argument("--force", default="true,false", help="Force settings to run (default: true,false)")
+    matrix_parser.add_argument("--no-tables", action="store_true", help="Skip table extraction")
+    matrix_parser.add_argument("--no-images", action="store_true", help="Skip image extraction")
+    matrix_parser.add_argument("--parallel", type=int, help="Cells running at once (default: CPU count / 4)")
+    matrix_parser.add_argument("--timeout", type=int, default=600, help="Hard per-run timeout in seconds")
+    matrix_parser.add_argument("--output-dir", default="benchmark_results", help="Where converted outputs and results.json/csv go")
+    matrix_parser.add_argument("--baseline", help="results.json from an earlier run to compare against")
+    matrix_parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown that counts as a regression (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "matrix":
+        pdf_paths = sorted(Path(args.folder).glob("*.pdf"))
+        if not pdf_paths:
+            print(f"❌ No PDF files found in: {args.folder}")
+            return 1
+
+        print(f"🚀 Benchmarking {len(pdf_paths)} PDFs, engines={args.engines}, force={args.force}")
+        rows = run_benchmark_matrix(
+            pdf_paths,
+            args.output_dir,
+            engines=[e.strip() for e in args.engines.split(",") if e.strip()],
+            force_settings=[f.strip().lower() == "true" for f in args.force.split(",") if f.strip()],
+            extract_tables=not args.no_tables,
+            extract_images=not args.no_images,
+            parallel=args.parallel,
+            timeout=args.timeout,
+            on_result=_print_matrix_row
+        )
+
+        print("\n📊 ENGINE MATRIX")
+        _print_table(rows, ["pdf", "engine", "force_full_page_ocr", "status", "wall_seconds",
+                            "cpu_seconds", "peak_rss_mb", "pages_per_second"])
+        json_path, csv_path = write_matrix_results(rows, args.output_dir)
+        print(f"\n💾 Results written to {json_path} and {csv_path}")
+
+        if args.baseline:
+            regressions = compare_to_baseline(rows, json.loads(Path(args.baseline).read_text()), args.threshold)
+            if regressions:
+                print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+                for row in regressions:
+                    print(f"   {row['pdf']} {row['engine']} force={row['force_full_page_ocr']}: {row['regression']}")
+                return 1
+            print(f"\n✅ No regressions against {args.baseline}")
+        return 0
+
+    if args.command == "shards":
+        rows = benchmark_shards(
+            args.pdf,
+            shard_counts=[int(n) for n in args.shards.split(",") if n.strip()],
+            ocr_engine=args.engine,
+            force_full_page_ocr=not args.no_force_ocr,
+            extract_tables=not args.no_tables,
+            extract_images=not args.no_images,
+            repeat=args.repeat,
+            warmup=not args.no_warmup
+        )
+        print(f"\n📊 SHARD SCALING: {args.pdf} ({args.engine})")
+        _print_table(rows, ["shards", "pages", "wall_seconds", "pages_per_second", "speedup", "efficiency"])
+        _write_json(rows, args.output)
+
+    if args.command == "scheduler":
+        rows = simulate_scheduler(
+            workers=args.workers,
+            bulk_jobs=args.bulk_jobs,
+            bulk_pages=args.bulk_pages,
+            interactive_jobs=args.interactive_jobs,
+            interactive_pages=2,
+            interactive_interval=args.interval,
+            seconds_per_cost=args.seconds_per_cost
+        )
+        print("\n📊 SCHEDULER: wait for a worker while one client floods the queue")
+        _print_table(rows, ["policy", "priority", "conversions", "wait_p50", "wait_p99", "total_seconds"])
+        _write_json(rows, args.output)
+
+    if args.command == "loadtest":
+        print(f"🚀 Load test against {args.url}: {args.flood} bulk requests, {args.interactive} interactive")
+        rows = run_load_test(
+            args.url, args.small, args.large,
+            flood_requests=args.flood, interactive_requests=args.interactive, interval=args.interval
+        )
+        print("\n📊 END-TO-END LATENCY (run once with PDF_SCHEDULER_POLICY=fifo and once with fair to compare)")
+        _print_table(rows, ["client", "completed", "rejected_503", "latency_p50", "latency_p99"])
+        _write_json(rows, args.output)
+
+    if args.command == "imports":
+        rows = benchmark_imports(
+            modules=[m.strip() for m in args.modules.split(",") if m.strip()],
+            engines=[e.strip() for e in args.engines.split(",") if e.strip()],
+            repeat=args.repeat
+        )
+        print("\n📊 STARTUP: import in a fresh interpreter, then time to a warm converter")
+        _print_table(rows, ["module", "engine", "import_seconds", "warm_seconds", "rss_mb", "heavy_modules"])
+        _write_json(rows, args.output)
+        if any(row["heavy_modules"] not in ("-", "") and not row["engine"] for row in rows):
+            print("\n❌ Heavy modules loaded at import time")
+            return 1
+
+    if args.command == "memory":
+        if not Path("/proc/self/smaps_rollup").exists():
+            print("❌ Memory measurement needs Linux /proc/<pid>/smaps_rollup")
+            return 1
+        rows = measure_server_memory(
+            modes=[m.strip() for m in args.modes.split(",") if m.strip()],
+            workers=args.workers,
+            port=args.port,
+            warmup=args.warmup,
+            timeout=args.timeout
+        )
+        print(f"\n📊 MEMORY: {args.workers} uvicorn workers, models {args.warmup}")
+        _print_table(rows, ["mode", "role", "pid", "rss_mb", "pss_mb"])
+        totals = {row["mode"]: row["pss_mb"] for row in rows if row["role"] == "total"}
+        if len(totals) > 1:
+            print("\nTotal PSS: " + ", ".join(f"{mode} {pss:.0f} MB" for mode, pss in totals.items()))
+        _write_json(rows, args.output)
+
+    if args.command == "fast":
+        pdf_paths = sorted(Path(args.folder).glob("*.pdf"))
+        if not pdf_paths:
+            print(f"❌ No PDF files found in: {args.folder}")
+            return 1
+
+        rows = benchmark_fast_mode(
+            pdf_paths,
+            ocr_engine=args.engine,
+            force_full_page_ocr=not args.no_force_ocr,
+            extract_tables=not args.no_tables,
+            extract_images=not args.no_images,
+            repeat=args.repeat,
+            warmup=not args.no_warmup
+        )
+        print(f"\n📊 FAST MODE vs FULL PIPELINE ({args.engine})")
+        _print_table(rows, ["pdf", "pages", "fast_mode", "full_seconds", "fast_seconds",
+                            "full_pages_per_second", "fast_pages_per_second", "speedup"])
+        full_total = sum(row["full_seconds"] for row in rows)
+        fast_total = sum(row["fast_seconds"] for row in rows)
+        pages_total = sum(row["pages"] for row in rows)
+        if full_total and fast_total:
+            print(f"\nTotal: {pages_total / full_total:.2f} → {pages_total / fast_total:.2f} pages/s "
+                  f"({full_total / fast_total:.1f}x), "
+                  f"{sum(1 for row in rows if row['fast_mode'] != 'fast')} fallback(s)")
+        _write_json(rows, args.output)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# Converter Pool - keeps docling DocumentConverter instances warm between requests
+# Building a converter loads layout, TableFormer and OCR models, so we build one per
+# pipeline configuration and reuse it until it gets evicted (LRU under a memory budget).
+# A converter is checked out by one conversion at a time: OCR engines such as tesserocr
+# keep per-call state and are not safe to share between threads.
+
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from metrics import record_stage
+
+# One converter per unique pipeline configuration
+ConverterKey = namedtuple(
+    "ConverterKey",
+    ["ocr_engine", "force_full_page_ocr", "extract_tables", "extract_images", "images_scale"],
+    defaults=[2.0]
+)
+
+def parse_converter_keys(spec):
+    """
+    Parse a warm-up spec like "rapidocr:true:true:true,tesseract:false:true:false:1.0"
+    into ConverterKeys. Missing fields fall back to the API defaults (True, images_scale 2.0).
+    """
+    keys = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [p.strip() for p in item.split(":")]
+        flags = [p.lower() in ("1", "true", "yes", "on") for p in parts[1:4]]
+        flags += [True] * (3 - len(flags))
+        images_scale = float(parts[4]) if len(parts) > 4 and parts[4] else 2.0
+        keys.append(ConverterKey(parts[0], *flags, images_scale if flags[2] else 2.0))
+    return keys
+
+def _current_rss_bytes():
+    """Resident set size of this process (Linux /proc, falls back to peak RSS elsewhere)"""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, AttributeError, OSError):
+        return 0
+
+class _PoolEntry:
+    """The converters built for one key; idle ones are free to check out"""
+
+    def __init__(self):
+        self.converters = []
+        self.idle = []
+        self.memory_bytes = 0
+        self.load_seconds = 0.0
+        self.last_used = time.time()
+        self.uses = 0
+
+    @property
+    def busy(self):
+        return len(self.idle) < len(self.converters)
+
+class ConverterPool:
+    """
+    Process-wide LRU pool of DocumentConverters keyed on ConverterKey.
+
+    Args:
+        factory: Callable(key) -> converter with its models already loaded
+        max_entries: Hard cap on the number of cached configurations
+        memory_budget_mb: Evict least-recently-used configurations once the summed
+            load-time RSS growth exceeds this budget (0 = no memory budget)
+        instances_per_key: Converters built for one configuration, so that many conversions
+            with the same settings can run at once; further callers wait for one to be returned
+    """
+
+    def __init__(self, factory, max_entries=4, memory_budget_mb=0, instances_per_key=1):
+        self.factory = factory
+        self.max_entries = max(1, int(max_entries))
+        self.memory_budget_bytes = int(memory_budget_mb) * 1024 * 1024
+        self.instances_per_key = max(1, int(instances_per_key))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+        self._loading = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_count = 0
+        self.load_seconds_total = 0.0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+
+    @contextmanager
+    def checkout(self, key):
+        """Use a warm converter for key exclusively for the duration of the block"""
+        key = ConverterKey(*key)
+        converter = self._acquire(key)
+        try:
+            yield converter
+        finally:
+            self._release(key, converter)
+
+    def _acquire(self, key):
+        waited = False
+        with self._lock:
+            while True:
+                entry = self._entries.get(key)
+                if entry is not None and entry.idle:
+                    self._entries.move_to_end(key)
+                    entry.last_used = time.time()
+                    entry.uses += 1
+                    self.hits += 1
+                    return entry.idle.pop()
+                # Only one thread loads a given configuration at a time; the others wait
+                if key not in self._loading and (
+                    entry is None or len(entry.converters) < self.instances_per_key
+                ):
+                    self._loading.add(key)
+                    self.misses += 1
+                    break
+                # Every instance is checked out: reported as the converter_wait stage, not as work
+                wait_start = time.perf_counter()
+                with record_stage("converter_wait"):
+                    self._returned.wait()
+                self.waits += not waited
+                waited = True
+                self.wait_seconds_total += time.perf_counter() - wait_start
+
+        try:
+            rss_before = _current_rss_bytes()
+            start_time = time.time()
+            converter = self.factory(key)
+            load_seconds = time.time() - start_time
+            memory_bytes = max(0, _current_rss_bytes() - rss_before)
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _PoolEntry()
+                self._entries.move_to_end(key)
+                entry.converters.append(converter)
+                entry.memory_bytes += memory_bytes
+                entry.load_seconds += load_seconds
+                entry.last_used = time.time()
+                entry.uses += 1
+                self.load_count += 1
+                self.load_seconds_total += load_seconds
+                self._evict_locked()
+            return converter
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+                self._returned.notify_all()
+
+    def _release(self, key, converter):
+        with self._lock:
+            entry = self._entries.get(key)
+            # Cleared while checked out: let the converter go
+            if entry is not None and any(c is converter for c in entry.converters):
+                entry.idle.append(converter)
+                self._evict_locked()
+            self._returned.notify_all()
+
+    def warm_up(self, keys):
+        """Load converters for the given keys ahead of the first request"""
+        loaded = []
+        for key in keys:
+            with self.checkout(key):
+                pass
+            loaded.append(ConverterKey(*key))
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._returned.notify_all()
+
+    def _evict_locked(self):
+        # Never evict the most recently used entry - it's the one just requested - nor
+        # one with a converter checked out; those go once they are returned
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.memory_budget_bytes and self._memory_bytes_locked() > self.memory_budget_bytes)
+        ):
+            victim = next(
+                (key for key in list(self._entries)[:-1] if not self._entries[key].busy), None
+            )
+            if victim is None:
+                break
+            del self._entries[victim]
+            self.evictions += 1
+
+    def _memory_bytes_locked(self):
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "instances_per_key": self.instances_per_key,
+                "memory_budget_mb": self.memory_budget_bytes // (1024 * 1024),
+                "memory_mb": round(self._memory_bytes_locked() / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "loads": self.load_count,
+                "load_seconds_total": round(self.load_seconds_total, 3),
+                "load_seconds_avg": round(self.load_seconds_total / self.load_count, 3) if self.load_count else 0.0,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "keys": [
+                    {
+                        **key._asdict(),
+                        "instances": len(entry.converters),
+                        "in_use": len(entry.converters) - len(entry.idle),
+                        "uses": entry.uses,
+                        "load_seconds": round(entry.load_seconds, 3),
+                        "memory_mb": round(entry.memory_bytes / (1024 * 1024), 1),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
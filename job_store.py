@@ -0,0 +1,295 @@
+# Job Store - persistent state for asynchronous /jobs/ conversions
+# Jobs live in a small SQLite database next to the uploads, so queued and finished jobs
+# survive an API restart. Every call opens its own connection, which keeps JobStore
+# picklable and safe to use from worker threads and worker processes alike.
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from simple_pdf_processor import process_single_pdf, summarize_result, ConversionCancelled, PROCESSING_STAGES
+from structured_logging import log_context
+
+JOB_STATUSES = ["queued", "running", "done", "failed", "cancelled"]
+
+# Running jobs record the process running them ("host:pid:start") and beat every
+# heartbeat_interval seconds, so a restarting API worker only requeues jobs whose process is
+# gone - not the ones its sibling workers are still running
+def _process_start(pid):
+    """Start time of pid in clock ticks since boot (Linux), so a reused pid isn't mistaken for it"""
+    try:
+        with open(f"/proc/{pid}/stat") as fp:
+            # Fields after the parenthesised command name; starttime is field 22 overall
+            return fp.read().rpartition(")")[2].split()[19]
+    except (OSError, IndexError):
+        return None
+
+_START = _process_start(os.getpid()) or uuid.uuid4().hex[:8]
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{_START}"
+
+def _owner_state(owner):
+    """"alive" or "gone" for an owner process on this host, None when we can't tell (another host)"""
+    host, _, rest = (owner or "").partition(":")
+    pid, _, start = rest.partition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return "gone"
+    except PermissionError:
+        pass
+    current_start = _process_start(pid)
+    if current_start is not None and start.isdigit() and current_start != start:
+        return "gone"  # the pid now belongs to another process
+    return "alive"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL,
+    scheduling TEXT,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+class JobStore:
+    """SQLite-backed job table: status, per-stage progress, results and cancel flags"""
+
+    def __init__(self, db_path, heartbeat_interval=10.0):
+        self.db_path = str(db_path)
+        self.heartbeat_interval = heartbeat_interval
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before jobs carried their priority / client
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "scheduling" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN scheduling TEXT")
+            # ... and before running jobs recorded their owner and heartbeat
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, file_id, options, status="queued", scheduling=None):
+        """scheduling: priority / client / cost the job is queued with on the worker pool"""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        stages = {stage: "pending" for stage in PROCESSING_STAGES}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, file_id, status, options, stages, created_at, updated_at, scheduling) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, file_id, status, json.dumps(options), json.dumps(stages), now, now,
+                 json.dumps(scheduling) if scheduling else None)
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_by_status(self, *statuses):
+        placeholders = ",".join("?" * len(statuses))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                statuses
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def mark_running(self, job_id):
+        """Claim a queued job for this process; returns False if it was cancelled or already claimed"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, updated_at = ?, owner = ?, heartbeat_at = ? "
+                "WHERE job_id = ? AND status = 'queued' AND cancel_requested = 0",
+                (now, now, _owner(), now, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running' AND owner = ?",
+                (time.time(), job_id, _owner())
+            )
+
+    @contextmanager
+    def keep_alive(self, job_id):
+        """Beat for job_id from a background thread while the block runs"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    self.heartbeat(job_id)
+                except sqlite3.Error:
+                    pass  # a missed beat only matters if they keep failing
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def set_stage(self, job_id, stage, state):
+        with self._connect() as conn:
+            row = conn.execute("SELECT stages FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            stages = json.loads(row["stages"])
+            stages[stage] = state
+            conn.execute(
+                "UPDATE jobs SET stages = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(stages), time.time(), job_id)
+            )
+
+    def finish(self, job_id, status, result=None, error=None, stage_state=None):
+        """Record a job's outcome; stage_state (e.g. "cached") overrides every stage's state"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now, job_id)
+            )
+            if stage_state is not None:
+                stages = {stage: stage_state for stage in PROCESSING_STAGES}
+                conn.execute("UPDATE jobs SET stages = ? WHERE job_id = ?", (json.dumps(stages), job_id))
+
+    def request_cancel(self, job_id):
+        """
+        Flag a job for cancellation. Queued jobs are cancelled right away; running jobs
+        stop at their next stage boundary. Returns the job's status afterwards.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? "
+                "WHERE job_id = ? AND status IN ('queued', 'running')",
+                (now, job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (now, now, job_id)
+            )
+        job = self.get(job_id)
+        return job["status"] if job else None
+
+    def is_cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_interrupted(self, stale_after=60.0):
+        """
+        Running jobs go back to the queue when their process is gone (owner on this host), or
+        when their heartbeat is older than stale_after seconds and the owner runs on another
+        host. A live process on this host keeps its job, however late its heartbeat - a second
+        run would write into the same result folder. Returns how many were requeued.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id, owner, heartbeat_at FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            requeued = 0
+            for row in rows:
+                state = _owner_state(row["owner"])
+                stale = row["heartbeat_at"] is None or now - row["heartbeat_at"] > stale_after
+                if state == "alive" or (state is None and not stale):
+                    continue
+                # Matching owner and heartbeat: skip the job if it was claimed or beat meanwhile
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, heartbeat_at = NULL, updated_at = ? "
+                    "WHERE job_id = ? AND status = 'running' AND owner IS ? AND heartbeat_at IS ?",
+                    (now, row["job_id"], row["owner"], row["heartbeat_at"])
+                )
+                requeued += cursor.rowcount
+        return requeued
+
+    def _row_to_dict(self, row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["scheduling"] = json.loads(job["scheduling"]) if job.get("scheduling") else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+class JobProgress:
+    """Picklable progress/cancel hooks handed to process_single_pdf for one job"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def __call__(self, stage, state):
+        self.store.set_stage(self.job_id, stage, state)
+
+    def cancel_requested(self):
+        return self.store.is_cancel_requested(self.job_id)
+
+def run_job(store, job_id, pdf_filename, folder_path, options):
+    """
+    Worker-side job entry point: runs process_single_pdf and records the outcome.
+    Top-level so it can be shipped to process pool workers.
+    """
+    if not store.mark_running(job_id):
+        return store.get(job_id)
+
+    progress = JobProgress(store, job_id)
+    # Records logged while the job runs carry its job_id and file_id
+    with log_context(job_id=job_id, file_id=Path(pdf_filename).stem), store.keep_alive(job_id):
+        try:
+            result = process_single_pdf(
+                pdf_filename=pdf_filename,
+                folder_path=folder_path,
+                progress_callback=progress,
+                cancel_check=progress.cancel_requested,
+                **options
+            )
+            store.finish(job_id, "done", result=summarize_result(result))
+        except ConversionCancelled:
+            store.finish(job_id, "cancelled", error="Cancelled by request")
+        except Exception as e:
+            store.finish(job_id, "failed", error=str(e))
+
+    return store.get(job_id)
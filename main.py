@@ -1,17 +1,70 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import List
 from pathlib import Path
-import shutil
+import os
 import uuid
+import json
+import shutil
+import queue
+import asyncio
+import time
+import hashlib
+import aiofiles
 import logging
-import zipfile
-import tempfile
 
 # Import your PDF processor
-from simple_pdf_processor import process_single_pdf
+from simple_pdf_processor import (
+    process_single_pdf,
+    process_pdf_batch,
+    process_pdf_streaming,
+    warm_up_converters,
+    init_worker_process,
+    result_folder_name,
+    summarize_result,
+    CONVERTER_POOL,
+    IMAGE_FORMAT,
+    IMAGE_FORMATS,
+    PROCESSING_MODES,
+    get_page_count,
+    image_manifest_path,
+    lazy_image_path,
+    render_lazy_image
+)
+from converter_pool import parse_converter_keys
+from model_server import DEFAULT_SOCKET as DEFAULT_MODEL_SERVER_SOCKET
+from worker_pool import ClientQueueFullError, ConversionWorkerPool, QueueFullError
+from scheduler import (
+    DEFAULT_PRIORITY,
+    PRIORITY_CHOICES,
+    FairQueue,
+    classify,
+    client_key,
+    estimate_cost,
+    parse_weights
+)
+from job_store import JobStore, run_job
+from result_cache import ResultCache, make_cache_key
+from zip_stream import iter_zip
+from storage import UploadStorage
+from object_store import LocalObjectStore, S3ObjectStore
+from metrics import counter, gauge, histogram, render_metrics
+from structured_logging import configure_logging, log_context
+from artifacts import (
+    ARTIFACT_TYPES,
+    MEDIA_TYPES,
+    RangeNotSatisfiable,
+    find_artifact,
+    file_sha256,
+    iter_file,
+    list_artifacts,
+    parse_range,
+    result_files
+)
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging: JSON records on stderr (PDF_LOG_FORMAT / PDF_LOG_LEVEL / PDF_LOG_ITEMS)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -24,6 +77,394 @@ app = FastAPI(
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Where uploads and results are kept for every replica: "none" (this server's uploads/ only),
+# "local" (a shared directory) or "s3" (an S3-compatible bucket)
+STORAGE_BACKEND = os.environ.get("PDF_STORAGE_BACKEND", "none").lower()
+
+def create_object_store(backend):
+    if backend == "none":
+        return None
+    if backend == "local":
+        return LocalObjectStore(os.environ["PDF_STORAGE_LOCAL_ROOT"])
+    if backend == "s3":
+        return S3ObjectStore(
+            bucket=os.environ["PDF_S3_BUCKET"],
+            prefix=os.environ.get("PDF_S3_PREFIX", ""),
+            endpoint_url=os.environ.get("PDF_S3_ENDPOINT_URL"),
+            region_name=os.environ.get("PDF_S3_REGION"),
+            max_connections=int(os.environ.get("PDF_S3_MAX_CONNECTIONS", "10")),
+            multipart_mb=int(os.environ.get("PDF_S3_MULTIPART_MB", "8"))
+        )
+    raise ValueError(f"Unknown PDF_STORAGE_BACKEND: {backend} (use none, local or s3)")
+
+# Uploads and results live in per-file directories (uploads/files/<id[:2]>/<id>/), expired and
+# evicted by a background sweeper; with a backend these are local working copies
+STORAGE_SWEEP_INTERVAL = float(os.environ.get("PDF_STORAGE_SWEEP_INTERVAL", "300"))
+STORAGE = UploadStorage(
+    UPLOAD_DIR,
+    ttl_seconds=float(os.environ.get("PDF_STORAGE_TTL_HOURS", "72")) * 3600,
+    quota_bytes=int(os.environ.get("PDF_STORAGE_QUOTA_MB", "0")) * 1024 * 1024,
+    backend=create_object_store(STORAGE_BACKEND),
+    results_ttl=float(os.environ.get("PDF_STORAGE_RESULTS_TTL", "30")),
+    # Every sweep renews this worker's pins, so a lease spans several sweeps
+    pin_lease_seconds=max(900.0, 3 * STORAGE_SWEEP_INTERVAL)
+)
+
+# Converters to preload at startup: "engine:force_full_page_ocr:extract_tables:extract_images,..."
+# (empty = nothing; docling and each OCR engine are then imported on first use)
+CONVERTER_WARMUP = os.environ.get("PDF_CONVERTER_WARMUP", "rapidocr:true:true:true")
+
+# Conversion workers: "thread" shares one converter pool, "process" gives each worker its own,
+# "server" sends conversions to model_server.py, which holds the models for every API worker
+WORKER_MODE = os.environ.get("PDF_WORKER_MODE", "thread")
+MODEL_SERVER_SOCKET = os.environ.get("PDF_MODEL_SERVER", DEFAULT_MODEL_SERVER_SOCKET)
+WORKER_COUNT = int(os.environ.get("PDF_WORKER_COUNT", "2"))
+WORKER_QUEUE_SIZE = int(os.environ.get("PDF_WORKER_QUEUE_SIZE", "16"))
+# Queue slots one client (API key, X-Client-ID or address) may hold, so it can't fill the queue alone
+WORKER_QUEUE_PER_CLIENT = int(os.environ.get("PDF_WORKER_QUEUE_PER_CLIENT", str(max(1, WORKER_QUEUE_SIZE // 4))))
+
+# Waiting conversions run by priority class (weighted) and, within a class, fair share per client.
+# "fifo" restores plain arrival order
+SCHEDULER_POLICY = os.environ.get("PDF_SCHEDULER_POLICY", "fair")
+SCHEDULER_WEIGHTS = parse_weights(os.environ.get("PDF_SCHEDULER_WEIGHTS", ""))
+# priority=auto: conversions estimated at or below this cost (pages × OCR mode) are interactive
+INTERACTIVE_MAX_COST = float(os.environ.get("PDF_SCHEDULER_INTERACTIVE_MAX_COST", "10"))
+
+CONVERSION_POOL = ConversionWorkerPool(
+    mode=WORKER_MODE,
+    max_workers=WORKER_COUNT,
+    max_queue=WORKER_QUEUE_SIZE,
+    # Process workers can't see this process's converters, so each one warms up its own
+    initializer=init_worker_process if WORKER_MODE == "process" else None,
+    initargs=(CONVERTER_WARMUP,) if WORKER_MODE == "process" else (),
+    max_queue_per_client=WORKER_QUEUE_PER_CLIENT,
+    scheduler=FairQueue(SCHEDULER_WEIGHTS, SCHEDULER_POLICY),
+    server_socket=MODEL_SERVER_SOCKET if WORKER_MODE == "server" else None
+)
+
+# Preloading runs in the background: the server answers /health/live at once, and
+# /health/ready only once the preloaded models are warm (so load balancers skip cold workers)
+WARM_UP = {"status": "pending", "converters": len(parse_converter_keys(CONVERTER_WARMUP)), "failed": [], "seconds": None}
+
+def _warm_up_worker_processes():
+    """Process mode: one warm-up task per worker, so every worker process is started and warm"""
+    futures = [CONVERSION_POOL.submit(warm_up_converters, CONVERTER_WARMUP) for _ in range(CONVERSION_POOL.max_workers)]
+    failed = set()
+    for future in futures:
+        failed.update(future.result())
+    return list(failed)
+
+async def warm_up_converter_pool():
+    """Load the models for the configured pipeline settings"""
+    WARM_UP["status"] = "warming"
+    start_time = time.perf_counter()
+    try:
+        if WORKER_MODE == "process":
+            failed = await asyncio.to_thread(_warm_up_worker_processes)
+        elif WORKER_MODE == "server":
+            # Waits for the model server to come up; it warms up before it accepts work
+            failed = await run_conversion(warm_up_converters, CONVERTER_WARMUP)
+        else:
+            failed = await asyncio.to_thread(warm_up_converters, CONVERTER_WARMUP)
+    except Exception:
+        logger.error("Converter warm-up failed", exc_info=True)
+        failed = parse_converter_keys(CONVERTER_WARMUP)
+    for key in failed:
+        logger.error("Converter warm-up failed", extra={"converter": key._asdict()})
+    
+    WARM_UP["failed"] = sorted({key.ocr_engine for key in failed})
+    WARM_UP["seconds"] = round(time.perf_counter() - start_time, 3)
+    # Ready as long as something is warm - a broken optional engine shouldn't take the worker out
+    WARM_UP["status"] = "failed" if failed and len(failed) == WARM_UP["converters"] else "ready"
+    logger.info("Warm-up finished", extra=dict(WARM_UP))
+
+@app.on_event("startup")
+async def start_warm_up():
+    app.state.warm_up = asyncio.create_task(warm_up_converter_pool())
+
+# Finished results keyed on PDF content hash + options, so identical resubmissions skip docling
+RESULT_CACHE_ENABLED = os.environ.get("PDF_RESULT_CACHE", "true").lower() in ("1", "true", "yes", "on")
+RESULT_CACHE = ResultCache(
+    UPLOAD_DIR / "cache",
+    max_bytes=int(os.environ.get("PDF_RESULT_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+    max_age_seconds=float(os.environ.get("PDF_RESULT_CACHE_MAX_AGE_HOURS", "168")) * 3600
+)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("PDF_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+PDF_HEADER_WINDOW = 1024  # "%PDF-" must appear within the first 1KB
+
+def _content_hash(file_id):
+    """SHA-256 of an uploaded PDF (computed during upload; hashed here for older uploads)"""
+    hash_path = STORAGE.hash_path(file_id)
+    try:
+        return hash_path.read_text().strip()
+    except FileNotFoundError:
+        pass
+    sha256 = hashlib.sha256()
+    with open(STORAGE.pdf_path(file_id), "rb") as fp:
+        while chunk := fp.read(UPLOAD_CHUNK_SIZE):
+            sha256.update(chunk)
+    hash_path.write_text(sha256.hexdigest())
+    return sha256.hexdigest()
+
+def parse_ocr_mode(value):
+    """force_full_page_ocr query value -> True / False / "auto" """
+    value = str(value).strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    if value == "auto":
+        return "auto"
+    raise HTTPException(status_code=400, detail=f"force_full_page_ocr must be true, false or auto (got {value})")
+
+# Query options shared by the conversion endpoints
+class ProcessingOptions:
+    """Options every conversion endpoint takes; .options is what the processing functions get"""
+
+    def __init__(
+        self,
+        extract_tables: bool = Query(True, description="Extract tables as CSV/HTML"),
+        extract_images: bool = Query(True, description="Extract table and picture images"),
+        image_format: str = Query(None, description="Image format: png, webp (smaller, fast) or jpeg (default: server setting)", enum=list(IMAGE_FORMATS)),
+        images_scale: float = Query(2.0, gt=0, le=8, description="Image resolution: 1.0 = 72 DPI, 2.0 = 144 DPI"),
+        lazy_images: bool = Query(False, description="Only record image positions; render each image on first request via /images/"),
+        export_json: bool = Query(False, description="Also save the docling document as lossless JSON"),
+        force_full_page_ocr: str = Query("true", description="Force OCR on all pages (true), smart OCR (false), or per-page auto-detection (auto)"),
+        ocr_engine: str = Query("rapidocr", description="OCR engine", enum=["rapidocr", "tesseract", "easyocr", "ocrmac"])
+    ):
+        self.options = {
+            "extract_tables": extract_tables,
+            "extract_images": extract_images,
+            "force_full_page_ocr": parse_ocr_mode(force_full_page_ocr),
+            "ocr_engine": ocr_engine,
+            "image_format": image_format or IMAGE_FORMAT,
+            "images_scale": images_scale,
+            "lazy_images": lazy_images,
+            "export_json": export_json
+        }
+
+class DocumentOptions:
+    """ProcessingOptions plus those only single-document conversions (/process-pdf/, /jobs/) take"""
+
+    def __init__(
+        self,
+        processing: ProcessingOptions = Depends(),
+        shards: int = Query(1, ge=1, le=64, description="Split the PDF into page ranges converted in parallel processes"),
+        profile: bool = Query(False, description="Save a cProfile trace of the conversion with the results (bypasses the result cache)"),
+        mode: str = Query("full", description="full: layout, table and OCR models; fast: PDF text layer only (markdown, no tables or images), falls back to full when a page has no text layer", enum=PROCESSING_MODES)
+    ):
+        self.options = {**processing.options, "shards": shards, "profile": profile, "mode": mode}
+
+# Options that change how a result is computed but not what it contains
+EXECUTION_OPTIONS = {"shards", "profile"}
+
+def _cache_key(file_id, options):
+    output_options = {k: v for k, v in options.items() if k not in EXECUTION_OPTIONS}
+    # Full mode is the default (and the only mode batch / streaming requests run), so it keys
+    # the same as options without a mode
+    if output_options.get("mode") == "full":
+        del output_options["mode"]
+    return make_cache_key(_content_hash(file_id), output_options)
+
+def fetch_cached_result(file_id, options):
+    """Materialize a cached result into the file's result folder, or None on a miss"""
+    # A profiling request wants a trace of a real conversion
+    if not RESULT_CACHE_ENABLED or options.get("profile"):
+        return None
+    # Fast mode falls back to a full conversion, so a cached full result answers it too
+    modes = ["fast", "full"] if options.get("mode") == "fast" else ["full"]
+    for mode in modes:
+        mode_options = {**options, "mode": mode}
+        output_folder = STORAGE.file_dir(file_id) / result_folder_name(
+            file_id, options["ocr_engine"], options["force_full_page_ocr"], mode
+        )
+        result = RESULT_CACHE.fetch(_cache_key(file_id, mode_options), output_folder, file_id)
+        if result is not None:
+            STORAGE.save_results(file_id)
+            return result
+    return None
+
+def store_cached_result(file_id, options, result):
+    if not RESULT_CACHE_ENABLED or options.get("profile") or not result.get('output_folder'):
+        return
+    # A fast-mode request that fell back produced a full result; cache it as one
+    options = {**options, "mode": result.get("mode", options.get("mode", "full"))}
+    try:
+        RESULT_CACHE.store(_cache_key(file_id, options), result['output_folder'], file_id, result)
+    except Exception:
+        logger.warning("Could not cache result", exc_info=True, extra={"file_id": file_id})
+
+# Asynchronous jobs: state lives in SQLite so it survives restarts
+JOB_STORE = JobStore(UPLOAD_DIR / "jobs.db", heartbeat_interval=float(os.environ.get("PDF_JOB_HEARTBEAT_SECONDS", "10")))
+JOB_DISPATCH_INTERVAL = float(os.environ.get("PDF_JOB_DISPATCH_INTERVAL", "2"))
+# A running job without a heartbeat for this long lost its worker and is queued again
+JOB_STALE_SECONDS = float(os.environ.get("PDF_JOB_STALE_SECONDS", "60"))
+JOB_FUTURES = {}  # job_id -> worker pool future, for jobs submitted by this process
+
+def dispatch_queued_jobs():
+    """Hand queued jobs to the worker pool until its queue is full"""
+    for job in JOB_STORE.list_by_status("queued"):
+        job_id = job["job_id"]
+        if job_id in JOB_FUTURES:
+            continue
+        try:
+            future = CONVERSION_POOL.schedule(
+                run_job,
+                (JOB_STORE, job_id, f"{job['file_id']}.pdf", str(STORAGE.file_dir(job["file_id"])), job["options"]),
+                **(job["scheduling"] or {})
+            )
+        except ClientQueueFullError:
+            # This client has its share queued already - other clients' jobs can still go
+            continue
+        except QueueFullError:
+            # The rest wait in the job store until a worker frees up
+            break
+        JOB_FUTURES[job_id] = future
+        future.add_done_callback(lambda f, job=job: _on_job_finished(job, f))
+
+def _on_job_finished(job, future):
+    JOB_FUTURES.pop(job["job_id"], None)
+    STORAGE.save_results(job["file_id"])
+    if future.cancelled() or future.exception() is not None:
+        return
+    finished = future.result()
+    if finished and finished["status"] == "failed":
+        record_conversion(job["options"], None, status="failed")
+    if finished and finished["status"] == "done":
+        record_conversion(job["options"], finished["result"])
+        output_folder = finished["result"]["output_folder"]
+        result = {
+            "tables": finished["result"]["tables_count"],
+            "images": finished["result"]["images_count"],
+            "text_file": _find_text_file(output_folder),
+            "output_folder": output_folder
+        }
+        if "ocr_pages" in finished["result"]:
+            result["ocr_pages"] = finished["result"]["ocr_pages"]
+        store_cached_result(job["file_id"], job["options"], result)
+
+def _find_text_file(output_folder):
+    return next(Path(output_folder).glob("*_full_text_*.md"), None)
+
+def requeue_interrupted_jobs():
+    requeued = JOB_STORE.requeue_interrupted(stale_after=JOB_STALE_SECONDS)
+    if requeued:
+        logger.info("Requeued jobs whose worker stopped", extra={"jobs": requeued})
+
+async def job_dispatcher():
+    while True:
+        try:
+            # Every API worker checks, so jobs of a worker that died are picked up without a restart
+            await asyncio.to_thread(requeue_interrupted_jobs)
+            await asyncio.to_thread(dispatch_queued_jobs)
+        except Exception:
+            logger.error("Job dispatch failed", exc_info=True)
+        await asyncio.sleep(JOB_DISPATCH_INTERVAL)
+
+@app.on_event("startup")
+async def start_job_dispatcher():
+    app.state.job_dispatcher = asyncio.create_task(job_dispatcher())
+
+def sweep_storage():
+    """Expire and evict uploads; files with queued or running jobs are kept"""
+    keep = {job["file_id"] for job in JOB_STORE.list_by_status("queued", "running")}
+    swept = STORAGE.sweep(keep=keep)
+    if swept["expired"] or swept["evicted"]:
+        logger.info("Storage swept", extra={
+            "expired": swept["expired"], "evicted": swept["evicted"], "freed_bytes": swept["freed_bytes"]
+        })
+    return swept
+
+async def storage_sweeper():
+    while True:
+        try:
+            await asyncio.to_thread(sweep_storage)
+        except Exception:
+            logger.error("Storage sweep failed", exc_info=True)
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL)
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    # Uploads from before per-file directories are moved over once
+    moved = await asyncio.to_thread(STORAGE.migrate_flat_layout, UPLOAD_DIR)
+    if moved:
+        logger.info("Moved uploads into per-file storage directories", extra={"files": moved})
+    app.state.storage_sweeper = asyncio.create_task(storage_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_conversion_pool():
+    if getattr(app.state, "job_dispatcher", None):
+        app.state.job_dispatcher.cancel()
+    if getattr(app.state, "storage_sweeper", None):
+        app.state.storage_sweeper.cancel()
+    if getattr(app.state, "warm_up", None):
+        app.state.warm_up.cancel()
+    CONVERSION_POOL.shutdown(wait=False)
+
+def submit_conversion(fn, *args, scheduling=None, **kwargs):
+    """
+    Queue a blocking conversion on the worker pool and return its future. `scheduling` is
+    plan_scheduling()'s priority / client / cost. Raises 503 with Retry-After when the queue
+    (or this client's share of it) is full.
+    """
+    try:
+        return CONVERSION_POOL.schedule(fn, args, kwargs, **(scheduling or {}))
+    except QueueFullError as e:
+        logger.warning("Rejected conversion", extra={"error": str(e), "retry_after": e.retry_after})
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy: {str(e)}. Please retry later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def run_conversion(fn, *args, **kwargs):
+    """Run a blocking conversion on the worker pool without blocking the event loop"""
+    return await asyncio.wrap_future(submit_conversion(fn, *args, **kwargs))
+
+BACKGROUND_TASKS = set()  # Running follow-up tasks, referenced so they aren't garbage collected
+
+def run_in_background(coro):
+    """Run coro as its own task - it keeps going if the client that started it disconnects"""
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+def _pin_all(file_ids):
+    for file_id in file_ids:
+        STORAGE.pin(file_id)
+
+def _unpin_all(file_ids):
+    for file_id in file_ids:
+        STORAGE.unpin(file_id)
+
+def _page_count(file_id):
+    try:
+        return get_page_count(STORAGE.pdf_path(file_id))
+    except Exception:
+        # Unreadable PDFs fail in the conversion itself; schedule them as one page
+        return 1
+
+async def plan_scheduling(request, file_ids, options, priority="auto", default=DEFAULT_PRIORITY):
+    """
+    Priority class, fair-share client and estimated cost (pages × OCR mode) for converting
+    file_ids with options, as passed to submit_conversion(scheduling=...)
+    """
+    cost = 0.0
+    for file_id in file_ids:
+        cost += estimate_cost(await asyncio.to_thread(_page_count, file_id), options)
+    client = client_key(
+        api_key=request.headers.get("x-api-key"),
+        client_id=request.headers.get("x-client-id"),
+        address=request.client.host if request.client else None
+    )
+    return {
+        "priority": classify(priority, cost, INTERACTIVE_MAX_COST, default),
+        "client": client,
+        "cost": round(cost, 2)
+    }
+
 @app.get("/")
 async def root():
     return {
@@ -32,11 +473,235 @@ async def root():
         "workflow": "Upload PDF → Process PDF → Download Results",
         "endpoints": {
             "POST /upload-pdf/": "Upload a PDF file",
+            "POST /upload-pdf/stream": "Upload a large PDF as the raw request body",
             "POST /process-pdf/": "Process uploaded PDF",
-            "GET /download-results/{file_id}": "Download processing results"
+            "GET /process-pdf/{file_id}/stream": "Process uploaded PDF, streaming each page's results as it finishes (SSE or NDJSON)",
+            "POST /process-batch/": "Process many uploaded PDFs with one set of options (NDJSON stream)",
+            "POST /process-batch/upload": "Upload and process many PDFs in one request (NDJSON stream)",
+            "POST /jobs/": "Start processing in the background, returns a job_id",
+            "GET /jobs/{job_id}": "Job status and per-stage progress",
+            "POST /jobs/{job_id}/cancel": "Cancel a queued or running job",
+            "GET /download-results/{file_id}": "Download processing results",
+            "GET /results/{file_id}/artifacts": "List result files with type, size, page and checksum",
+            "GET /results/{file_id}/{result_folder}/{name}": "Download one result file (ETag and Range supported)",
+            "GET /images/{file_id}": "List images recorded with lazy_images=true",
+            "GET /images/{file_id}/{result_folder}/{image_name}": "Get one image, rendered on first request",
+            "GET /stats": "Converter, worker pool and result cache statistics",
+            "GET /metrics": "Prometheus metrics",
+            "GET /health/live": "Liveness: the server is up",
+            "GET /health/ready": "Readiness: preloaded models are warm (503 until then)"
         }
     }
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe: answers as soon as the server is up, warm or not"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 200 once the preloaded converters are warm, 503 while warming up"""
+    body = {"status": WARM_UP["status"], "warm_up": WARM_UP}
+    if WORKER_MODE == "thread":
+        body["converter_pool"] = CONVERTER_POOL.stats()
+    if WARM_UP["status"] != "ready":
+        return JSONResponse(status_code=503, content=body, headers={"Retry-After": "5"})
+    return body
+
+@app.get("/stats")
+async def stats():
+    """
+    Converter pool hit/miss/load-time counters, worker pool queue metrics and result cache hit rate
+    """
+    stats = {
+        # In process and server mode the converters live elsewhere; this pool stays empty
+        "converter_pool": CONVERTER_POOL.stats(),
+        "worker_pool": CONVERSION_POOL.stats(),
+        "result_cache": await asyncio.to_thread(RESULT_CACHE.stats),
+        "storage": await asyncio.to_thread(STORAGE.stats)
+    }
+    if WORKER_MODE == "server":
+        try:
+            stats["model_server"] = await asyncio.to_thread(CONVERSION_POOL.model_server_stats)
+        except Exception as e:
+            stats["model_server"] = {"error": str(e)}
+    return stats
+
+# ================== METRICS ==================
+
+HTTP_REQUEST_SECONDS = histogram(
+    "pdf_api_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+STAGE_SECONDS = histogram(
+    "pdf_stage_duration_seconds", "Time spent per processing stage", ["stage", "ocr_engine"]
+)
+CONVERSIONS = counter("pdf_conversions", "Finished conversions", ["ocr_engine", "status"])
+PAGES_PROCESSED = counter("pdf_pages_processed", "Pages converted", ["ocr_engine"])
+PAGES_PER_SECOND = histogram(
+    "pdf_pages_per_second", "Conversion throughput per document (pages / convert stage seconds)", ["ocr_engine"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+)
+
+def _worker_pool_gauge(field):
+    return lambda: {(): CONVERSION_POOL.stats()[field]}
+
+gauge("pdf_worker_queue_depth", "Conversions waiting for a worker", callback=_worker_pool_gauge("queue_depth"))
+gauge("pdf_worker_active", "Conversions running", callback=_worker_pool_gauge("active_workers"))
+def _scheduler_gauge(field):
+    return lambda: {
+        (name,): value
+        for name, stats in CONVERSION_POOL.stats()["scheduler"]["classes"].items()
+        if (value := stats[field]) is not None
+    }
+
+gauge("pdf_scheduler_queued", "Conversions waiting per priority class", ["priority"], callback=_scheduler_gauge("queued"))
+gauge(
+    "pdf_scheduler_wait_p50_seconds", "Median wait for a worker over recent conversions, per priority class",
+    ["priority"], callback=_scheduler_gauge("wait_seconds_p50")
+)
+gauge(
+    "pdf_scheduler_wait_p99_seconds", "99th percentile wait for a worker over recent conversions, per priority class",
+    ["priority"], callback=_scheduler_gauge("wait_seconds_p99")
+)
+gauge("pdf_ready", "1 once the preloaded converters are warm", callback=lambda: {(): int(WARM_UP["status"] == "ready")})
+gauge("pdf_jobs_queued", "Background jobs waiting in the job store", callback=lambda: {(): len(JOB_STORE.list_by_status("queued"))})
+gauge(
+    "pdf_cache_hit_ratio", "Hit ratio of the result cache and the converter pool", ["cache"],
+    # Counters only - RESULT_CACHE.stats() walks the cache directory, too slow for every scrape
+    callback=lambda: {
+        ("result",): round(RESULT_CACHE.hits / max(1, RESULT_CACHE.hits + RESULT_CACHE.misses), 3),
+        ("converter",): CONVERTER_POOL.stats()["hit_ratio"],
+    }
+)
+gauge(
+    "pdf_cache_lookups", "Cache lookups by outcome", ["cache", "outcome"],
+    callback=lambda: {
+        ("result", "hit"): RESULT_CACHE.hits,
+        ("result", "miss"): RESULT_CACHE.misses,
+        ("converter", "hit"): CONVERTER_POOL.stats()["hits"],
+        ("converter", "miss"): CONVERTER_POOL.stats()["misses"],
+    }
+)
+
+def record_conversion(options, result, status="done"):
+    """Record a fresh conversion's stage timings and throughput (result or summarize_result dict)"""
+    # Fast-mode conversions that stayed on the text layer never touched the OCR engine
+    ocr_engine = "text_layer" if result and result.get("mode") == "fast" else options["ocr_engine"]
+    CONVERSIONS.inc(ocr_engine=ocr_engine, status=status)
+    if status != "done":
+        return
+    timings = result.get("timings") or {}
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, ocr_engine=ocr_engine)
+    pages = result.get("pages") or 0
+    PAGES_PROCESSED.inc(pages, ocr_engine=ocr_engine)
+    if pages and timings.get("convert"):
+        PAGES_PER_SECOND.observe(pages / timings["convert"], ocr_engine=ocr_engine)
+
+def _timed_zip(chunks):
+    """Pass ZIP chunks through, recording the whole build (and send) as the zip_build stage"""
+    start_time = time.perf_counter()
+    yield from chunks
+    STAGE_SECONDS.observe(time.perf_counter() - start_time, stage="zip_build", ocr_engine="")
+
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates keep the label set small (no file_ids); unmatched paths share one label
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start_time,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: request latency, per-stage durations, pages/sec per OCR engine, queue depth, cache hits
+    """
+    return PlainTextResponse(await asyncio.to_thread(render_metrics), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads with a too-large Content-Length before any of the body is read"""
+    if request.method == "POST" and request.url.path.startswith("/upload-pdf/"):
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"}
+            )
+    return await call_next(request)
+
+async def _upload_file_chunks(file):
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+async def save_upload_stream(chunks):
+    """
+    Write an async stream of PDF bytes to the file's storage directory chunk by chunk (memory stays flat),
+    enforcing the size limit and %PDF magic bytes and hashing in the same pass.
+    Returns (file_id, size, sha256).
+    """
+    file_id = str(uuid.uuid4())
+    file_path = STORAGE.pdf_path(file_id)
+    part_path = file_path.with_name(f"{file_id}.pdf.part")
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    sha256 = hashlib.sha256()
+    size = 0
+    header = b""
+    header_ok = False
+    
+    try:
+        async with aiofiles.open(part_path, "wb") as buffer:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+                    )
+                
+                # Check the magic bytes as soon as the first bytes arrive
+                if not header_ok:
+                    header = (header + chunk)[:PDF_HEADER_WINDOW]
+                    if b"%PDF-" in header:
+                        header_ok = True
+                    elif len(header) >= PDF_HEADER_WINDOW:
+                        raise HTTPException(status_code=400, detail="Not a PDF file (missing %PDF header)")
+                
+                sha256.update(chunk)
+                await buffer.write(chunk)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file not allowed")
+        if not header_ok:
+            raise HTTPException(status_code=400, detail="Not a PDF file (missing %PDF header)")
+        
+        os.replace(part_path, file_path)
+        async with aiofiles.open(STORAGE.hash_path(file_id), "w") as fp:
+            await fp.write(sha256.hexdigest())
+        await asyncio.to_thread(STORAGE.register, file_id)
+    finally:
+        if part_path.exists():
+            part_path.unlink()
+        if not file_path.exists():
+            shutil.rmtree(file_path.parent, ignore_errors=True)
+    
+    return file_id, size, sha256.hexdigest()
+
 @app.post("/upload-pdf/")
 async def upload_pdf(file: UploadFile = File(...)):
     """
@@ -50,116 +715,657 @@ async def upload_pdf(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Empty file not allowed")
     
     try:
-        # Generate unique file ID
-        file_id = str(uuid.uuid4())
+        # Save uploaded file (hashed while writing so identical PDFs can share cached results)
+        file_id, size, content_hash = await save_upload_stream(_upload_file_chunks(file))
         
-        # Save uploaded file
-        file_path = UPLOAD_DIR / f"{file_id}.pdf"
+        logger.info("File uploaded", extra={"file_id": file_id, "original_filename": file.filename})
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        return {
+            "file_id": file_id,
+            "original_filename": file.filename,
+            "size": size,
+            "sha256": content_hash,
+            "next_step": f"Use this file_id to process the PDF at /process-pdf/"
+        }
         
-        logger.info(f"File uploaded: {file.filename} -> {file_id}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Upload failed", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+@app.post("/upload-pdf/stream")
+async def upload_pdf_stream(
+    request: Request,
+    filename: str = Query("document.pdf", description="Original filename (for your reference)")
+):
+    """
+    Step 1 (large files): Upload raw PDF bytes as the request body (Content-Type: application/pdf).
+    The body is written to disk as it arrives, without multipart parsing or spooling.
+    """
+    if not filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    try:
+        file_id, size, content_hash = await save_upload_stream(request.stream())
+        
+        logger.info("File uploaded (stream)", extra={"file_id": file_id, "original_filename": filename})
         
         return {
             "file_id": file_id,
-            "original_filename": file.filename,
-            "size": file.size,
+            "original_filename": filename,
+            "size": size,
+            "sha256": content_hash,
             "next_step": f"Use this file_id to process the PDF at /process-pdf/"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Upload failed: {str(e)}")
+        logger.error("Upload failed", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.post("/process-pdf/")
 async def process_pdf(
+    request: Request,
     file_id: str = Query(..., description="File ID from upload-pdf"),
-    extract_tables: bool = Query(True, description="Extract tables as CSV/HTML"),
-    extract_images: bool = Query(True, description="Extract images as PNG"),
-    force_full_page_ocr: bool = Query(True, description="Force OCR on all pages vs smart OCR"),
-    ocr_engine: str = Query("rapidocr", description="OCR engine", enum=["rapidocr", "tesseract", "easyocr", "ocrmac"])
+    processing: DocumentOptions = Depends(),
+    priority: str = Query("auto", description="Scheduling class: auto (interactive for small documents), interactive, normal or bulk", enum=PRIORITY_CHOICES)
 ):
     """
     Step 2: Process the uploaded PDF with extraction options
     """
     
-    # Check if file exists
-    pdf_file_path = UPLOAD_DIR / f"{file_id}.pdf"
-    if not pdf_file_path.exists():
-        raise HTTPException(status_code=404, detail=f"File {file_id} not found. Please upload first.")
+    with log_context(file_id=file_id):
+        # Check if file exists
+        if not await asyncio.to_thread(STORAGE.fetch, file_id):
+            raise HTTPException(status_code=404, detail=f"File {file_id} not found. Please upload first.")
+        await asyncio.to_thread(STORAGE.touch, file_id)
+        
+        options = processing.options
+        
+        try:
+            # Identical PDF + identical options already converted? Reuse those artifacts
+            result = await asyncio.to_thread(fetch_cached_result, file_id, options)
+            cached = result is not None
+            
+            if cached:
+                logger.info("Processing served from cache")
+            else:
+                logger.info("Processing")
+                
+                # Process the PDF on the worker pool (keeps the event loop free)
+                scheduling = await plan_scheduling(request, [file_id], options, priority)
+                await asyncio.to_thread(STORAGE.pin, file_id)
+                try:
+                    result = await run_conversion(
+                        process_single_pdf,
+                        pdf_filename=f"{file_id}.pdf",
+                        folder_path=str(STORAGE.file_dir(file_id)),
+                        scheduling=scheduling,
+                        **options
+                    )
+                finally:
+                    await asyncio.to_thread(STORAGE.unpin, file_id)
+                record_conversion(options, result)
+                await asyncio.to_thread(store_cached_result, file_id, options, result)
+                await asyncio.to_thread(STORAGE.save_results, file_id)
+                
+                logger.info("Processing completed")
+            
+            return {
+                "file_id": file_id,
+                "status": "completed",
+                "cached": cached,
+                "results": summarize_result(result),
+                "artifacts": f"/results/{file_id}/artifacts",
+                "next_step": f"Download results at /download-results/{file_id}"
+            }
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            record_conversion(options, None, status="failed")
+            logger.error("Processing failed", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+# Per-page streaming: page records travel from the worker through a queue as chunks finish
+def _sse(event, record):
+    return f"event: {event}\ndata: {json.dumps(record, default=str)}\n\n"
+
+@app.get("/process-pdf/{file_id}/stream")
+async def process_pdf_stream(
+    request: Request,
+    file_id: str,
+    format: str = Query("sse", description="Event format: sse (text/event-stream) or ndjson", enum=["sse", "ndjson"]),
+    processing: ProcessingOptions = Depends(),
+    priority: str = Query("auto", description="Scheduling class: auto (interactive for small documents), interactive, normal or bulk", enum=PRIORITY_CHOICES)
+):
+    """
+    Step 2 (streaming): Process the uploaded PDF and send a "page" event with each page's markdown,
+    tables and image references as soon as it is converted, then a "done" (or "error") event.
+    The full result folder is written at the end, as for /process-pdf/.
+    """
+    with log_context(file_id=file_id):
+        if not await asyncio.to_thread(STORAGE.fetch, file_id):
+            raise HTTPException(status_code=404, detail=f"File {file_id} not found. Please upload first.")
+        await asyncio.to_thread(STORAGE.touch, file_id)
+        
+        options = processing.options
+        image_suffix = IMAGE_FORMATS[options["image_format"]][1]
+        result_folder = result_folder_name(file_id, options["ocr_engine"], options["force_full_page_ocr"])
+        
+        scheduling = await plan_scheduling(request, [file_id], options, priority)
+        pages_queue = await asyncio.to_thread(CONVERSION_POOL.make_queue)
+        await asyncio.to_thread(STORAGE.pin, file_id)
+        try:
+            future = submit_conversion(
+                process_pdf_streaming,
+                pdf_filename=f"{file_id}.pdf",
+                folder_path=str(STORAGE.file_dir(file_id)),
+                on_page=pages_queue.put,
+                scheduling=scheduling,
+                **options
+            )
+        except HTTPException:
+            await asyncio.to_thread(STORAGE.unpin, file_id)
+            raise
+        # Recorded and cached even if the client disconnects midway - the conversion keeps running
+        async def on_finished():
+            await asyncio.wait([asyncio.wrap_future(future)])
+            await asyncio.to_thread(STORAGE.unpin, file_id)
+            await asyncio.to_thread(STORAGE.save_results, file_id)
+            if future.cancelled() or future.exception() is not None:
+                record_conversion(options, None, status="failed")
+                return
+            record_conversion(options, future.result())
+            await asyncio.to_thread(store_cached_result, file_id, options, future.result())
+        run_in_background(on_finished())
+        logger.info("Streaming processing")
+        
+        def encode(event, record):
+            return _sse(event, record) if format == "sse" else _ndjson({"type": event, **record})
+        
+        async def events():
+            with log_context(file_id=file_id):
+                pages = 0
+                while True:
+                    # Anything put on the queue before the conversion finished is already there
+                    finished = future.done()
+                    try:
+                        record = await asyncio.to_thread(pages_queue.get, True, 0.01 if finished else 0.5)
+                    except queue.Empty:
+                        if finished:
+                            break
+                        continue
+                    
+                    pages += 1
+                    # Image files are written with the rest of the results - these URLs work after "done"
+                    for image in record["images"]:
+                        if options["lazy_images"]:
+                            image["url"] = f"/images/{file_id}/{result_folder}/{image['name']}"
+                        else:
+                            image["url"] = f"/results/{file_id}/{result_folder}/{file_id}-{image['name']}{image_suffix}"
+                    yield encode("page", record)
+                
+                error = None if future.cancelled() else future.exception()
+                if future.cancelled() or error is not None:
+                    logger.error("Streaming processing failed", exc_info=error, extra={"pages": pages, "cancelled": error is None})
+                    yield encode("error", {"file_id": file_id, "pages": pages, "error": str(error or "Conversion cancelled")})
+                    return
+                
+                logger.info("Streaming processing completed", extra={"pages": pages})
+                yield encode("done", {
+                    "file_id": file_id,
+                    "pages": pages,
+                    "results": summarize_result(future.result()),
+                    "artifacts": f"/results/{file_id}/artifacts"
+                })
+            
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+@app.post("/jobs/")
+async def create_job(
+    request: Request,
+    file_id: str = Query(..., description="File ID from upload-pdf"),
+    processing: DocumentOptions = Depends(),
+    priority: str = Query("auto", description="Scheduling class: auto (interactive for small documents), interactive, normal or bulk", enum=PRIORITY_CHOICES)
+):
+    """
+    Step 2 (async): Queue the uploaded PDF for processing and return a job_id right away
+    """
     
-    try:
-        logger.info(f"Processing: {file_id}")
-        
-        # Process the PDF
-        result = process_single_pdf(
-            pdf_filename=f"{file_id}.pdf",
-            folder_path=str(UPLOAD_DIR),
-            extract_tables=extract_tables,
-            extract_images=extract_images,
-            force_full_page_ocr=force_full_page_ocr,
-            ocr_engine=ocr_engine
+    with log_context(file_id=file_id):
+        if not await asyncio.to_thread(STORAGE.fetch, file_id):
+            raise HTTPException(status_code=404, detail=f"File {file_id} not found. Please upload first.")
+        await asyncio.to_thread(STORAGE.touch, file_id)
+        
+        options = processing.options
+        # Check the cache before the job exists, so the dispatcher can't pick it up meanwhile
+        cached_result = await asyncio.to_thread(fetch_cached_result, file_id, options)
+        scheduling = await plan_scheduling(request, [file_id], options, priority) if cached_result is None else None
+        job_id = await asyncio.to_thread(
+            JOB_STORE.create,
+            file_id, options, status="done" if cached_result is not None else "queued", scheduling=scheduling
         )
         
-        logger.info(f"Processing completed: {file_id}")
+        with log_context(job_id=job_id):
+            if cached_result is not None:
+                await asyncio.to_thread(
+                    JOB_STORE.finish,
+                    job_id, "done", result={**summarize_result(cached_result), "cached": True}, stage_state="cached"
+                )
+                logger.info("Job served from cache")
+            else:
+                await asyncio.to_thread(dispatch_queued_jobs)
+                logger.info("Job queued")
         
         return {
+            "job_id": job_id,
             "file_id": file_id,
-            "status": "completed",
-            "results": {
-                "tables_count": result.get('tables', 0),
-                "images_count": result.get('images', 0),
-                "text_extracted": bool(result.get('text_file')),
-                "output_folder": str(result.get('output_folder', ''))
-            },
-            "next_step": f"Download results at /download-results/{file_id}"
+            "status": "done" if cached_result is not None else "queued",
+            "next_step": f"Poll /jobs/{job_id} until status is done, then download at /download-results/{file_id}"
         }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status (queued/running/done/failed/cancelled) with per-stage progress
+    """
+    job = await asyncio.to_thread(JOB_STORE.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a job - queued jobs stop immediately, running jobs at the next stage
+    """
+    with log_context(job_id=job_id):
+        job = await asyncio.to_thread(JOB_STORE.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        if job["status"] not in ("queued", "running"):
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is already {job['status']}")
         
-    except Exception as e:
-        logger.error(f"Processing failed for {file_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        future = JOB_FUTURES.get(job_id)
+        if future is not None:
+            future.cancel()  # Only succeeds while the job is still waiting for a worker
+        status = await asyncio.to_thread(JOB_STORE.request_cancel, job_id)
+        
+        logger.info("Job cancel requested", extra={"status": status})
+        
+        return {"job_id": job_id, "status": status, "cancel_requested": True}
 
-@app.get("/download-results/{file_id}")
-async def download_results(file_id: str):
+# Batch processing: many PDFs, one set of options, one docling convert_all on one worker
+BATCH_MAX_FILES = int(os.environ.get("PDF_BATCH_MAX_FILES", "500"))
+
+class BatchRequest(BaseModel):
+    file_ids: List[str]
+
+def _ndjson(record):
+    return json.dumps(record, default=str) + "\n"
+
+async def _collect_batch(future, results_queue, to_convert, options, documents):
+    """
+    Record, cache and save each converted document of a batch, then hand its record to the
+    response through documents (None when the batch is over), and unpin the batch's files once
+    it has finished. Runs as its own task, so the results are kept even if the client
+    disconnects midway.
+    """
+    remaining = set(to_convert)
+    try:
+        while remaining:
+            # Anything put on the queue before the batch finished is already there
+            batch_finished = future.done()
+            try:
+                pdf_filename, result, error = await asyncio.to_thread(
+                    results_queue.get, True, 0.01 if batch_finished else 0.5
+                )
+            except queue.Empty:
+                if not batch_finished:
+                    continue
+                error = str(future.exception() or "Batch stopped before this document was converted")
+                for file_id in sorted(remaining):
+                    await documents.put({"file_id": file_id, "status": "failed", "error": error})
+                break
+            
+            file_id = Path(pdf_filename).stem
+            remaining.discard(file_id)
+            if error:
+                record_conversion(options, None, status="failed")
+                await documents.put({"file_id": file_id, "status": "failed", "error": error})
+                continue
+            record_conversion(options, result)
+            try:
+                await asyncio.to_thread(store_cached_result, file_id, options, result)
+                await asyncio.to_thread(STORAGE.save_results, file_id)
+            except Exception:
+                logger.error("Saving batch results failed", exc_info=True, extra={"file_id": file_id})
+            await documents.put({"file_id": file_id, "status": "completed", "cached": False, "results": summarize_result(result)})
+    finally:
+        await documents.put(None)
+        await asyncio.wait([asyncio.wrap_future(future)])
+        await asyncio.to_thread(_unpin_all, to_convert)
+
+async def start_batch(request, file_ids, options, priority="auto", failed=(), filenames=None):
+    """
+    Serve cached documents right away and hand the rest to the worker pool as one batch
+    (scheduled as bulk unless a priority is given).
+    Raises 503 before anything is streamed if the pool is full. Returns an async iterator of
+    NDJSON lines: one per document as it finishes (failures included), then a summary line.
+    """
+    filenames = filenames or {}
+    ready = list(failed)
+    to_convert = []
+    
+    for file_id in dict.fromkeys(file_ids):
+        if not await asyncio.to_thread(STORAGE.fetch, file_id):
+            ready.append({"file_id": file_id, "status": "failed", "error": "File not found. Please upload first."})
+            continue
+        cached_result = await asyncio.to_thread(fetch_cached_result, file_id, options)
+        if cached_result is not None:
+            ready.append({"file_id": file_id, "status": "completed", "cached": True, "results": summarize_result(cached_result)})
+        else:
+            to_convert.append(file_id)
+    
+    documents = None
+    if to_convert:
+        scheduling = await plan_scheduling(request, to_convert, options, priority, default="bulk")
+        results_queue = await asyncio.to_thread(CONVERSION_POOL.make_queue)
+        await asyncio.to_thread(_pin_all, to_convert)
+        try:
+            future = submit_conversion(
+                process_pdf_batch,
+                [str(STORAGE.pdf_path(file_id)) for file_id in to_convert],
+                str(UPLOAD_DIR),
+                on_document=results_queue.put,
+                scheduling=scheduling,
+                **options
+            )
+        except HTTPException:
+            await asyncio.to_thread(_unpin_all, to_convert)
+            raise
+        documents = asyncio.Queue()
+        run_in_background(_collect_batch(future, results_queue, to_convert, options, documents))
+        logger.info("Batch queued", extra={"queued": len(to_convert), "cached_or_rejected": len(ready)})
+    
+    async def records():
+        summary = {"completed": 0, "cached": 0, "failed": 0, "failed_documents": []}
+        
+        def finish(record):
+            record = {"type": "document", **record}
+            if record.get("file_id") in filenames:
+                record["original_filename"] = filenames[record["file_id"]]
+            if record["status"] == "failed":
+                summary["failed"] += 1
+                summary["failed_documents"].append(record.get("file_id") or record.get("original_filename"))
+            else:
+                summary["completed"] += 1
+                summary["cached"] += int(record.get("cached", False))
+            return _ndjson(record)
+        
+        for record in ready:
+            yield finish(record)
+        
+        while documents is not None:
+            record = await documents.get()
+            if record is None:
+                break
+            yield finish(record)
+        
+        logger.info("Batch finished", extra={
+            "completed": summary["completed"], "cached": summary["cached"], "failed": summary["failed"]
+        })
+        yield _ndjson({"type": "summary", **summary})
+    
+    return records()
+
+@app.post("/process-batch/")
+async def process_batch(
+    request: Request,
+    batch: BatchRequest,
+    processing: ProcessingOptions = Depends(),
+    priority: str = Query("auto", description="Scheduling class: auto (bulk, interactive for small batches), interactive, normal or bulk", enum=PRIORITY_CHOICES)
+):
     """
-    Step 3: Download all processing results as a ZIP file
+    Process many uploaded PDFs with one set of options. Streams NDJSON: one line per document
+    as it finishes (status completed or failed), then a summary line.
     """
+    if not batch.file_ids:
+        raise HTTPException(status_code=400, detail="file_ids must not be empty")
+    if len(batch.file_ids) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files in one batch (max {BATCH_MAX_FILES})")
     
-    # Find the results folder
-    result_folders = list(UPLOAD_DIR.glob(f"{file_id}_*"))
+    options = processing.options
+    records = await start_batch(request, batch.file_ids, options, priority)
+    return StreamingResponse(records, media_type="application/x-ndjson")
+
+@app.post("/process-batch/upload")
+async def process_batch_upload(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    processing: ProcessingOptions = Depends(),
+    priority: str = Query("auto", description="Scheduling class: auto (bulk, interactive for small batches), interactive, normal or bulk", enum=PRIORITY_CHOICES)
+):
+    """
+    Upload and process many PDFs in one request. Files that fail validation are reported as
+    failed documents; the rest are processed as in /process-batch/.
+    """
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files in one batch (max {BATCH_MAX_FILES})")
+    
+    options = processing.options
+    
+    file_ids = []
+    filenames = {}
+    failed = []
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            failed.append({"original_filename": file.filename, "status": "failed", "error": "Only PDF files are allowed"})
+            continue
+        try:
+            file_id, size, content_hash = await save_upload_stream(_upload_file_chunks(file))
+        except HTTPException as e:
+            failed.append({"original_filename": file.filename, "status": "failed", "error": e.detail})
+            continue
+        file_ids.append(file_id)
+        filenames[file_id] = file.filename
+    
+    logger.info("Batch uploaded", extra={"saved": len(file_ids), "rejected": len(failed)})
     
+    records = await start_batch(request, file_ids, options, priority, failed=failed, filenames=filenames)
+    return StreamingResponse(records, media_type="application/x-ndjson")
+
+def _result_folders(file_id):
+    """All result folders (one per engine / force setting) for an uploaded file"""
+    STORAGE.fetch(file_id, results=True)
+    STORAGE.touch(file_id)
+    return STORAGE.result_folders(file_id)
+
+def _parse_artifact_types(artifacts):
+    if not artifacts:
+        return None
+    requested = {a.strip().lower() for a in artifacts.split(",") if a.strip()}
+    unknown = requested - ARTIFACT_TYPES.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown artifact type(s): {', '.join(sorted(unknown))}. Use: {', '.join(ARTIFACT_TYPES)}"
+        )
+    return set().union(*(ARTIFACT_TYPES[a] for a in requested))
+
+@app.get("/download-results/{file_id}")
+async def download_results(
+    file_id: str,
+    artifacts: str = Query(None, description="Comma-separated subset to include: markdown,csv,html,images,json,profile (default: all)")
+):
+    """
+    Step 3: Download all processing results as a ZIP file (streamed as it is built)
+    """
+    
+    with log_context(file_id=file_id):
+        suffixes = _parse_artifact_types(artifacts)
+        
+        # Find the results folder
+        result_folders = await asyncio.to_thread(_result_folders, file_id)
+        
+        if not result_folders:
+            raise HTTPException(status_code=404, detail=f"No results found for {file_id}. Process the PDF first.")
+        
+        # Collect files with their folder structure
+        files = []
+        for result_folder in result_folders:
+            for file_path, relative in result_files(result_folder, suffixes):
+                files.append((file_path, f"{result_folder.name}/{relative.as_posix()}"))
+        
+        if not files:
+            raise HTTPException(status_code=404, detail=f"No {artifacts} results found for {file_id}")
+        
+        logger.info("Streaming results for download", extra={"files": len(files)})
+        
+        # ZIP entries are compressed and sent as they're read - no temp file
+        return StreamingResponse(
+            _timed_zip(iter_zip(files)),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{file_id}_results.zip"'}
+        )
+
+@app.get("/results/{file_id}/artifacts")
+async def get_artifacts(
+    file_id: str,
+    artifacts: str = Query(None, description="Comma-separated subset to list: markdown,csv,html,images,json,profile (default: all)")
+):
+    """
+    List the result files for an uploaded PDF, with type, size, source page and SHA-256
+    """
+    suffixes = _parse_artifact_types(artifacts)
+    result_folders = await asyncio.to_thread(_result_folders, file_id)
     if not result_folders:
         raise HTTPException(status_code=404, detail=f"No results found for {file_id}. Process the PDF first.")
     
-    try:
-        # Create a temporary ZIP file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-            with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                
-                # Add all files from all result folders
-                for result_folder in result_folders:
-                    if result_folder.is_dir():
-                        folder_name = result_folder.name
-                        
-                        for file_path in result_folder.rglob('*'):
-                            if file_path.is_file():
-                                # Add file to ZIP with folder structure
-                                arcname = f"{folder_name}/{file_path.relative_to(result_folder)}"
-                                zipf.write(file_path, arcname)
-        
-        logger.info(f"Results packaged for download: {file_id}")
-        
-        # Return the ZIP file
-        return FileResponse(
-            path=temp_zip.name,
-            filename=f"{file_id}_results.zip",
-            media_type="application/zip"
+    listing = []
+    for result_folder in result_folders:
+        entries = await asyncio.to_thread(list_artifacts, result_folder, file_id, suffixes)
+        for entry in entries:
+            listing.append({
+                "result_folder": result_folder.name,
+                **entry,
+                "url": f"/results/{file_id}/{result_folder.name}/{entry['name']}"
+            })
+    
+    return {"file_id": file_id, "artifacts": listing}
+
+@app.get("/results/{file_id}/{result_folder}/{name}")
+async def get_artifact(file_id: str, result_folder: str, name: str, request: Request):
+    """
+    One result file, served directly. Supports If-None-Match (ETag = SHA-256) and single byte Ranges
+    """
+    folders = {folder.name: folder for folder in await asyncio.to_thread(_result_folders, file_id)}
+    artifact_path = find_artifact(folders[result_folder], name) if result_folder in folders else None
+    if artifact_path is None:
+        raise HTTPException(status_code=404, detail=f"Artifact {name} not found in {result_folder}")
+    
+    size = artifact_path.stat().st_size
+    etag = f'"{await asyncio.to_thread(file_sha256, artifact_path)}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+    media_type = MEDIA_TYPES[artifact_path.suffix.lower()]
+    
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    # A stale If-Range means the client's partial copy is outdated: send the whole file
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    
+    if byte_range is None:
+        return StreamingResponse(
+            iter_file(artifact_path),
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(size)}
         )
+    
+    start, end = byte_range
+    return StreamingResponse(
+        iter_file(artifact_path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"}
+    )
+
+# Lazy images: rendered from the uploaded PDF on first request, then served from disk
+IMAGE_MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+def _load_image_manifest(file_id, result_folder):
+    manifest_path = image_manifest_path(result_folder, file_id)
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+@app.get("/images/{file_id}")
+async def list_images(file_id: str):
+    """
+    Images recorded by lazy_images=true processing, with page, bounding box and URL
+    """
+    images = []
+    for result_folder in await asyncio.to_thread(_result_folders, file_id):
+        manifest = await asyncio.to_thread(_load_image_manifest, file_id, result_folder)
+        if manifest is None:
+            continue
+        for entry in manifest["images"]:
+            image_path = lazy_image_path(result_folder, file_id, manifest, entry["name"])
+            images.append({
+                **entry,
+                "result_folder": result_folder.name,
+                "rendered": image_path.exists(),
+                "url": f"/images/{file_id}/{result_folder.name}/{entry['name']}"
+            })
+    
+    if not images:
+        raise HTTPException(status_code=404, detail=f"No lazy images found for {file_id}. Process with lazy_images=true first.")
+    
+    return {"file_id": file_id, "images": images}
+
+@app.get("/images/{file_id}/{result_folder}/{image_name}")
+async def get_image(file_id: str, result_folder: str, image_name: str):
+    """
+    One lazily recorded image - rendered from the PDF on the first request, cached afterwards
+    """
+    with log_context(file_id=file_id):
+        folders = {folder.name: folder for folder in await asyncio.to_thread(_result_folders, file_id)}
+        if result_folder not in folders:
+            raise HTTPException(status_code=404, detail=f"No results {result_folder} for {file_id}")
         
-    except Exception as e:
-        logger.error(f"Download failed for {file_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
+        folder = folders[result_folder]
+        manifest = await asyncio.to_thread(_load_image_manifest, file_id, folder)
+        entry = next((e for e in (manifest or {}).get("images", []) if e["name"] == image_name), None)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Image {image_name} not found in {result_folder}")
+        
+        image_path = lazy_image_path(folder, file_id, manifest, image_name)
+        if not image_path.exists():
+            pdf_file_path = STORAGE.pdf_path(file_id)
+            if not pdf_file_path.exists():
+                raise HTTPException(status_code=410, detail=f"The PDF for {file_id} is gone; the image can't be rendered")
+            try:
+                await asyncio.to_thread(render_lazy_image, pdf_file_path, manifest, entry, image_path)
+            except Exception as e:
+                logger.error("Rendering lazy image failed", exc_info=True, extra={"image": image_name})
+                raise HTTPException(status_code=500, detail=f"Rendering failed: {str(e)}")
+            logger.info("Rendered lazy image", extra={"image": image_path.name})
+            await asyncio.to_thread(STORAGE.save_results, file_id)
+        
+        return FileResponse(image_path, media_type=IMAGE_MEDIA_TYPES[manifest["image_format"]])
 
 if __name__ == "__main__":
     import uvicorn
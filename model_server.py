@@ -0,0 +1,224 @@
+# Model Server - one process holds the docling / OCR models for every API worker on the host
+# Each uvicorn worker that loads its own layout, TableFormer and OCR weights adds their full size
+# to the pod's memory. With PDF_WORKER_MODE=server the API workers stay light (docling is never
+# imported there) and send conversions over a Unix socket to this process, which runs them on one
+# shared converter pool. Queues the API passes along (streamed pages, batch results) live here too.
+#
+#   python model_server.py --workers 4
+#   PDF_WORKER_MODE=server uvicorn main:app --workers 4
+#
+# Whoever connects may run any function on the server, so both the socket and the shared secret
+# live in a directory only this user can read (uploads/.model-server/ by default).
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Relative, like the upload paths: start the server and the API from the same directory
+RUN_DIR = Path("uploads") / ".model-server"
+DEFAULT_SOCKET = str(RUN_DIR / "models.sock")
+DEFAULT_AUTHKEY_FILE = str(RUN_DIR / "authkey")
+
+class ConversionService:
+    """Runs conversion functions in the model server, at most max_workers at a time"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, int(max_workers))
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def run(self, fn, args, kwargs):
+        with self._lock:
+            self.waiting += 1
+        with self._slots:
+            with self._lock:
+                self.waiting -= 1
+                self.running += 1
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            else:
+                with self._lock:
+                    self.completed += 1
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def stats(self):
+        from simple_pdf_processor import CONVERTER_POOL
+
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "max_workers": self.max_workers,
+                "waiting": self.waiting,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "converter_pool": CONVERTER_POOL.stats(),
+            }
+
+class ModelServerManager(BaseManager):
+    pass
+
+def _check_private(path):
+    """Refuse files and directories that other users could read or swap out"""
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{path} must be owned by this user and not accessible to others")
+
+def _private_dir(path):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_private(path)
+
+def _authkey(authkey=None):
+    """
+    The shared secret: authkey, else PDF_MODEL_SERVER_AUTHKEY, else the contents of
+    PDF_MODEL_SERVER_AUTHKEY_FILE - generated (mode 0600) by whichever side needs it first
+    """
+    authkey = authkey or os.environ.get("PDF_MODEL_SERVER_AUTHKEY")
+    if authkey:
+        return authkey.encode("utf-8")
+    path = os.environ.get("PDF_MODEL_SERVER_AUTHKEY_FILE", DEFAULT_AUTHKEY_FILE)
+    directory = os.path.dirname(path) or "."
+    _private_dir(directory)
+    if os.path.exists(path):
+        _check_private(path)
+    else:
+        # Written in full to a private temp file, then linked into place: the key file is
+        # never seen partially written, and if both sides race the first link wins
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".authkey-")
+        try:
+            with os.fdopen(fd, "w") as key_file:
+                key_file.write(secrets.token_hex(32))
+                key_file.flush()
+                os.fsync(key_file.fileno())
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                _check_private(path)
+        finally:
+            os.unlink(temp_path)
+    with open(path) as key_file:
+        key = key_file.read().strip()
+    if not key:
+        raise RuntimeError(f"Model server authkey file {path} is empty")
+    return key.encode("utf-8")
+
+def serve(socket_path, max_workers=2, warmup="", authkey=None):
+    """Load the warm-up converters, then serve conversions on socket_path until killed"""
+    from simple_pdf_processor import warm_up_converters
+    from structured_logging import configure_logging
+
+    configure_logging()
+    start_time = time.perf_counter()
+    failed = warm_up_converters(warmup)
+    logger.info("Model server warmed up", extra={
+        "seconds": round(time.perf_counter() - start_time, 3), "failed": [key.ocr_engine for key in failed]
+    })
+
+    # Queue proxies passed in by the API workers call back into this server - with our key
+    multiprocessing.current_process().authkey = _authkey(authkey)
+    service = ConversionService(max_workers)
+    # One converter per concurrent conversion here, unless set explicitly
+    if "PDF_CONVERTER_INSTANCES" not in os.environ:
+        from simple_pdf_processor import CONVERTER_POOL
+        CONVERTER_POOL.instances_per_key = service.max_workers
+    ModelServerManager.register("service", callable=lambda: service)
+    ModelServerManager.register("Queue", callable=queue.Queue)
+
+    if socket_path == DEFAULT_SOCKET:
+        _private_dir(RUN_DIR)
+    # A socket left behind by a killed server would make the bind fail
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    old_umask = os.umask(0o177)  # socket readable by this user only
+    try:
+        server = ModelServerManager(address=socket_path, authkey=_authkey(authkey)).get_server()
+    finally:
+        os.umask(old_umask)
+    logger.info("Model server listening", extra={"socket": socket_path, "max_workers": service.max_workers})
+    server.serve_forever()
+
+class ModelServerExecutor:
+    """
+    Client side, shaped like a concurrent.futures executor: submit(fn, ...) runs fn on the model
+    server from a local thread. Connects on first use, waiting up to connect_timeout seconds for
+    the server to come up. fn and its arguments must pickle, as in process mode.
+    """
+
+    def __init__(self, socket_path, max_workers, authkey=None, connect_timeout=120.0):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self._authkey = authkey
+        self._manager = None
+        self._service = None
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-model-client")
+
+    def _connect(self):
+        with self._lock:
+            if self._service is None:
+                ModelServerManager.register("service")
+                ModelServerManager.register("Queue")
+                deadline = time.monotonic() + self.connect_timeout
+                while True:
+                    manager = ModelServerManager(address=self.socket_path, authkey=_authkey(self._authkey))
+                    try:
+                        manager.connect()
+                        break
+                    except (FileNotFoundError, ConnectionRefusedError):
+                        if time.monotonic() > deadline:
+                            raise RuntimeError(f"Model server not reachable at {self.socket_path}") from None
+                        time.sleep(0.5)
+                self._manager = manager
+                self._service = manager.service()
+            return self._service
+
+    def _run(self, fn, args, kwargs):
+        return self._connect().run(fn, args, kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        return self._threads.submit(self._run, fn, args, kwargs)
+
+    def make_queue(self):
+        """Queue held by the model server, so tasks there put() to it directly"""
+        self._connect()
+        return self._manager.Queue()
+
+    def stats(self):
+        return self._connect().stats()
+
+    def shutdown(self, wait=True):
+        self._threads.shutdown(wait=wait)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared model server for the PDF API workers")
+    parser.add_argument("--socket", default=os.environ.get("PDF_MODEL_SERVER", DEFAULT_SOCKET), help="Unix socket to listen on")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PDF_MODEL_SERVER_WORKERS", "2")), help="Conversions running at the same time")
+    parser.add_argument("--warmup", default=os.environ.get("PDF_CONVERTER_WARMUP", "rapidocr:true:true:true"), help="Converters to load before serving (as PDF_CONVERTER_WARMUP)")
+    args = parser.parse_args(argv)
+    serve(args.socket, args.workers, args.warmup)
+
+if __name__ == "__main__":
+    main()
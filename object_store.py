@@ -0,0 +1,149 @@
+# Object Store - where uploads and results are kept so every API replica can reach them
+# UploadStorage keeps a local working copy (docling needs a file on disk) and mirrors it to an
+# ObjectStore: a shared directory (e.g. an NFS mount) or an S3-compatible bucket (AWS, MinIO...).
+# Keys mirror the local layout: files/<id[:2]>/<id>/<relative path>.
+
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+class ObjectStore(ABC):
+    """Flat key -> bytes store; keys use "/" separators"""
+    name = None
+
+    @abstractmethod
+    def put_file(self, key, path):
+        pass
+
+    @abstractmethod
+    def get_file(self, key, path):
+        """Download key to path (atomically - readers never see a partial file)"""
+
+    @abstractmethod
+    def exists(self, key):
+        pass
+
+    @abstractmethod
+    def list(self, prefix):
+        """{key: size} for every object under prefix"""
+
+def _partial_path(path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+
+class LocalObjectStore(ObjectStore):
+    """Objects as files under a directory, e.g. a volume shared by all replicas"""
+    name = "local"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Key escapes the store: {key!r}")
+        return path
+
+    def put_file(self, key, path):
+        target = self._path(key)
+        partial = _partial_path(target)
+        shutil.copyfile(path, partial)
+        os.replace(partial, target)
+
+    def get_file(self, key, path):
+        partial = _partial_path(path)
+        try:
+            shutil.copyfile(self._path(key), partial)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        os.replace(partial, path)
+
+    def exists(self, key):
+        return self._path(key).is_file()
+
+    def list(self, prefix):
+        base = self._path(prefix)
+        if not base.is_dir():
+            return {}
+        root = self.root.resolve()
+        return {
+            path.relative_to(root).as_posix(): path.stat().st_size
+            for path in base.rglob("*")
+            if path.is_file() and not path.name.endswith(".part")
+        }
+
+class S3ObjectStore(ObjectStore):
+    """
+    Objects in an S3-compatible bucket (set endpoint_url for MinIO and other stand-ins).
+
+    One boto3 client is shared by every thread, so HTTP connections are pooled (up to
+    max_connections). Files above multipart_mb are uploaded and downloaded in parallel
+    multipart chunks, streamed from / to disk.
+    Credentials come from the usual AWS environment variables or config files.
+    """
+    name = "s3"
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, region_name=None, max_connections=10, multipart_mb=8):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("The s3 storage backend needs boto3: pip install boto3") from None
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region_name or None,
+            config=Config(max_pool_connections=max_connections, retries={"max_attempts": 5, "mode": "standard"})
+        )
+        chunk_size = multipart_mb * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=max(1, max_connections // 2)
+        )
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def put_file(self, key, path):
+        self.client.upload_file(str(path), self.bucket, self._key(key), Config=self.transfer_config)
+
+    def get_file(self, key, path):
+        from botocore.exceptions import ClientError
+
+        partial = _partial_path(path)
+        try:
+            self.client.download_file(self.bucket, self._key(key), str(partial), Config=self.transfer_config)
+        except ClientError as e:
+            partial.unlink(missing_ok=True)
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise KeyError(key) from None
+            raise
+        os.replace(partial, path)
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def list(self, prefix):
+        objects = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                objects[obj["Key"][len(self.prefix):]] = obj["Size"]
+        return objects
@@ -0,0 +1,222 @@
+# Result Cache - content-addressed store of finished conversions
+# Keyed on SHA-256(PDF bytes) + processing options, so resubmitting an identical PDF with
+# identical options just hardlinks the stored artifacts instead of running docling again.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+ENTRY_FILE = "entry.json"
+
+def make_cache_key(content_hash, options):
+    """Cache key for one PDF content hash + one set of processing options"""
+    payload = json.dumps({"content": content_hash, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _copy_artifact(src, dst):
+    shutil.copyfile(src, dst)
+
+def _link_artifact(src, dst):
+    """
+    Put the cached file src at dst: skipped when dst already holds it (same inode, or same
+    size and mtime), else hardlinked - copied (mtime kept) across filesystems
+    """
+    src_stat = src.stat()
+    try:
+        dst_stat = dst.stat()
+    except FileNotFoundError:
+        pass
+    else:
+        if (dst_stat.st_dev, dst_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino) or (
+            dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+        ):
+            return
+    partial = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.part")
+    try:
+        os.link(src, partial)
+    except OSError:
+        shutil.copy2(src, partial)
+    os.replace(partial, dst)
+
+def detach_links(folder):
+    """
+    Unlink the files in folder that share their inode with a cached copy. Conversions call
+    this before writing a result folder: they rewrite files in place (open(..., "w")
+    truncates the inode), which would otherwise corrupt the cache entry the files came from.
+    """
+    for path in Path(folder).iterdir():
+        try:
+            if path.is_file() and path.stat().st_nlink > 1:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+class ResultCache:
+    """
+    Artifacts of finished conversions, stored under root/<key[:2]>/<key>/.
+
+    Args:
+        root: Cache directory
+        max_bytes: Evict least-recently-used entries above this total size (0 = unlimited)
+        max_age_seconds: Evict entries not used for this long (0 = never)
+    """
+
+    def __init__(self, root, max_bytes=0, max_age_seconds=0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.max_age_seconds = float(max_age_seconds)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _entry_dir(self, key):
+        return self.root / key[:2] / key
+
+    def fetch(self, key, target_folder, stem):
+        """
+        Materialize a cached result into target_folder, renaming artifacts from the
+        cached PDF's stem to `stem`. Returns the result dict, or None on a miss.
+        """
+        entry_dir = self._entry_dir(key)
+        entry_file = entry_dir / ENTRY_FILE
+        try:
+            entry = json.loads(entry_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        target_folder = Path(target_folder)
+        target_folder.mkdir(parents=True, exist_ok=True)
+        try:
+            for src in entry_dir.iterdir():
+                if src.name == ENTRY_FILE:
+                    continue
+                _link_artifact(src, target_folder / self._rename(src.name, entry["stem"], stem))
+        except FileNotFoundError:
+            # Evicted while we were reading it
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # mtime of entry.json doubles as the last-access time for LRU/TTL eviction
+        os.utime(entry_file)
+        with self._lock:
+            self.hits += 1
+
+        result = dict(entry["result"])
+        if result.get("text_file"):
+            result["text_file"] = target_folder / self._rename(result["text_file"], entry["stem"], stem)
+        result["output_folder"] = target_folder
+        return result
+
+    def store(self, key, result_folder, stem, result):
+        """Copy a finished result folder into the cache under key"""
+        result_folder = Path(result_folder)
+        entry_dir = self._entry_dir(key)
+        if (entry_dir / ENTRY_FILE).exists():
+            return
+
+        staging_dir = self.root / f".staging-{uuid.uuid4().hex}"
+        staging_dir.mkdir(parents=True)
+        size_bytes = 0
+        try:
+            for src in result_folder.iterdir():
+                if src.is_file():
+                    _copy_artifact(src, staging_dir / src.name)
+                    size_bytes += src.stat().st_size
+
+            # Keep the result's extra fields (e.g. per-page OCR decisions); paths are stored relative.
+            # Timings describe the run that produced the entry, not a later cache hit
+            cached_result = {
+                k: v for k, v in result.items() if k not in ("text_file", "output_folder", "timings", "profile_file")
+            }
+            text_file = result.get("text_file")
+            cached_result["text_file"] = Path(text_file).name if text_file else None
+            entry = {
+                "stem": stem,
+                "created_at": time.time(),
+                "size_bytes": size_bytes,
+                "result": cached_result,
+            }
+            (staging_dir / ENTRY_FILE).write_text(json.dumps(entry), encoding="utf-8")
+
+            entry_dir.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging_dir, entry_dir)
+        except OSError:
+            # Lost a race with an identical store (or the disk is full) - caching is best effort
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def evict(self):
+        """Drop entries older than max_age_seconds, then LRU entries until under max_bytes"""
+        if not self.max_bytes and not self.max_age_seconds:
+            return 0
+
+        entries = []
+        for entry_file in self.root.glob(f"*/*/{ENTRY_FILE}"):
+            try:
+                last_used = entry_file.stat().st_mtime
+                size_bytes = json.loads(entry_file.read_text(encoding="utf-8")).get("size_bytes", 0)
+            except (OSError, ValueError):
+                continue
+            entries.append((last_used, size_bytes, entry_file.parent))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        now = time.time()
+        evicted = 0
+
+        for last_used, size_bytes, entry_dir in entries:
+            expired = self.max_age_seconds and now - last_used > self.max_age_seconds
+            over_budget = self.max_bytes and total_bytes > self.max_bytes
+            if not expired and not over_budget:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= size_bytes
+            evicted += 1
+
+        with self._lock:
+            self.evictions += evicted
+        return evicted
+
+    def stats(self):
+        entries = 0
+        size_bytes = 0
+        for entry_file in self.root.glob(f"*/*/{ENTRY_FILE}"):
+            try:
+                size_bytes += json.loads(entry_file.read_text(encoding="utf-8")).get("size_bytes", 0)
+                entries += 1
+            except (OSError, ValueError):
+                continue
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_mb": round(size_bytes / (1024 * 1024), 1),
+                "max_mb": self.max_bytes // (1024 * 1024),
+                "max_age_hours": round(self.max_age_seconds / 3600, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def _rename(name, old_stem, new_stem):
+        return new_stem + name[len(old_stem):] if name.startswith(old_stem) else name
@@ -0,0 +1,189 @@
+# Scheduler - decides which queued conversion a free worker runs next
+# Priority classes share the workers by weight and, inside a class, every client gets an equal
+# share (stride scheduling over estimated cost), so one client flooding the queue with 500-page
+# full-OCR documents can't starve everyone else, and small interactive documents go first.
+
+import hashlib
+import itertools
+from collections import deque
+
+# Priority class -> weight: while all classes have work queued, each gets workers in proportion
+PRIORITY_CLASSES = {"interactive": 8, "normal": 4, "bulk": 1}
+PRIORITY_CHOICES = ["auto", *PRIORITY_CLASSES]
+DEFAULT_PRIORITY = "normal"
+
+# Relative per-page cost of each OCR setting (full-page OCR = 1); table structure adds a share
+PAGE_COSTS = {"fast": 0.05, False: 0.4, "auto": 0.6, True: 1.0}
+TABLES_COST_FACTOR = 1.25
+
+def estimate_cost(pages, options):
+    """Cost of a conversion: pages × per-page cost of its OCR mode"""
+    if options.get("mode") == "fast":
+        per_page = PAGE_COSTS["fast"]
+    else:
+        per_page = PAGE_COSTS.get(options.get("force_full_page_ocr", True), 1.0)
+        if options.get("extract_tables", True):
+            per_page *= TABLES_COST_FACTOR
+    return max(1, pages) * per_page
+
+def classify(requested, cost, interactive_max_cost, default=DEFAULT_PRIORITY):
+    """
+    Priority class for a request. "auto" makes small documents interactive and everything else
+    `default`; asking for interactive is only honored for small documents.
+    """
+    if requested in (None, "auto"):
+        return "interactive" if cost <= interactive_max_cost else default
+    if requested not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority: {requested} (use {', '.join(PRIORITY_CHOICES)})")
+    if requested == "interactive" and cost > interactive_max_cost:
+        return "normal"
+    return requested
+
+def client_key(api_key=None, client_id=None, address=None):
+    """Fair-share identity: API key (hashed - it ends up in stats), client header, or address"""
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    if client_id:
+        return "client:" + client_id[:64]
+    return "addr:" + (address or "unknown")
+
+def parse_weights(spec):
+    """"interactive:8,normal:4,bulk:1" -> {class: weight}"""
+    weights = dict(PRIORITY_CLASSES)
+    for part in (spec or "").split(","):
+        if part.strip():
+            name, _, weight = part.strip().partition(":")
+            if name not in PRIORITY_CLASSES:
+                raise ValueError(f"Unknown priority class: {name}")
+            weights[name] = max(0.01, float(weight))
+    return weights
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+class _Stride:
+    """Lanes with a "pass" each: the active lane with the lowest pass runs next and is charged cost / weight"""
+
+    def __init__(self):
+        self.passes = {}
+        self.vtime = 0.0
+
+    def activate(self, name):
+        # A lane that was idle starts at the current virtual time - no banked credit
+        self.passes[name] = max(self.passes.get(name, 0.0), self.vtime)
+
+    def deactivate(self, name):
+        # Forget lanes without outstanding debt, so the table only holds recent clients
+        if self.passes.get(name, 0.0) <= self.vtime:
+            self.passes.pop(name, None)
+
+    def pick(self, active):
+        name = min(active, key=lambda n: (self.passes[n], n))
+        self.vtime = self.passes[name]
+        return name
+
+    def charge(self, name, cost, weight=1.0):
+        self.passes[name] += cost / weight
+
+class FairQueue:
+    """
+    Pending conversions, by priority class and client.
+
+    Args:
+        weights: Priority class -> weight (default: PRIORITY_CLASSES)
+        policy: "fair" (weighted classes, equal share per client) or "fifo" (arrival order)
+        wait_samples: Recent wait times kept per class for p50 / p99
+    """
+
+    def __init__(self, weights=None, policy="fair", wait_samples=1000):
+        if policy not in ("fair", "fifo"):
+            raise ValueError(f"Unsupported scheduling policy: {policy}")
+        self.weights = dict(weights or PRIORITY_CLASSES)
+        self.policy = policy
+
+        self._lanes = {name: {} for name in self.weights}  # class -> client -> deque of (seq, item, cost)
+        self._classes = _Stride()
+        self._clients = {name: _Stride() for name in self.weights}
+        self._seq = itertools.count()
+        self._size = 0
+        self._per_client = {}
+
+        self._waits = {name: deque(maxlen=wait_samples) for name in self.weights}
+        self._started = {name: 0 for name in self.weights}
+
+    def __len__(self):
+        return self._size
+
+    def pending_for(self, client):
+        return self._per_client.get(client, 0)
+
+    def push(self, item, priority=DEFAULT_PRIORITY, client=None, cost=1.0):
+        lanes = self._lanes[priority]
+        if not lanes:
+            self._classes.activate(priority)
+        if client not in lanes:
+            lanes[client] = deque()
+            self._clients[priority].activate(client)
+        lanes[client].append((next(self._seq), item, cost))
+        self._size += 1
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+
+    def pop(self):
+        """Next (item, priority, client) to run; IndexError when empty"""
+        if not self._size:
+            raise IndexError("pop from an empty FairQueue")
+
+        if self.policy == "fifo":
+            priority, client = min(
+                ((p, c) for p, lanes in self._lanes.items() for c in lanes),
+                key=lambda pc: self._lanes[pc[0]][pc[1]][0][0]
+            )
+        else:
+            priority = self._classes.pick([p for p, lanes in self._lanes.items() if lanes])
+            client = self._clients[priority].pick(list(self._lanes[priority]))
+
+        lanes = self._lanes[priority]
+        _, item, cost = lanes[client].popleft()
+        self._classes.charge(priority, cost, self.weights[priority])
+        self._clients[priority].charge(client, cost)
+
+        if not lanes[client]:
+            del lanes[client]
+            self._clients[priority].deactivate(client)
+        if not lanes:
+            self._classes.deactivate(priority)
+        self._size -= 1
+        self._per_client[client] -= 1
+        if not self._per_client[client]:
+            del self._per_client[client]
+        return item, priority, client
+
+    def drain(self):
+        """Remove and return every pending item"""
+        items = []
+        while self._size:
+            items.append(self.pop()[0])
+        return items
+
+    def record_wait(self, priority, seconds):
+        self._waits[priority].append(seconds)
+        self._started[priority] += 1
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "classes": {
+                name: {
+                    "weight": self.weights[name],
+                    "queued": sum(len(lane) for lane in self._lanes[name].values()),
+                    "clients_queued": len(self._lanes[name]),
+                    "started": self._started[name],
+                    "wait_seconds_p50": _percentile(self._waits[name], 0.5),
+                    "wait_seconds_p99": _percentile(self._waits[name], 0.99),
+                }
+                for name in self.weights
+            },
+        }
@@ -2,8 +2,18 @@
 # Processes PDFs with 4 OCR engines × 2 force settings each (now with working image extraction)
 
 import os
+import fcntl
+import hashlib
+import json
 import time
+import statistics
+import logging
 import signal
+import cProfile
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from pathlib import Path
 import base64
 
@@ -11,23 +21,42 @@ import base64
 os.environ['TESSDATA_PREFIX'] = '/opt/homebrew/opt/tesseract/share/tessdata'
 os.environ['PATH'] = os.environ['PATH'] + ':/opt/homebrew/bin'
 
-from docling_core.types.doc import ImageRefMode, PictureItem, TableItem
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import (
-    PdfPipelineOptions, 
-    TesseractOcrOptions,
-    EasyOcrOptions,
-    RapidOcrOptions,
-    OcrMacOptions
-)
-from docling.document_converter import DocumentConverter, PdfFormatOption
+# docling, docling_core and the OCR engine options are imported inside the functions that
+# use them: importing this module stays cheap (fast worker startup, reloads, benchmarks), and
+# only engines that are actually used (or preloaded via PDF_CONVERTER_WARMUP) get loaded.
+
+from converter_pool import ConverterPool, ConverterKey, parse_converter_keys
+from artifacts import IMAGE_MANIFEST_SUFFIX, write_page_index
+from result_cache import detach_links
+from metrics import StageTimer, record_stage
+from structured_logging import ITEMS_LOGGER, configure_logging, log_context
+
+logger = logging.getLogger(__name__)
+# Per-table / per-image records: DEBUG, emitted only when PDF_LOG_ITEMS is on
+item_logger = logging.getLogger(ITEMS_LOGGER)
 
 class TimeoutError(Exception):
     pass
 
+class ConversionCancelled(Exception):
+    pass
+
+# Progress stages reported to progress_callback(stage, state) - docling runs layout
+# analysis, OCR and table structure together per page batch, so they share one stage
+PROCESSING_STAGES = ["layout_ocr", "tables", "images", "markdown"]
+
+def _report_stage(progress_callback, cancel_check, stage, state):
+    """Report a stage transition, and stop here if the caller asked to cancel"""
+    if state == "running" and cancel_check is not None and cancel_check():
+        raise ConversionCancelled(f"Cancelled before stage: {stage}")
+    if progress_callback is not None:
+        progress_callback(stage, state)
+
 def timeout_handler(signum, frame):
     raise TimeoutError("OCR operation timed out")
 
+# SIGALRM-based: main thread only, and can't interrupt native OCR code. Kept for callers that
+# still use it; benchmark runs use benchmark.run_benchmark_matrix's process-level timeouts.
 def run_with_timeout(func, timeout_seconds, *args, **kwargs):
     old_handler = signal.signal(signal.SIGALRM, timeout_handler)
     signal.alarm(timeout_seconds)
@@ -40,15 +69,11 @@ def run_with_timeout(func, timeout_seconds, *args, **kwargs):
     finally:
         signal.signal(signal.SIGALRM, old_handler)
 
-def _process_pdf_with_engine(
-    pdf_path, 
-    output_dir, 
-    ocr_engine, 
-    force_full_page_ocr, 
-    extract_tables=True, 
-    extract_images=True
-):
-    """Process single PDF with specific OCR engine and force setting - FIXED IMAGE EXTRACTION"""
+# ================== CONVERTER POOL ==================
+
+def _build_pipeline_options(ocr_engine, force_full_page_ocr, extract_tables=True, extract_images=True, images_scale=2.0):
+    """Build docling PDF pipeline options for one OCR engine / force setting"""
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
     
     # Configure pipeline - WITH THE MISSING IMAGE SETTINGS!
     pipeline_options = PdfPipelineOptions()
@@ -58,108 +83,1059 @@ def _process_pdf_with_engine(
     # 🔥 THE CRITICAL SETTINGS WE WERE MISSING FOR IMAGE EXTRACTION:
     if extract_images:
         pipeline_options.generate_picture_images = True  # ← THIS WAS THE MISSING PIECE!
-        pipeline_options.images_scale = 2.0  # High quality images (2.0 = 144 DPI)
+        pipeline_options.images_scale = images_scale  # 2.0 = 144 DPI (default), 1.0 = 72 DPI
     
     if extract_tables:
         pipeline_options.table_structure_options.do_cell_matching = True
     
-    # Set OCR engine
+    # Set OCR engine (only the chosen engine's options are imported)
     if ocr_engine == "easyocr":
+        from docling.datamodel.pipeline_options import EasyOcrOptions
         ocr_options = EasyOcrOptions(force_full_page_ocr=force_full_page_ocr)
     elif ocr_engine == "tesseract":
+        from docling.datamodel.pipeline_options import TesseractOcrOptions
         ocr_options = TesseractOcrOptions(force_full_page_ocr=force_full_page_ocr, lang=["auto"])
     elif ocr_engine == "rapidocr":
+        from docling.datamodel.pipeline_options import RapidOcrOptions
         ocr_options = RapidOcrOptions(force_full_page_ocr=force_full_page_ocr)
     elif ocr_engine == "ocrmac":
+        from docling.datamodel.pipeline_options import OcrMacOptions
         ocr_options = OcrMacOptions(force_full_page_ocr=force_full_page_ocr)
     else:
         raise ValueError(f"Unsupported OCR engine: {ocr_engine}")
     
     pipeline_options.ocr_options = ocr_options
+    return pipeline_options
+
+def _build_converter(key):
+    """Build a DocumentConverter for a ConverterKey and load its models up front"""
+    with record_stage("docling_import"):
+        from docling.datamodel.base_models import InputFormat
+        from docling.datamodel.settings import settings as docling_settings
+        from docling.document_converter import DocumentConverter, PdfFormatOption
+    
+    # Process-wide docling settings - the same for every converter, never changed per batch
+    docling_settings.perf.doc_batch_size = BATCH_CONCURRENCY
+    docling_settings.perf.doc_batch_concurrency = BATCH_CONCURRENCY
+    
+    pipeline_options = _build_pipeline_options(
+        key.ocr_engine,
+        key.force_full_page_ocr,
+        key.extract_tables,
+        key.extract_images,
+        key.images_scale
+    )
     
-    # Initialize converter
     doc_converter = DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
         }
     )
+    # Load layout / TableFormer / OCR models now instead of on the first convert()
+    with record_stage("model_load"):
+        doc_converter.initialize_pipeline(InputFormat.PDF)
+    return doc_converter
+
+# Shared by every request in this process - converters are rebuilt only on a miss
+CONVERTER_POOL = ConverterPool(
+    _build_converter,
+    max_entries=int(os.environ.get("PDF_CONVERTER_POOL_SIZE", "4")),
+    memory_budget_mb=int(os.environ.get("PDF_CONVERTER_POOL_MEMORY_MB", "0")),
+    # Same-settings conversions that may run at once - by default as many as the worker pool
+    # runs. Instances are only built when that many conversions actually overlap (each holds
+    # its own models)
+    instances_per_key=int(os.environ.get("PDF_CONVERTER_INSTANCES", os.environ.get("PDF_WORKER_COUNT", "2")))
+)
+
+def checkout_converter(ocr_engine, force_full_page_ocr, extract_tables=True, extract_images=True, images_scale=2.0):
+    """Check out a warm DocumentConverter for these settings from the process-wide pool (context manager)"""
+    # images_scale only matters when bitmaps are generated - don't split the pool otherwise
+    images_scale = float(images_scale) if extract_images else 2.0
+    return CONVERTER_POOL.checkout(
+        ConverterKey(ocr_engine, bool(force_full_page_ocr), bool(extract_tables), bool(extract_images), images_scale)
+    )
+
+def warm_up_converters(spec):
+    """
+    Load converters for a warm-up spec ("engine:force:tables:images,...") into this
+    process's pool. Also used as the initializer of worker processes.
+    Returns the keys that failed to load.
+    """
+    failed = []
+    for key in parse_converter_keys(spec):
+        try:
+            CONVERTER_POOL.warm_up([key])
+            logger.info("Converter warmed up", extra={"converter": key._asdict()})
+        except Exception:
+            # A broken engine shouldn't stop the others from warming up
+            logger.error("Converter warm-up failed", exc_info=True, extra={"converter": key._asdict()})
+            failed.append(key)
+    return failed
+
+def init_worker_process(spec):
+    """Worker process initializer: set up structured logging, then warm up converters"""
+    configure_logging()
+    warm_up_converters(spec)
+
+def force_suffix_for(force_full_page_ocr):
+    """Folder/file suffix for a force setting: force_true, force_false or force_auto"""
+    if force_full_page_ocr == "auto":
+        return "force_auto"
+    return "force_true" if force_full_page_ocr else "force_false"
+
+def result_folder_name(pdf_stem, ocr_engine, force_full_page_ocr, mode="full"):
+    """Name of the output folder for one PDF / engine / force setting (or fast mode)"""
+    if mode == "fast":
+        return f"{pdf_stem}_fast"
+    return f"{pdf_stem}_{ocr_engine}_{force_suffix_for(force_full_page_ocr)}"
+
+# ================== PAGE-RANGE SHARDING ==================
+
+# Persistent pool for shard conversions - its worker processes keep their own converters warm.
+# Each one loads a full model set, so the default stays well below the CPU count.
+SHARD_WORKERS = int(os.environ.get("PDF_SHARD_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 4)))))
+_shard_executor = None
+_shard_executor_lock = threading.Lock()
+
+def _get_shard_executor():
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            # spawn, not fork: this process may already hold warm converters, and ONNX Runtime /
+            # torch / tesserocr state copied by fork() can hang in the child
+            _shard_executor = ProcessPoolExecutor(
+                max_workers=SHARD_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _shard_executor
+
+def get_page_count(pdf_path):
+    """Number of pages in a PDF (read with pypdfium2, which docling already depends on)"""
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def split_page_ranges(page_count, shards):
+    """Split pages 1..page_count into at most `shards` contiguous (start, end) ranges (1-based, inclusive)"""
+    shards = max(1, min(int(shards), page_count))
+    base, extra = divmod(page_count, shards)
+    ranges = []
+    start = 1
+    for i in range(shards):
+        end = start + base + (1 if i < extra else 0) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+def _convert_document(pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, page_range=None, images_scale=2.0):
+    """Run docling on a PDF (or one page range of it) with a pooled converter"""
     
-    # Convert document
-    conv_res = doc_converter.convert(str(pdf_path))
+    # Reuse a cached converter (models stay loaded between calls), ours alone while converting
+    with checkout_converter(ocr_engine, force_full_page_ocr, extract_tables, extract_images, images_scale) as doc_converter:
+        if page_range is None:
+            conv_res = doc_converter.convert(str(pdf_path))
+        else:
+            conv_res = doc_converter.convert(str(pdf_path), page_range=page_range)
     
     if conv_res is None:
         raise Exception("Failed to convert document")
     
-    doc_filename = pdf_path.stem
-    extracted_images = 0
+    return conv_res.document
+
+def _convert_shard(pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, page_range, images_scale=2.0):
+    """Shard worker: convert one page range, returned as a plain dict so it pickles cheaply"""
+    document = _convert_document(
+        pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, page_range, images_scale
+    )
+    return document.export_to_dict()
+
+def _convert_segments(pdf_path, ocr_engine, extract_tables, extract_images, segments, parallel=True, images_scale=2.0):
+    """
+    Convert a list of ((start, end), force_full_page_ocr) page-range segments, in parallel
+    worker processes when `parallel` is set. Returns the segment documents in page order.
+    """
+    if not parallel or len(segments) == 1:
+        return [
+            _convert_document(pdf_path, ocr_engine, force, extract_tables, extract_images, page_range, images_scale)
+            for page_range, force in segments
+        ]
     
-    # ================== TABLE EXTRACTION ==================
-    if extract_tables:
-        if conv_res.document.tables:
-            for table_ix, table in enumerate(conv_res.document.tables):
-                table_df = table.export_to_dataframe()
-                csv_filename = Path(output_dir) / f"{doc_filename}-table-{table_ix + 1}.csv"
-                table_df.to_csv(csv_filename, index=False)
-                
-                html_filename = Path(output_dir) / f"{doc_filename}-table-{table_ix + 1}.html"
-                with html_filename.open("w") as fp:
-                    fp.write(table.export_to_html(doc=conv_res.document))
-
-    # ================== IMAGE EXTRACTION (FIXED METHOD!) ==================
-    if extract_images:
-        print(f"🖼️  Extracting Images using FIXED METHOD...")
+    executor = _get_shard_executor()
+    futures = [
+        executor.submit(
+            _convert_shard,
+            pdf_path, ocr_engine, force, extract_tables, extract_images, page_range, images_scale
+        )
+        for page_range, force in segments
+    ]
+    from docling_core.types.doc import DoclingDocument
+    return [DoclingDocument.model_validate(future.result()) for future in futures]
+
+def _convert_sharded(pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, shards, images_scale=2.0):
+    """
+    Convert a PDF as `shards` page ranges in parallel worker processes.
+    Returns the per-shard documents in page order.
+    """
+    page_ranges = split_page_ranges(get_page_count(pdf_path), shards)
+    if len(page_ranges) == 1:
+        return [_convert_document(
+            pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, images_scale=images_scale
+        )]
+    
+    logger.info("Sharding into page ranges", extra={"pages": page_ranges[-1][1], "page_ranges": page_ranges})
+    
+    segments = [(page_range, force_full_page_ocr) for page_range in page_ranges]
+    return _convert_segments(pdf_path, ocr_engine, extract_tables, extract_images, segments, images_scale=images_scale)
+
+# ================== ADAPTIVE OCR ==================
+
+# A page keeps its embedded text layer (no full-page OCR) only if it has enough clean text
+AUTO_OCR_MIN_CHARS = int(os.environ.get("PDF_AUTO_OCR_MIN_CHARS", "50"))
+AUTO_OCR_MAX_GARBAGE_RATIO = float(os.environ.get("PDF_AUTO_OCR_MAX_GARBAGE_RATIO", "0.1"))
+# ... and if that text covers enough of the page - a scan with only a text header or page
+# number has a few dozen clean characters but nothing else
+AUTO_OCR_MIN_COVERAGE = float(os.environ.get("PDF_AUTO_OCR_MIN_COVERAGE", "0.02"))
+
+def _is_garbage_char(char):
+    # U+FFFD / private-use glyphs / stray control codes come from fonts without a usable
+    # ToUnicode map - the text layer "exists" but reads as nonsense
+    code = ord(char)
+    if char in "\n\r\t ":
+        return False
+    return code == 0xFFFD or 0xE000 <= code <= 0xF8FF or code < 0x20 or 0x7F <= code < 0xA0
+
+def _text_coverage(page, textpage):
+    """Share of the page area covered by text runs"""
+    width, height = page.get_size()
+    if not width or not height:
+        return 0.0
+    text_area = 0.0
+    for rect_index in range(textpage.count_rects()):
+        left, bottom, right, top = textpage.get_rect(rect_index)
+        text_area += max(0.0, right - left) * max(0.0, top - bottom)
+    return min(1.0, text_area / (width * height))
+
+def _text_layer_verdict(text, text_coverage):
+    """(chars, garbage_ratio, path, reason) for one page's text layer"""
+    visible = [c for c in text if not c.isspace()]
+    garbage = sum(1 for c in visible if _is_garbage_char(c))
+    garbage_ratio = garbage / len(visible) if visible else 0.0
+    
+    if len(visible) < AUTO_OCR_MIN_CHARS:
+        path, reason = "full_page_ocr", "no_text_layer"
+    elif garbage_ratio > AUTO_OCR_MAX_GARBAGE_RATIO:
+        path, reason = "full_page_ocr", "garbled_text"
+    elif text_coverage < AUTO_OCR_MIN_COVERAGE:
+        path, reason = "full_page_ocr", "sparse_text_layer"
+    else:
+        path, reason = "text_layer", "text_layer_ok"
+    return len(visible), garbage_ratio, path, reason
+
+def analyze_text_layer(pdf_path):
+    """
+    Inspect each page's embedded text layer with pypdfium2 and decide whether it needs
+    full-page OCR. Returns one dict per page: page, chars, garbage_ratio, text_coverage,
+    path ("text_layer" or "full_page_ocr") and reason.
+    """
+    import pypdfium2 as pdfium
+    
+    pages = []
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+                text_coverage = _text_coverage(page, textpage)
+            finally:
+                textpage.close()
+                page.close()
+            
+            chars, garbage_ratio, path, reason = _text_layer_verdict(text, text_coverage)
+            pages.append({
+                "page": page_index + 1,
+                "chars": chars,
+                "garbage_ratio": round(garbage_ratio, 3),
+                "text_coverage": round(text_coverage, 3),
+                "path": path,
+                "reason": reason,
+            })
+    finally:
+        pdf.close()
+    
+    return pages
+
+def _plan_ocr_segments(ocr_pages, shards=1):
+    """
+    Group pages into contiguous ((start, end), force_full_page_ocr) runs, then split runs
+    further so the total comes close to `shards` segments.
+    """
+    runs = []
+    for page in ocr_pages:
+        force = page["path"] == "full_page_ocr"
+        if runs and runs[-1][1] == force and runs[-1][0][1] == page["page"] - 1:
+            runs[-1] = ((runs[-1][0][0], page["page"]), force)
+        else:
+            runs.append(((page["page"], page["page"]), force))
+    
+    if shards <= 1:
+        return runs
+    
+    total_pages = len(ocr_pages)
+    segments = []
+    for (start, end), force in runs:
+        run_pages = end - start + 1
+        run_shards = max(1, round(shards * run_pages / total_pages))
+        for sub_start, sub_end in split_page_ranges(run_pages, run_shards):
+            segments.append(((start + sub_start - 1, start + sub_end - 1), force))
+    return segments
+
+def _convert_adaptive(pdf_path, ocr_engine, extract_tables, extract_images, shards=1, images_scale=2.0):
+    """
+    "auto" OCR: full-page OCR only on pages whose text layer is missing or garbled; the
+    rest keep docling's regular (bitmap-only) OCR. Returns (documents, ocr_pages).
+    """
+    ocr_pages = analyze_text_layer(pdf_path)
+    ocr_count = sum(1 for page in ocr_pages if page["path"] == "full_page_ocr")
+    logger.info("Auto OCR plan", extra={"pages": len(ocr_pages), "full_page_ocr_pages": ocr_count})
+    
+    segments = _plan_ocr_segments(ocr_pages, shards)
+    if len(segments) == 1:
+        # Uniform document - one regular conversion, no page ranges
+        force = segments[0][1]
+        documents = [_convert_document(pdf_path, ocr_engine, force, extract_tables, extract_images, images_scale=images_scale)]
+    else:
+        documents = _convert_segments(
+            pdf_path, ocr_engine, extract_tables, extract_images, segments, parallel=shards > 1, images_scale=images_scale
+        )
+    return documents, ocr_pages
+
+# ================== PAGE CHECKPOINTS ==================
+
+# Pages per checkpointed docling call. Each converted chunk is saved under the result folder
+# as soon as it finishes, so a conversion that times out, is cancelled or loses its worker
+# resumes with only the missing pages. Opt-in: 0 = off (one docling call per document / shard).
+CHECKPOINT_PAGES = int(os.environ.get("PDF_CHECKPOINT_PAGES", "0"))
+# Only documents this long are checkpointed - for short ones, saving and reloading every chunk
+# costs more than a rerun
+CHECKPOINT_MIN_PAGES = int(os.environ.get("PDF_CHECKPOINT_MIN_PAGES", "50"))
+CHECKPOINT_DIR = ".checkpoints"
+
+def checkpointing_enabled(page_count):
+    return CHECKPOINT_PAGES > 0 and page_count >= max(CHECKPOINT_MIN_PAGES, CHECKPOINT_PAGES + 1)
+
+CHECKPOINT_LOCK = ".lock"
+
+def _pdf_sha256(pdf_path):
+    """SHA-256 of a PDF: the hash stored next to an upload (<stem>.sha256), else computed"""
+    try:
+        return Path(pdf_path).with_suffix(".sha256").read_text().strip()
+    except FileNotFoundError:
+        pass
+    sha256 = hashlib.sha256()
+    with open(pdf_path, "rb") as fp:
+        while chunk := fp.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+class PageCheckpoints:
+    """
+    Converted page chunks of one PDF, kept as docling JSON in output_dir/.checkpoints/ and keyed
+    on the PDF's SHA-256 plus the conversion settings (other chunks are discarded on open).
+    
+    Use as a context manager: it holds an exclusive lock on the folder until the conversion is
+    done, so a second conversion of the same file and options waits for the first instead of
+    sharing its chunks - and having them cleared away underneath it.
+    """
+    
+    def __init__(self, output_dir, pdf_path, ocr_engine, force_full_page_ocr, extract_tables, extract_images, images_scale):
+        self.dir = Path(output_dir) / CHECKPOINT_DIR
+        self.settings = {
+            "sha256": _pdf_sha256(pdf_path),
+            "ocr_engine": ocr_engine,
+            "force_full_page_ocr": force_full_page_ocr,
+            "extract_tables": extract_tables,
+            "extract_images": extract_images,
+            "images_scale": images_scale,
+        }
+        self._lock_file = None
+    
+    def __enter__(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.dir / CHECKPOINT_LOCK, "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        
+        settings_file = self.dir / "settings.json"
+        try:
+            stored = json.loads(settings_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            stored = None
+        if stored != self.settings:
+            self.clear()
+            settings_file.write_text(json.dumps(self.settings), encoding="utf-8")
+        return self
+    
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+    
+    def __getstate__(self):
+        # Shard workers only save chunks - the lock stays with the process that took it
+        return {**self.__dict__, "_lock_file": None}
+    
+    def _path(self, page_range, force):
+        return self.dir / f"pages-{page_range[0]:05d}-{page_range[1]:05d}-{force_suffix_for(force)}.json"
+    
+    def load(self, page_range, force):
+        """The stored document for a chunk, or None if it wasn't converted (or can't be read)"""
+        from docling_core.types.doc import DoclingDocument
         
-        table_image_counter = 0
-        picture_counter = 0
+        path = self._path(page_range, force)
+        if not path.exists():
+            return None
+        try:
+            return DoclingDocument.model_validate(json.loads(path.read_text(encoding="utf-8")))
+        except Exception as e:
+            logger.warning("Discarding unreadable checkpoint", extra={"checkpoint": path.name, "error": str(e)})
+            return None
+    
+    def save(self, page_range, force, document):
+        """Store a converted chunk (a DoclingDocument or its export_to_dict), atomically"""
+        data = document if isinstance(document, dict) else document.export_to_dict()
+        path = self._path(page_range, force)
+        partial = path.with_name(f".{path.name}.part")
+        partial.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(partial, path)
+    
+    def clear(self):
+        """Delete the stored chunks (the folder and its lock file stay for the lock holder)"""
+        for path in self.dir.iterdir():
+            if path.name != CHECKPOINT_LOCK:
+                path.unlink(missing_ok=True)
+
+def _convert_checkpointed_chunks(pdf_path, ocr_engine, extract_tables, extract_images, chunks, checkpoints, images_scale=2.0):
+    """Shard worker: convert chunks one after another, checkpointing each; returns [(chunk, document dict)]"""
+    converted = []
+    for page_range, force in chunks:
+        data = _convert_shard(pdf_path, ocr_engine, force, extract_tables, extract_images, page_range, images_scale)
+        checkpoints.save(page_range, force, data)
+        converted.append(((page_range, force), data))
+    return converted
+
+def _convert_resumable(
+    pdf_path, checkpoints, ocr_engine, force_full_page_ocr, extract_tables, extract_images,
+    shards=1, images_scale=2.0, cancel_check=None
+):
+    """
+    Convert in CHECKPOINT_PAGES-page chunks, skipping chunks an earlier attempt already
+    checkpointed and saving each new one as soon as it's done. With shards > 1 the missing
+    chunks are split into `shards` contiguous runs, each converted in order by one worker
+    process - as without checkpoints, at most `shards` conversions run at once.
+    `checkpoints` is an open PageCheckpoints. Returns (documents in page order, ocr_pages,
+    resumed page count).
+    """
+    ocr_pages = None
+    if force_full_page_ocr == "auto":
+        ocr_pages = analyze_text_layer(pdf_path)
+        segments = _plan_ocr_segments(ocr_pages, shards)
+    else:
+        page_ranges = split_page_ranges(get_page_count(pdf_path), shards)
+        segments = [(page_range, force_full_page_ocr) for page_range in page_ranges]
+    chunks = _chunk_segments(segments, CHECKPOINT_PAGES)
+    
+    documents = {}
+    for chunk in chunks:
+        document = checkpoints.load(*chunk)
+        if document is not None:
+            documents[chunk] = document
+    missing = [chunk for chunk in chunks if chunk not in documents]
+    resumed_pages = sum(end - start + 1 for (start, end), _force in documents)
+    if resumed_pages:
+        logger.info("Resuming from checkpoints", extra={"resumed_pages": resumed_pages, "chunks_left": len(missing)})
+    
+    if shards > 1 and len(missing) > 1:
+        from docling_core.types.doc import DoclingDocument
         
-        # 🔥 THE CORRECT WAY TO EXTRACT IMAGES (this actually works!):
-        for element, _level in conv_res.document.iterate_items():
+        executor = _get_shard_executor()
+        futures = [
+            executor.submit(
+                _convert_checkpointed_chunks,
+                pdf_path, ocr_engine, extract_tables, extract_images, missing[start - 1:end], checkpoints, images_scale
+            )
+            for start, end in split_page_ranges(len(missing), shards)
+        ]
+        # Chunks are checkpointed as the workers finish them, so a failed run keeps whatever
+        # completed; wait for every run before raising
+        error = None
+        for future in as_completed(futures):
+            try:
+                converted = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            for chunk, data in converted:
+                documents[chunk] = DoclingDocument.model_validate(data)
+        if error is not None:
+            raise error
+    else:
+        for page_range, force in missing:
+            if cancel_check is not None and cancel_check():
+                raise ConversionCancelled(f"Cancelled before pages {page_range[0]}-{page_range[1]}")
+            document = _convert_document(
+                pdf_path, ocr_engine, force, extract_tables, extract_images, page_range, images_scale
+            )
+            checkpoints.save(page_range, force, document)
+            documents[(page_range, force)] = document
+    
+    return [documents[chunk] for chunk in chunks], ocr_pages, resumed_pages
+
+# ================== FAST TEXT-LAYER MODE ==================
+
+# mode="fast": markdown straight from the PDF's embedded text layer with a reading-order
+# heuristic - no layout, table or OCR models. A document with any page lacking a usable text
+# layer falls back to the full pipeline.
+PROCESSING_MODES = ["full", "fast"]
+
+# Runs whose vertical centers are within this share of the line height belong to one line
+FAST_LINE_TOLERANCE = 0.5
+# Vertical whitespace of more than this many line heights separates paragraphs
+FAST_PARAGRAPH_GAP = 1.2
+# A column gutter is at least this wide (points) and leaves this share of the runs on each side
+FAST_MIN_GUTTER = 12.0
+FAST_MIN_COLUMN_SHARE = 0.2
+
+def _text_runs(textpage):
+    """(left, bottom, right, top, text) for each text run pdfium found on a page"""
+    runs = []
+    for index in range(textpage.count_rects()):
+        left, bottom, right, top = textpage.get_rect(index)
+        text = textpage.get_text_bounded(left, bottom, right, top).strip()
+        if text:
+            runs.append((left, bottom, right, top, text))
+    return runs
+
+def _widest_gap(spans, min_gap):
+    """Widest gap between merged (start, end) spans as (gap_start, gap_end), or None"""
+    best = None
+    spans = sorted(spans)
+    reach = spans[0][1]
+    for start, end in spans[1:]:
+        if start - reach >= min_gap and (best is None or start - reach > best[1] - best[0]):
+            best = (reach, start)
+        reach = max(reach, end)
+    return best
+
+def _xy_cut(runs, line_height):
+    """
+    Recursive XY-cut: split at column gutters (read left column first), then at wide vertical
+    whitespace (top to bottom). Returns blocks of runs in reading order.
+    """
+    if len(runs) <= 1:
+        return [runs]
+    
+    gutter = _widest_gap([(run[0], run[2]) for run in runs], FAST_MIN_GUTTER)
+    if gutter is not None:
+        left = [run for run in runs if run[2] <= gutter[0]]
+        right = [run for run in runs if run[0] >= gutter[1]]
+        if min(len(left), len(right)) >= FAST_MIN_COLUMN_SHARE * len(runs):
+            return _xy_cut(left, line_height) + _xy_cut(right, line_height)
+    
+    # PDF y grows upwards, so negate to walk top to bottom
+    gap = _widest_gap([(-run[3], -run[1]) for run in runs], FAST_PARAGRAPH_GAP * line_height)
+    if gap is not None:
+        above = [run for run in runs if -run[1] <= gap[0]]
+        below = [run for run in runs if -run[3] >= gap[1]]
+        return _xy_cut(above, line_height) + _xy_cut(below, line_height)
+    return [runs]
+
+def _block_text(runs, line_height):
+    """Join one block's runs into a paragraph: lines top to bottom, runs left to right"""
+    lines = []
+    for run in sorted(runs, key=lambda run: -run[3]):
+        center = (run[1] + run[3]) / 2
+        if lines and abs(lines[-1][0] - center) <= FAST_LINE_TOLERANCE * line_height:
+            lines[-1][1].append(run)
+        else:
+            lines.append((center, [run]))
+    
+    text = ""
+    for _, line_runs in lines:
+        line = " ".join(run[4] for run in sorted(line_runs, key=lambda run: run[0]))
+        # Re-join words hyphenated across a line break
+        if text.endswith("-") and line[:1].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return text
+
+def _runs_to_markdown(runs):
+    if not runs:
+        return ""
+    line_height = statistics.median(run[3] - run[1] for run in runs) or 1.0
+    return "\n\n".join(_block_text(block, line_height) for block in _xy_cut(runs, line_height))
+
+def extract_text_layer(pdf_path):
+    """
+    Read each page's text layer in reading order with pypdfium2 (fast mode). Returns one dict
+    per page: page, markdown, chars, path and reason (as in analyze_text_layer).
+    """
+    import pypdfium2 as pdfium
+    
+    pages = []
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+                text_coverage = _text_coverage(page, textpage)
+                runs = _text_runs(textpage)
+            finally:
+                textpage.close()
+                page.close()
             
-            # Extract table images
-            if isinstance(element, TableItem):
-                table_image_counter += 1
-                element_image_filename = Path(output_dir) / f"{doc_filename}-table-image-{table_image_counter}.png"
-                
-                try:
-                    with element_image_filename.open("wb") as fp:
-                        element.get_image(conv_res.document).save(fp, "PNG")
+            chars, _, path, reason = _text_layer_verdict(text, text_coverage)
+            pages.append({
+                "page": page_index + 1,
+                "markdown": _runs_to_markdown(runs),
+                "chars": chars,
+                "path": path,
+                "reason": reason,
+            })
+    finally:
+        pdf.close()
+    
+    return pages
+
+def _process_pdf_fast(
+    pdf_path,
+    output_dir,
+    ocr_engine,
+    force_full_page_ocr,
+    extract_tables=True,
+    extract_images=True,
+    progress_callback=None,
+    cancel_check=None,
+    **full_options
+):
+    """
+    Fast mode: markdown from the text layer only (no tables or images). Falls back to
+    _process_pdf_with_engine with the same options when a page has no usable text layer;
+    that result is a full-mode one, written to the full-mode result folder.
+    """
+    _report_stage(progress_callback, cancel_check, "layout_ocr", "running")
+    
+    timer = StageTimer()
+    with timer.activate(), timer.stage("convert"):
+        pages = extract_text_layer(pdf_path)
+    
+    fallback_pages = [page["page"] for page in pages if page["path"] != "text_layer"]
+    if fallback_pages or not pages:
+        logger.info("Fast mode falling back to the full pipeline", extra={
+            "pages": len(pages), "pages_without_text_layer": fallback_pages
+        })
+        full_dir = output_dir.parent / result_folder_name(pdf_path.stem, ocr_engine, force_full_page_ocr)
+        full_dir.mkdir(parents=True, exist_ok=True)
+        detach_links(full_dir)
+        try:
+            output_dir.rmdir()
+        except OSError:
+            pass
+        result = _process_pdf_with_engine(
+            pdf_path, full_dir, ocr_engine, force_full_page_ocr, extract_tables, extract_images,
+            progress_callback=progress_callback, cancel_check=cancel_check, **full_options
+        )
+        result['output_folder'] = full_dir
+        result['mode'] = "full"
+        result['fallback_pages'] = fallback_pages
+        result['timings']['text_layer_check'] = round(timer.timings["convert"], 4)
+        return result
+    
+    logger.info("Converted", extra={
+        "stage": "layout_ocr", "mode": "fast", "pages": len(pages), "seconds": round(timer.timings["convert"], 3)
+    })
+    _report_stage(progress_callback, cancel_check, "layout_ocr", "done")
+    _report_stage(progress_callback, cancel_check, "tables", "skipped")
+    _report_stage(progress_callback, cancel_check, "images", "skipped")
+    
+    _report_stage(progress_callback, cancel_check, "markdown", "running")
+    with timer.stage("markdown_export"):
+        full_text = "\n\n".join(page["markdown"] for page in pages if page["markdown"])
+        text_filename = output_dir / f"{pdf_path.stem}_full_text_fast.md"
+        with text_filename.open("w", encoding="utf-8") as fp:
+            fp.write(full_text)
+    logger.info("Markdown exported", extra={"stage": "markdown", "chars": len(full_text)})
+    _report_stage(progress_callback, cancel_check, "markdown", "done")
+    
+    return {
+        'tables': 0,
+        'images': 0,
+        'text_file': text_filename,
+        'pages': len(pages),
+        'mode': "fast",
+        'timings': timer.rounded()
+    }
+
+# ================== ARTIFACT EXPORT ==================
+
+# Tables and images are encoded and written on a shared thread pool while the document is
+# walked (PIL and zlib release the GIL during encode, so this scales with cores)
+EXPORT_WORKERS = int(os.environ.get("PDF_EXPORT_WORKERS", str(min(8, os.cpu_count() or 1))))
+IMAGE_FORMAT = os.environ.get("PDF_IMAGE_FORMAT", "png").lower()
+PNG_COMPRESS_LEVEL = int(os.environ.get("PDF_PNG_COMPRESS_LEVEL", "6"))  # 0-9, lower = faster + bigger
+IMAGE_QUALITY = int(os.environ.get("PDF_IMAGE_QUALITY", "90"))  # WebP / JPEG
+
+# format -> (PIL format, file suffix)
+IMAGE_FORMATS = {
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+def _get_export_executor():
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="pdf-export")
+        return _export_executor
+
+def _image_save_options(image_format):
+    if image_format == "png":
+        return {"compress_level": PNG_COMPRESS_LEVEL}
+    if image_format == "webp":
+        return {"quality": IMAGE_QUALITY, "method": 0}  # method 0 = fastest encoder
+    return {"quality": IMAGE_QUALITY}
+
+def _write_table(table, document, csv_filename, html_filename):
+    table_df = table.export_to_dataframe()
+    table_df.to_csv(csv_filename, index=False)
+    with html_filename.open("w") as fp:
+        fp.write(table.export_to_html(doc=document))
+
+def _submit_image(executor, element, document, image_filename, image_format):
+    # Cropping reads the shared page image, so it stays on the calling thread; encoding doesn't
+    try:
+        image = element.get_image(document)
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+    return executor.submit(_write_image, image, image_filename, image_format)
+
+def _write_image(image, image_filename, image_format):
+    if image is None:
+        raise ValueError("element has no image")
+    if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    with image_filename.open("wb") as fp:
+        image.save(fp, IMAGE_FORMATS[image_format][0], **_image_save_options(image_format))
+
+def _export_documents(
+    documents,
+    output_dir,
+    doc_filename,
+    ocr_engine,
+    force_full_page_ocr,
+    extract_tables=True,
+    extract_images=True,
+    progress_callback=None,
+    cancel_check=None,
+    image_format=None,
+    images_scale=2.0,
+    lazy_images=False,
+    export_json=False
+):
+    """
+    Write tables, images and markdown for one PDF. `documents` is the whole PDF as one
+    document, or its page-range shards in page order - numbering runs across all of them,
+    so sharded output matches a single-pass run.
+    
+    One pass over the document items hands each table and image to the export thread pool;
+    image_format is "png" (default: PDF_IMAGE_FORMAT), "webp" or "jpeg". With lazy_images, only
+    a manifest of image bounding boxes is written; see render_lazy_image. The page each table
+    and image came from is recorded in the artifacts page index. With export_json, the docling
+    document is also saved losslessly (export_to_dict) - as a list of shard documents when sharded.
+    """
+    
+    from docling_core.types.doc import PictureItem, TableItem
+    
+    image_format = (image_format or IMAGE_FORMAT).lower()
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format} (use {', '.join(IMAGE_FORMATS)})")
+    image_suffix = IMAGE_FORMATS[image_format][1]
+    
+    output_dir = Path(output_dir)
+    executor = _get_export_executor()
+    table_writes = []
+    image_writes = []  # (label, filename, future)
+    manifest_entries = []  # lazy_images: what to render on request
+    pages = {}  # artifact name -> source page, for the artifacts listing
+    
+    tables_count = 0
+    table_image_counter = 0
+    picture_counter = 0
+    
+    _report_stage(progress_callback, cancel_check, "tables", "running" if extract_tables else "skipped")
+    _report_stage(progress_callback, cancel_check, "images", "running" if extract_images else "skipped")
+    
+    # ================== TABLE + IMAGE EXTRACTION (single pass) ==================
+    # Walking the items also crops images and hands out the writes; waiting on them is timed below
+    with record_stage("export_walk"):
+        if extract_tables or extract_images:
+            for document in documents:
+                for element, _level in document.iterate_items():
                     
-                    extracted_images += 1
-                    print(f"   ✅ Saved table image {table_image_counter}: {element_image_filename.name}")
-                except Exception as e:
-                    print(f"   ❌ Failed to save table image {table_image_counter}: {e}")
-            
-            # Extract picture images  
-            if isinstance(element, PictureItem):
-                picture_counter += 1
-                element_image_filename = Path(output_dir) / f"{doc_filename}-picture-{picture_counter}.png"
-                
-                try:
-                    with element_image_filename.open("wb") as fp:
-                        element.get_image(conv_res.document).save(fp, "PNG")
+                    if isinstance(element, TableItem):
+                        if extract_tables:
+                            tables_count += 1
+                            pages[f"table-{tables_count}"] = _page_no(element)
+                            table_writes.append(executor.submit(
+                                _write_table,
+                                element,
+                                document,
+                                output_dir / f"{doc_filename}-table-{tables_count}.csv",
+                                output_dir / f"{doc_filename}-table-{tables_count}.html"
+                            ))
+                        
+                        # Extract table images
+                        if extract_images:
+                            pages[f"table-image-{table_image_counter + 1}"] = _page_no(element)
+                        if extract_images and lazy_images:
+                            table_image_counter += 1
+                            _add_manifest_entry(manifest_entries, f"table-image-{table_image_counter}", "table", element, document)
+                        elif extract_images:
+                            table_image_counter += 1
+                            element_image_filename = output_dir / f"{doc_filename}-table-image-{table_image_counter}{image_suffix}"
+                            image_writes.append((
+                                f"table image {table_image_counter}",
+                                element_image_filename,
+                                _submit_image(executor, element, document, element_image_filename, image_format)
+                            ))
                     
+                    # Extract picture images
+                    if isinstance(element, PictureItem) and extract_images:
+                        pages[f"picture-{picture_counter + 1}"] = _page_no(element)
+                    if isinstance(element, PictureItem) and extract_images and lazy_images:
+                        picture_counter += 1
+                        _add_manifest_entry(manifest_entries, f"picture-{picture_counter}", "picture", element, document)
+                    elif isinstance(element, PictureItem) and extract_images:
+                        picture_counter += 1
+                        element_image_filename = output_dir / f"{doc_filename}-picture-{picture_counter}{image_suffix}"
+                        image_writes.append((
+                            f"picture {picture_counter}",
+                            element_image_filename,
+                            _submit_image(executor, element, document, element_image_filename, image_format)
+                        ))
+    
+    if extract_tables:
+        with record_stage("table_export"):
+            for future in table_writes:
+                future.result()
+        logger.info("Tables exported", extra={"stage": "tables", "tables": tables_count})
+        _report_stage(progress_callback, cancel_check, "tables", "done")
+    
+    extracted_images = 0
+    if extract_images and lazy_images:
+        with record_stage("image_export"):
+            write_image_manifest(output_dir, doc_filename, manifest_entries, images_scale, image_format)
+        extracted_images = len(manifest_entries)
+        logger.info("Images recorded for on-demand rendering", extra={"stage": "images", "images": extracted_images})
+        _report_stage(progress_callback, cancel_check, "images", "done")
+    elif extract_images:
+        failed_images = 0
+        with record_stage("image_export"):
+            for label, element_image_filename, future in image_writes:
+                try:
+                    future.result()
                     extracted_images += 1
-                    print(f"   ✅ Saved picture {picture_counter}: {element_image_filename.name}")
+                    item_logger.debug("Saved %s: %s", label, element_image_filename.name)
                 except Exception as e:
-                    print(f"   ❌ Failed to save picture {picture_counter}: {e}")
+                    failed_images += 1
+                    item_logger.debug("Failed to save %s: %s", label, e)
         
-        if extracted_images == 0:
-            print(f"   ℹ️  No images found in document")
-        else:
-            print(f"   🖼️  Total images extracted: {extracted_images}")
+        logger.info("Images exported", extra={"stage": "images", "images": extracted_images, "failed": failed_images})
+        _report_stage(progress_callback, cancel_check, "images", "done")
     
     # ================== TEXT EXTRACTION ==================
-    full_text = conv_res.document.export_to_markdown()
-    force_suffix = "force_true" if force_full_page_ocr else "force_false"
-    text_filename = Path(output_dir) / f"{doc_filename}_full_text_{ocr_engine}_{force_suffix}.md"
-    with text_filename.open("w", encoding="utf-8") as fp:
-        fp.write(full_text)
+    _report_stage(progress_callback, cancel_check, "markdown", "running")
+    force_suffix = force_suffix_for(force_full_page_ocr)
+    with record_stage("markdown_export"):
+        full_text = "\n\n".join(document.export_to_markdown() for document in documents)
+        text_filename = output_dir / f"{doc_filename}_full_text_{ocr_engine}_{force_suffix}.md"
+        with text_filename.open("w", encoding="utf-8") as fp:
+            fp.write(full_text)
+    
+    if export_json:
+        with record_stage("json_export"):
+            document_dicts = [document.export_to_dict() for document in documents]
+            json_filename = output_dir / f"{doc_filename}_document_{ocr_engine}_{force_suffix}.json"
+            with json_filename.open("w", encoding="utf-8") as fp:
+                json.dump(document_dicts[0] if len(document_dicts) == 1 else document_dicts, fp)
+    
+    write_page_index(output_dir, doc_filename, pages)
+    logger.info("Markdown exported", extra={"stage": "markdown", "chars": len(full_text)})
+    _report_stage(progress_callback, cancel_check, "markdown", "done")
     
     return {
-        'tables': len(conv_res.document.tables) if extract_tables and conv_res.document.tables else 0,
+        'tables': tables_count,
         'images': extracted_images,  # Now this should actually work!
-        'text_file': text_filename
+        'text_file': text_filename,
+        'pages': sum(len(document.pages) for document in documents)
+    }
+
+def _page_no(element):
+    return element.prov[0].page_no if element.prov else None
+
+# ================== LAZY IMAGES ==================
+
+# Per result folder: "<stem>-images.json" lists each image's page and bounding box; the image
+# itself is rendered from the PDF on first request and kept next to the manifest
+def image_manifest_path(output_dir, doc_filename):
+    return Path(output_dir) / f"{doc_filename}{IMAGE_MANIFEST_SUFFIX}"
+
+def _add_manifest_entry(entries, name, kind, element, document):
+    if not element.prov:
+        item_logger.debug("No position for %s, skipping", name)
+        return
+    prov = element.prov[0]
+    page_height = document.pages[prov.page_no].size.height
+    bbox = prov.bbox.to_top_left_origin(page_height=page_height)
+    entries.append({
+        "name": name,
+        "kind": kind,
+        "page": prov.page_no,
+        "bbox": [round(bbox.l, 2), round(bbox.t, 2), round(bbox.r, 2), round(bbox.b, 2)],
+    })
+
+def write_image_manifest(output_dir, doc_filename, entries, images_scale, image_format):
+    manifest = {
+        "images_scale": images_scale,
+        "image_format": image_format,
+        "images": entries,
     }
+    with image_manifest_path(output_dir, doc_filename).open("w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=2)
+
+def lazy_image_path(output_dir, doc_filename, manifest, name):
+    """Where a manifest image is (or will be) stored once rendered"""
+    return Path(output_dir) / f"{doc_filename}-{name}{IMAGE_FORMATS[manifest['image_format']][1]}"
+
+def render_lazy_image(pdf_path, manifest, entry, output_path):
+    """
+    Render one manifest entry's region of its PDF page with pypdfium2 at the manifest's
+    images_scale and save it to output_path (written atomically, so concurrent renders are safe).
+    """
+    import pypdfium2 as pdfium
+    
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        page = pdf[entry["page"] - 1]
+        width, height = page.get_size()
+        left, top, right, bottom = entry["bbox"]  # PDF points, top-left origin
+        # pdfium crops are amounts trimmed from each side: (left, bottom, right, top)
+        crop = (max(0, left), max(0, height - bottom), max(0, width - right), max(0, top))
+        image = page.render(scale=manifest["images_scale"], crop=crop).to_pil()
+    finally:
+        pdf.close()
+    
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        _write_image(image, tmp_path, manifest["image_format"])
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return output_path
+
+def _process_pdf_with_engine(
+    pdf_path, 
+    output_dir, 
+    ocr_engine, 
+    force_full_page_ocr, 
+    extract_tables=True, 
+    extract_images=True,
+    progress_callback=None,
+    cancel_check=None,
+    shards=1,
+    image_format=None,
+    images_scale=2.0,
+    lazy_images=False,
+    export_json=False
+):
+    """Process single PDF with specific OCR engine and force setting - FIXED IMAGE EXTRACTION"""
+    
+    _report_stage(progress_callback, cancel_check, "layout_ocr", "running")
+    
+    # Lazy images only need element bounding boxes, so docling skips rendering bitmaps
+    render_images = extract_images and not lazy_images
+    
+    # Per-stage wall times, returned in result['timings'] (model_load only when this call loaded one)
+    timer = StageTimer()
+    with timer.activate(), ExitStack() as cleanup:
+        ocr_pages = None
+        checkpoints = None
+        with timer.stage("convert"):
+            if CHECKPOINT_PAGES > 0 and checkpointing_enabled(get_page_count(pdf_path)):
+                checkpoints = cleanup.enter_context(PageCheckpoints(
+                    output_dir, pdf_path, ocr_engine, force_full_page_ocr, extract_tables, render_images, images_scale
+                ))
+                documents, ocr_pages, resumed_pages = _convert_resumable(
+                    pdf_path, checkpoints, ocr_engine, force_full_page_ocr, extract_tables, render_images,
+                    shards or 1, images_scale=images_scale, cancel_check=cancel_check
+                )
+            elif force_full_page_ocr == "auto":
+                documents, ocr_pages = _convert_adaptive(
+                    pdf_path, ocr_engine, extract_tables, render_images, shards or 1, images_scale=images_scale
+                )
+            elif shards and shards > 1:
+                documents = _convert_sharded(
+                    pdf_path, ocr_engine, force_full_page_ocr, extract_tables, render_images, shards, images_scale=images_scale
+                )
+            else:
+                documents = [_convert_document(
+                    pdf_path, ocr_engine, force_full_page_ocr, extract_tables, render_images, images_scale=images_scale
+                )]
+        
+        logger.info("Converted", extra={
+            "stage": "layout_ocr",
+            "pages": sum(len(document.pages) for document in documents),
+            "seconds": round(timer.timings.get("convert", 0.0), 3)
+        })
+        _report_stage(progress_callback, cancel_check, "layout_ocr", "done")
+        
+        result = _export_documents(
+            documents,
+            output_dir,
+            pdf_path.stem,
+            ocr_engine,
+            force_full_page_ocr,
+            extract_tables,
+            extract_images,
+            progress_callback=progress_callback,
+            cancel_check=cancel_check,
+            image_format=image_format,
+            images_scale=images_scale,
+            lazy_images=lazy_images,
+            export_json=export_json
+        )
+        if checkpoints is not None:
+            # Outputs are complete - the checkpoints are only needed by a retry
+            checkpoints.clear()
+            if resumed_pages:
+                result['resumed_pages'] = resumed_pages
+    if ocr_pages is not None:
+        result['ocr_pages'] = ocr_pages
+    result['timings'] = timer.rounded()
+    return result
 
 def process_pdfs_all_engines(
     folder_path="/Users/june/Downloads/docling",
@@ -167,13 +1143,15 @@ def process_pdfs_all_engines(
     extract_images=True   # DEFAULT TRUE (NEW PARAMETER)
 ):
     """
-    Automatically find and process ALL PDFs in a folder with 4 OCR engines and both force settings
+    Automatically find and process ALL PDFs in a folder with 4 OCR engines and both force settings.
+    Runs go through the parallel benchmark harness (benchmark.run_benchmark_matrix): each one in its
+    own process with a hard timeout; set PDF_BENCHMARK_PARALLEL to control how many run at once.
     """
-    
-    OCR_ENGINES = ['rapidocr', 'tesseract', 'easyocr', 'ocrmac']
-    FORCE_SETTINGS = [True, False]
+    from benchmark import OCR_ENGINES, FORCE_SETTINGS, run_benchmark_matrix
+
     TIMEOUT = 600  # 10 minutes per processing
-    
+    PARALLEL = int(os.getenv("PDF_BENCHMARK_PARALLEL", "0")) or None
+
     base_folder = Path(folder_path)
     
     # Automatically find all PDF files in the folder
@@ -181,7 +1159,7 @@ def process_pdfs_all_engines(
         print(f"❌ Folder not found: {folder_path}")
         return {}
     
-    pdf_files = list(base_folder.glob("*.pdf"))
+    pdf_files = sorted(base_folder.glob("*.pdf"))
     if not pdf_files:
         print(f"❌ No PDF files found in: {folder_path}")
         return {}
@@ -200,66 +1178,48 @@ def process_pdfs_all_engines(
     print(f"{'='*80}")
     
     all_results = {}
-    timing_data = {}
+    timing_data = {pdf_filename: {engine: {} for engine in OCR_ENGINES} for pdf_filename in existing_files}
     total_start_time = time.time()
-    
-    # Process each PDF
-    for i, pdf_filename in enumerate(existing_files):
-        print(f"\n📄 PDF {i+1}/{len(existing_files)}: {pdf_filename}")
-        print("="*60)
-        
-        pdf_path = base_folder / pdf_filename
-        pdf_stem = pdf_path.stem
-        timing_data[pdf_filename] = {}
-        
-        # Process with each engine and force setting
-        for ocr_engine in OCR_ENGINES:
-            timing_data[pdf_filename][ocr_engine] = {}
-            
-            for force_setting in FORCE_SETTINGS:
-                force_label = "force_true" if force_setting else "force_false"
-                
-                print(f"\n🔍 {ocr_engine} (force_full_page_ocr={force_setting})")
-                
-                try:
-                    # Create output folder: name_engine_force_setting
-                    output_folder = base_folder / f"{pdf_stem}_{ocr_engine}_{force_label}"
-                    output_folder.mkdir(parents=True, exist_ok=True)
-                    
-                    start_time = time.time()
-                    
-                    # Process with timeout
-                    result = run_with_timeout(
-                        _process_pdf_with_engine,
-                        TIMEOUT,
-                        pdf_path, output_folder, ocr_engine, force_setting, extract_tables, extract_images
-                    )
-                    
-                    duration = time.time() - start_time
-                    
-                    # Store results
-                    result_key = f"{pdf_filename}_{ocr_engine}_{force_label}"
-                    all_results[result_key] = result
-                    timing_data[pdf_filename][ocr_engine][force_label] = duration
-                    
-                    # Enhanced output with conditional counts
-                    output_parts = [f"{duration:.1f}s"]
-                    if extract_tables:
-                        tables_count = result.get('tables', 0)
-                        output_parts.append(f"{tables_count} tables")
-                    if extract_images:
-                        images_count = result.get('images', 0)
-                        output_parts.append(f"{images_count} images")
-                    
-                    print(f"   ✅ {' - '.join(output_parts)}")
-                    
-                except Exception as e:
-                    duration = time.time() - start_time if 'start_time' in locals() else 0
-                    print(f"   ❌ FAILED ({duration:.1f}s): {str(e)[:50]}...")
-                    
-                    result_key = f"{pdf_filename}_{ocr_engine}_{force_label}"
-                    all_results[result_key] = {"error": str(e)}
-                    timing_data[pdf_filename][ocr_engine][force_label] = f"FAILED ({duration:.1f}s)"
+
+    def on_result(row):
+        force_label = force_suffix_for(row["force_full_page_ocr"])
+        result_key = f"{row['pdf']}_{row['engine']}_{force_label}"
+        duration = row.get("wall_seconds") or 0
+        header = f"{row['pdf']} · {row['engine']} (force_full_page_ocr={row['force_full_page_ocr']})"
+
+        if row["status"] == "ok":
+            output_folder = base_folder / result_folder_name(Path(row["pdf"]).stem, row["engine"], row["force_full_page_ocr"])
+            all_results[result_key] = {"tables": row.get("tables", 0), "images": row.get("images", 0),
+                                       "output_folder": output_folder, "benchmark": row}
+            timing_data[row["pdf"]][row["engine"]][force_label] = duration
+
+            # Enhanced output with conditional counts
+            output_parts = [f"{duration:.1f}s"]
+            if extract_tables:
+                output_parts.append(f"{row.get('tables', 0)} tables")
+            if extract_images:
+                output_parts.append(f"{row.get('images', 0)} images")
+            print(f"   ✅ {header}: {' - '.join(output_parts)}")
+        elif row["status"] == "skipped":
+            all_results[result_key] = {"error": row["error"], "skipped": True}
+            timing_data[row["pdf"]][row["engine"]][force_label] = "SKIPPED"
+            print(f"   ⏭️  {header}: skipped ({row['error']})")
+        else:
+            all_results[result_key] = {"error": row.get("error", "")}
+            timing_data[row["pdf"]][row["engine"]][force_label] = f"FAILED ({duration:.1f}s)"
+            print(f"   ❌ {header}: FAILED ({duration:.1f}s): {str(row.get('error', ''))[:50]}...")
+
+    run_benchmark_matrix(
+        pdf_files,
+        base_folder,
+        engines=OCR_ENGINES,
+        force_settings=FORCE_SETTINGS,
+        extract_tables=extract_tables,
+        extract_images=extract_images,
+        parallel=PARALLEL,
+        timeout=TIMEOUT,
+        on_result=on_result
+    )
     
     total_duration = time.time() - total_start_time
     
@@ -305,9 +1265,11 @@ def process_pdfs_all_engines(
     for pdf_name in existing_files:
         pdf_stem = Path(pdf_name).stem
         for engine in OCR_ENGINES:
-            print(f"✅ {pdf_stem}_{engine}_force_true/")
-            print(f"✅ {pdf_stem}_{engine}_force_false/")
-            folder_count += 2
+            for force_setting in FORCE_SETTINGS:
+                folder_name = result_folder_name(pdf_stem, engine, force_setting)
+                if (base_folder / folder_name).exists():
+                    print(f"✅ {folder_name}/")
+                    folder_count += 1
     
     print(f"\n📊 Total folders created: {folder_count}")
     
@@ -315,13 +1277,39 @@ def process_pdfs_all_engines(
 
 # ================== SIMPLIFIED API FUNCTIONS FOR FASTAPI ==================
 
+def summarize_result(result):
+    """JSON-friendly summary of a process_single_pdf result for API responses"""
+    summary = {
+        "tables_count": result.get('tables', 0),
+        "images_count": result.get('images', 0),
+        "text_extracted": bool(result.get('text_file')),
+        "output_folder": str(result.get('output_folder', ''))
+    }
+    if result.get('ocr_pages') is not None:
+        summary["ocr_pages"] = result['ocr_pages']
+    for key in ('pages', 'timings', 'mode', 'fallback_pages', 'resumed_pages'):
+        if result.get(key) is not None:
+            summary[key] = result[key]
+    if result.get('profile_file'):
+        summary["profile_file"] = str(result['profile_file'])
+    return summary
+
 def process_single_pdf(
     pdf_filename,
     folder_path="/Users/june/Downloads/docling",
     extract_tables=True,     # DEFAULT TRUE
     extract_images=True,     # DEFAULT TRUE  
-    force_full_page_ocr=True, # RENAMED FROM use_ocr - controls OCR intensity
-    ocr_engine="rapidocr"
+    force_full_page_ocr=True, # RENAMED FROM use_ocr - controls OCR intensity (True / False / "auto")
+    ocr_engine="rapidocr",
+    progress_callback=None,
+    cancel_check=None,
+    shards=1,
+    image_format=None,
+    images_scale=2.0,
+    lazy_images=False,
+    export_json=False,
+    profile=False,
+    mode="full"
 ):
     """
     Process a single PDF with specific settings (FOR FASTAPI)
@@ -331,64 +1319,366 @@ def process_single_pdf(
         folder_path: Folder containing the PDF
         extract_tables: Whether to extract tables (default: True)
         extract_images: Whether to extract images (default: True)
-        force_full_page_ocr: Whether to force OCR on all pages vs selective OCR (default: True)
+        force_full_page_ocr: Whether to force OCR on all pages vs selective OCR (default: True).
+            "auto" checks each page's text layer and forces OCR only where it's missing or garbled
+            (per-page decisions are returned in result['ocr_pages'])
         ocr_engine: Which OCR engine to use (default: "rapidocr")
+        progress_callback: Optional callable(stage, state) for PROCESSING_STAGES progress
+        cancel_check: Optional callable() -> bool; raises ConversionCancelled between stages when True
+        shards: Split the PDF into this many page ranges and convert them in parallel processes (default: 1)
+        image_format: "png", "webp" or "jpeg" for extracted images (default: PDF_IMAGE_FORMAT)
+        images_scale: Image resolution, 1.0 = 72 DPI (default: 2.0 = 144 DPI)
+        lazy_images: Record image positions in a manifest instead of writing the images;
+            render_lazy_image produces each one when it's first requested (default: False)
+        export_json: Also save the docling document as lossless JSON (default: False)
+        profile: Save a cProfile trace of this conversion as <stem>_profile.prof in the
+            output folder, returned in result['profile_file'] (default: False)
+        mode: "full" runs docling's layout / table / OCR models; "fast" reads markdown from the
+            PDF text layer only (no tables or images) and falls back to "full" when a page has
+            no usable text layer - result['mode'] says which ran (default: "full")
     
-    Note: OCR is ALWAYS enabled - this is a PDF processing service!
+    Note: OCR is always enabled in full mode - this is a PDF processing service!
     """
     
+    if mode not in PROCESSING_MODES:
+        raise ValueError(f"Unknown mode: {mode} (use {', '.join(PROCESSING_MODES)})")
+    
     pdf_path = Path(folder_path) / pdf_filename
     
     if not pdf_path.exists():
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
     
     # Create output folder
-    pdf_stem = pdf_path.stem
-    force_suffix = "force_true" if force_full_page_ocr else "force_false"
-    output_folder = Path(folder_path) / f"{pdf_stem}_{ocr_engine}_{force_suffix}"
+    output_folder = Path(folder_path) / result_folder_name(pdf_path.stem, ocr_engine, force_full_page_ocr, mode)
     output_folder.mkdir(parents=True, exist_ok=True)
+    # Files linked in by a result cache hit are replaced, not rewritten in place
+    detach_links(output_folder)
     
-    print(f"🚀 Processing Single PDF")
-    print(f"📄 File: {pdf_filename}")
-    print(f"📊 Tables: {'✅' if extract_tables else '❌'}")
-    print(f"🖼️  Images: {'✅' if extract_images else '❌'}")
-    print(f"🔍 OCR Engine: {ocr_engine} (always enabled)")
-    print(f"⚡ Force Full Page OCR: {force_full_page_ocr}")
-    print(f"📁 Output: {output_folder}")
-    print("="*60)
-    
-    start_time = time.time()
+    options = {
+        "ocr_engine": ocr_engine,
+        "force_full_page_ocr": force_full_page_ocr,
+        "extract_tables": extract_tables,
+        "extract_images": extract_images,
+        "shards": shards,
+        "mode": mode
+    }
     
-    try:
-        result = _process_pdf_with_engine(
-            pdf_path, 
-            output_folder, 
-            ocr_engine, 
-            force_full_page_ocr,
-            extract_tables,
-            extract_images
-        )
+    # Every record logged for this conversion (here or deeper down) carries the file_id
+    with log_context(file_id=pdf_path.stem):
+        logger.info("Processing started", extra={"options": options, "output_folder": str(output_folder)})
+        
+        start_time = time.time()
+        profiler = cProfile.Profile() if profile else None
         
-        duration = time.time() - start_time
+        try:
+            if profiler is not None:
+                profiler.enable()
+            process = _process_pdf_fast if mode == "fast" else _process_pdf_with_engine
+            result = process(
+                pdf_path, 
+                output_folder, 
+                ocr_engine, 
+                force_full_page_ocr,
+                extract_tables,
+                extract_images,
+                progress_callback=progress_callback,
+                cancel_check=cancel_check,
+                shards=shards,
+                image_format=image_format,
+                images_scale=images_scale,
+                lazy_images=lazy_images,
+                export_json=export_json
+            )
+            # A fast-mode fallback wrote to the full-mode folder
+            result.setdefault('output_folder', output_folder)
         
-        # Enhanced output
-        output_parts = [f"{duration:.1f}s"]
-        if extract_tables:
-            tables_count = result.get('tables', 0)
-            output_parts.append(f"{tables_count} tables")
-        if extract_images:
-            images_count = result.get('images', 0)
-            output_parts.append(f"{images_count} images")
+            if profiler is not None:
+                # Covers this thread only - export pool and shard process work shows up as waits
+                profiler.disable()
+                profile_file = result['output_folder'] / f"{pdf_path.stem}_profile.prof"
+                profiler.dump_stats(str(profile_file))
+                result['profile_file'] = profile_file
         
-        print(f"\n✅ SUCCESS: {' - '.join(output_parts)}")
-        print(f"📁 Results saved in: {output_folder}")
+            logger.info("Processing finished", extra={
+                "seconds": round(time.time() - start_time, 3),
+                "pages": result.get('pages'),
+                "tables": result.get('tables', 0),
+                "images": result.get('images', 0)
+            })
+            return result
+        
+        except Exception:
+            logger.error("Processing failed", exc_info=True, extra={"seconds": round(time.time() - start_time, 3)})
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+# ================== PER-PAGE STREAMING ==================
+
+# Pages converted per docling call when streaming - smaller chunks reach the client sooner,
+# larger ones amortize per-call overhead
+STREAM_PAGES_PER_CHUNK = int(os.environ.get("PDF_STREAM_PAGES_PER_CHUNK", "4"))
+
+def _chunk_segments(segments, pages_per_chunk):
+    """Split ((start, end), force) segments into runs of at most pages_per_chunk pages"""
+    chunks = []
+    for (start, end), force in segments:
+        for chunk_start in range(start, end + 1, pages_per_chunk):
+            chunks.append(((chunk_start, min(end, chunk_start + pages_per_chunk - 1)), force))
+    return chunks
+
+def _page_records(document, page_range, counters, extract_tables, extract_images):
+    """
+    One record per page of a converted chunk: its markdown, tables (CSV + HTML) and image
+    references. `counters` carries table/image numbering across chunks, matching the
+    artifact names _export_documents gives the same items.
+    """
+    from docling_core.types.doc import PictureItem, TableItem
+    
+    records = {
+        page_no: {"page": page_no, "markdown": "", "tables": [], "images": []}
+        for page_no in range(page_range[0], page_range[1] + 1)
+    }
+    
+    for element, _level in document.iterate_items():
+        page_no = _page_no(element)
+        record = records.get(page_no)
+        
+        if isinstance(element, TableItem):
+            if extract_tables:
+                counters["tables"] += 1
+                if record is not None:
+                    record["tables"].append({
+                        "name": f"table-{counters['tables']}",
+                        "csv": element.export_to_dataframe().to_csv(index=False),
+                        "html": element.export_to_html(doc=document)
+                    })
+            if extract_images:
+                counters["table_images"] += 1
+                if record is not None:
+                    record["images"].append(_image_reference(f"table-image-{counters['table_images']}", "table", element, document))
+        
+        if isinstance(element, PictureItem) and extract_images:
+            counters["pictures"] += 1
+            if record is not None:
+                record["images"].append(_image_reference(f"picture-{counters['pictures']}", "picture", element, document))
+    
+    for page_no, record in records.items():
+        record["markdown"] = document.export_to_markdown(page_no=page_no)
+    return list(records.values())
+
+def _image_reference(name, kind, element, document):
+    entries = []
+    _add_manifest_entry(entries, name, kind, element, document)
+    return entries[0] if entries else {"name": name, "kind": kind, "page": None, "bbox": None}
+
+def process_pdf_streaming(
+    pdf_filename,
+    folder_path,
+    extract_tables=True,
+    extract_images=True,
+    force_full_page_ocr=True,
+    ocr_engine="rapidocr",
+    on_page=None,
+    cancel_check=None,
+    pages_per_chunk=STREAM_PAGES_PER_CHUNK,
+    image_format=None,
+    images_scale=2.0,
+    lazy_images=False,
+    export_json=False
+):
+    """
+    Process a single PDF a few pages at a time, reporting each page as soon as its chunk is
+    converted (FOR FASTAPI streaming)
+    
+    Args:
+        on_page: Optional callable, called with one record per page in page order:
+            {"page", "markdown", "tables": [{"name", "csv", "html"}], "images": [{"name", "kind", "page", "bbox"}]}
+        cancel_check: Optional callable() -> bool; raises ConversionCancelled between chunks when True
+        pages_per_chunk: Pages per docling call (default: PDF_STREAM_PAGES_PER_CHUNK)
+        Other options: As for process_single_pdf
+    
+    Once every page is out, the full result folder is written as by process_single_pdf, and
+    the same result dict is returned.
+    """
+    
+    pdf_path = Path(folder_path) / pdf_filename
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    
+    output_folder = Path(folder_path) / result_folder_name(pdf_path.stem, ocr_engine, force_full_page_ocr)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    detach_links(output_folder)
+    
+    ocr_pages = None
+    if force_full_page_ocr == "auto":
+        ocr_pages = analyze_text_layer(pdf_path)
+        segments = _plan_ocr_segments(ocr_pages)
+    else:
+        segments = [((1, get_page_count(pdf_path)), force_full_page_ocr)]
+    chunks = _chunk_segments(segments, max(1, int(pages_per_chunk)))
+    
+    logger.info("Streaming started", extra={
+        "file_id": pdf_path.stem, "pages": segments[-1][0][1], "chunks": len(chunks), "ocr_engine": ocr_engine
+    })
+    start_time = time.time()
+    
+    render_images = extract_images and not lazy_images
+    counters = {"tables": 0, "table_images": 0, "pictures": 0}
+    documents = []
+    timer = StageTimer()
+    with log_context(file_id=pdf_path.stem), timer.activate(), ExitStack() as cleanup:
+        # A stream that was cancelled or cut off resumes from the chunks it already converted
+        checkpoints = None
+        if len(chunks) > 1 and checkpointing_enabled(segments[-1][0][1]):
+            checkpoints = cleanup.enter_context(PageCheckpoints(
+                output_folder, pdf_path, ocr_engine, force_full_page_ocr, extract_tables, render_images, images_scale
+            ))
+        for page_range, force in chunks:
+            document = checkpoints.load(page_range, force) if checkpoints is not None else None
+            if document is None:
+                if cancel_check is not None and cancel_check():
+                    raise ConversionCancelled(f"Cancelled before pages {page_range[0]}-{page_range[1]}")
+                with timer.stage("convert"):
+                    document = _convert_document(
+                        pdf_path, ocr_engine, force, extract_tables, render_images, page_range, images_scale
+                    )
+                if checkpoints is not None:
+                    checkpoints.save(page_range, force, document)
+            documents.append(document)
+            with timer.stage("page_events"):
+                for record in _page_records(document, page_range, counters, extract_tables, extract_images):
+                    if on_page is not None:
+                        on_page(record)
+            item_logger.debug("Streamed pages %s-%s", page_range[0], page_range[1])
         
+        result = _export_documents(
+            documents, output_folder, pdf_path.stem, ocr_engine, force_full_page_ocr, extract_tables, extract_images,
+            image_format=image_format, images_scale=images_scale, lazy_images=lazy_images, export_json=export_json
+        )
+        if checkpoints is not None:
+            checkpoints.clear()
+    result['output_folder'] = output_folder
+    result['timings'] = timer.rounded()
+    if ocr_pages is not None:
+        result['ocr_pages'] = ocr_pages
+    
+    logger.info("Streaming finished", extra={"file_id": pdf_path.stem, "seconds": round(time.time() - start_time, 3)})
+    return result
+
+# Documents docling converts at the same time within one batch (applied when a converter is built)
+BATCH_CONCURRENCY = max(1, int(os.environ.get("PDF_BATCH_CONCURRENCY", "2")))
+
+def _conversion_error(conv_res):
+    messages = [error.error_message for error in (conv_res.errors or [])]
+    return "; ".join(messages) or f"Conversion {conv_res.status}"
+
+def process_pdf_batch(
+    pdf_filenames,
+    folder_path,
+    extract_tables=True,
+    extract_images=True,
+    force_full_page_ocr=True,
+    ocr_engine="rapidocr",
+    on_document=None,
+    image_format=None,
+    images_scale=2.0,
+    lazy_images=False,
+    export_json=False
+):
+    """
+    Process many PDFs with one set of options (FOR FASTAPI batch requests)
+    
+    Documents go through docling's convert_all on a pooled converter, PDF_BATCH_CONCURRENCY at
+    a time, so models are loaded once for the whole batch. A document that fails doesn't stop
+    the others.
+    
+    Args:
+        pdf_filenames: Names of PDF files in folder_path (or absolute paths); each document's
+            results go next to its PDF
+        on_document: Optional callable, called as each document finishes with a
+            (pdf_filename, result, error) tuple - result is None when error is set
+        image_format / images_scale / lazy_images / export_json: As for process_single_pdf
+    
+    Returns: {"succeeded": n, "failed": n}
+    """
+    
+    counts = {"succeeded": 0, "failed": 0}
+    
+    def finish(pdf_filename, result, error):
+        counts["failed" if error else "succeeded"] += 1
+        if error:
+            logger.warning("Batch document failed", extra={"file_id": Path(pdf_filename).stem, "error": str(error)})
+        if on_document is not None:
+            on_document((pdf_filename, result, error))
+    
+    def export(pdf_path, documents):
+        output_folder = pdf_path.parent / result_folder_name(pdf_path.stem, ocr_engine, force_full_page_ocr)
+        output_folder.mkdir(parents=True, exist_ok=True)
+        detach_links(output_folder)
+        # Documents share one convert_all, so only their export stages are timed per document
+        timer = StageTimer()
+        with log_context(file_id=pdf_path.stem), timer.activate():
+            result = _export_documents(
+                documents, output_folder, pdf_path.stem, ocr_engine, force_full_page_ocr, extract_tables, extract_images,
+                image_format=image_format, images_scale=images_scale, lazy_images=lazy_images,
+                export_json=export_json
+            )
+        result['output_folder'] = output_folder
+        result['timings'] = timer.rounded()
         return result
+    
+    pdf_paths = [Path(folder_path) / name for name in pdf_filenames]
+    render_images = extract_images and not lazy_images
+    logger.info("Batch started", extra={
+        "documents": len(pdf_paths), "ocr_engine": ocr_engine, "force_full_page_ocr": force_full_page_ocr
+    })
+    start_time = time.time()
+    
+    if force_full_page_ocr == "auto":
+        # Per-page OCR decisions differ per document, so these can't share one convert_all call
+        for pdf_path in pdf_paths:
+            try:
+                documents, ocr_pages = _convert_adaptive(
+                    pdf_path, ocr_engine, extract_tables, render_images, images_scale=images_scale
+                )
+                result = export(pdf_path, documents)
+                result['ocr_pages'] = ocr_pages
+                finish(pdf_path.name, result, None)
+            except Exception as e:
+                finish(pdf_path.name, None, str(e))
+    else:
+        from docling.datamodel.base_models import ConversionStatus
         
-    except Exception as e:
-        duration = time.time() - start_time
-        print(f"\n❌ FAILED after {duration:.1f}s: {e}")
-        raise
+        # One slice of PDF_BATCH_CONCURRENCY documents per checkout: between slices the converter
+        # goes back to the pool, so interactive requests with the same settings aren't stuck
+        # behind a long bulk batch
+        for slice_start in range(0, len(pdf_paths), BATCH_CONCURRENCY):
+            slice_paths = pdf_paths[slice_start:slice_start + BATCH_CONCURRENCY]
+            conv_results = []
+            error = None
+            with checkout_converter(ocr_engine, force_full_page_ocr, extract_tables, render_images, images_scale) as doc_converter:
+                try:
+                    conv_results.extend(doc_converter.convert_all([str(path) for path in slice_paths], raises_on_error=False))
+                except Exception as e:
+                    error = str(e)
+            
+            # Exported after the converter is returned
+            for pdf_path, conv_res in zip(slice_paths, conv_results):
+                if conv_res.status not in (ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS):
+                    finish(pdf_path.name, None, _conversion_error(conv_res))
+                    continue
+                try:
+                    finish(pdf_path.name, export(pdf_path, [conv_res.document]), None)
+                except Exception as e:
+                    finish(pdf_path.name, None, str(e))
+            # The slice itself broke - report the documents it never got to
+            for pdf_path in slice_paths[len(conv_results):]:
+                finish(pdf_path.name, None, error or "Batch stopped before this document was converted")
+    
+    logger.info("Batch finished", extra={"seconds": round(time.time() - start_time, 3), **counts})
+    return counts
 
 # HOW TO USE FOR FASTAPI:
 
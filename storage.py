@@ -0,0 +1,360 @@
+# Upload Storage - sharded per-file directories with an index, TTL expiry and a disk quota
+# Each upload gets root/files/<id[:2]>/<id>/ holding the PDF, its hash and every result folder
+# for it, so looking up a file's results never scans other uploads. A small SQLite index
+# tracks size and last access per file so the sweeper can expire and evict without walking
+# the whole tree.
+# With an ObjectStore backend (object_store.py) the local directories become a working copy:
+# uploads and results are mirrored to the store and fetched back by whichever replica needs them.
+
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from artifacts import file_sha256
+
+_FILE_ID = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access);
+CREATE TABLE IF NOT EXISTS synced (
+    file_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (file_id, path)
+);
+CREATE TABLE IF NOT EXISTS pins (
+    file_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    leased_until REAL NOT NULL,
+    PRIMARY KEY (file_id, owner)
+);
+"""
+
+def _dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+def _is_transient(relative):
+    """Per-host working files - page checkpoints, locks, partial downloads - never go to the backend"""
+    parts = relative.split("/")
+    return any(part.startswith(".") for part in parts) or parts[-1].endswith(".part")
+
+class UploadStorage:
+    """
+    Uploaded PDFs and their results, one directory per file_id.
+
+    Args:
+        root: Storage directory (files live under root/files/)
+        ttl_seconds: Delete files not accessed for this long (0 = never)
+        quota_bytes: Delete least-recently-accessed files above this total size (0 = unlimited)
+        backend: Optional ObjectStore that holds the authoritative copy of every file; TTL and
+            quota then only evict local copies (expire objects with the store's own lifecycle rules)
+        results_ttl: Seconds the local copy of a file's results counts as current after a
+            fetch(results=True), before the backend is listed again for results other replicas wrote
+        pin_lease_seconds: Pins are kept in the index, so every process sharing root sees them;
+            each sweep renews this process's pins for this long, and pins of a process that
+            died without unpinning lapse after it
+    """
+
+    def __init__(self, root, ttl_seconds=0, quota_bytes=0, backend=None, results_ttl=30.0, pin_lease_seconds=900.0):
+        self.root = Path(root)
+        self.files_root = self.root / "files"
+        self.files_root.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(self.root / "storage.db")
+        self.ttl_seconds = float(ttl_seconds)
+        self.quota_bytes = int(quota_bytes)
+        self.backend = backend
+        self.results_ttl = float(results_ttl)
+        self.pin_lease_seconds = float(pin_lease_seconds)
+
+        # file_id -> time.monotonic() of its last fetch(results=True), so artifact reads don't
+        # list the bucket on every request
+        self._results_fetched = {}
+
+        # Pins of this process: (file_id, owner) rows counting the conversions using the file
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+
+        self.expired = 0
+        self.evicted = 0
+        self.freed_bytes = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ---------- paths ----------
+
+    @staticmethod
+    def valid_file_id(file_id):
+        return bool(_FILE_ID.fullmatch(file_id or ""))
+
+    def file_dir(self, file_id):
+        """Directory holding one upload and all of its results"""
+        if not self.valid_file_id(file_id):
+            raise ValueError(f"Invalid file_id: {file_id!r}")
+        return self.files_root / file_id[:2] / file_id
+
+    def pdf_path(self, file_id):
+        return self.file_dir(file_id) / f"{file_id}.pdf"
+
+    def hash_path(self, file_id):
+        return self.file_dir(file_id) / f"{file_id}.sha256"
+
+    def exists(self, file_id):
+        return self.valid_file_id(file_id) and self.pdf_path(file_id).exists()
+
+    def _key(self, file_id, relative=""):
+        return f"files/{file_id[:2]}/{file_id}/{relative}"
+
+    def result_folders(self, file_id):
+        """All result folders (one per engine / force setting) for an uploaded file"""
+        if not self.valid_file_id(file_id) or not self.file_dir(file_id).is_dir():
+            return []
+        return sorted(p for p in self.file_dir(file_id).iterdir() if p.is_dir() and p.name.startswith(f"{file_id}_"))
+
+    # ---------- index ----------
+
+    def register(self, file_id):
+        """Add a newly stored upload to the index (and the backend)"""
+        if self.backend is not None:
+            for path in (self.pdf_path(file_id), self.hash_path(file_id)):
+                if path.exists():
+                    self.backend.put_file(self._key(file_id, path.name), path)
+                    self._record_synced(file_id, path.name, path)
+        now = time.time()
+        size_bytes = _dir_size(self.file_dir(file_id))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (file_id, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (file_id, size_bytes, now, now)
+            )
+
+    def touch(self, file_id, update_size=False):
+        """Mark a file as used now (optionally re-measuring it, e.g. after new results were written)"""
+        if not self.exists(file_id):
+            return
+        now = time.time()
+        with self._connect() as conn:
+            if update_size:
+                size_bytes = _dir_size(self.file_dir(file_id))
+                conn.execute(
+                    "INSERT INTO files (file_id, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(file_id) DO UPDATE SET size_bytes = excluded.size_bytes, last_access = excluded.last_access",
+                    (file_id, size_bytes, now, now)
+                )
+            else:
+                conn.execute("UPDATE files SET last_access = ? WHERE file_id = ?", (now, file_id))
+
+    # ---------- backend ----------
+
+    def fetch(self, file_id, results=False):
+        """
+        Make sure the upload (and with results=True, every result file) is available locally,
+        downloading from the backend what's missing. Returns whether the upload exists.
+        """
+        if not self.valid_file_id(file_id):
+            return False
+        if self.backend is None or (self.exists(file_id) and not results):
+            return self.exists(file_id)
+        with self._lock:
+            fetched_at = self._results_fetched.get(file_id)
+        if results and fetched_at is not None and time.monotonic() - fetched_at < self.results_ttl and self.exists(file_id):
+            return True
+
+        listed_at = time.monotonic()
+        file_dir = self.file_dir(file_id)
+        downloaded = False
+        for key, size in self.backend.list(self._key(file_id)).items():
+            relative = key[len(self._key(file_id)):]
+            if (not results and "/" in relative) or _is_transient(relative):
+                continue
+            path = file_dir / relative
+            if path.is_file() and path.stat().st_size == size:
+                continue
+            try:
+                self.backend.get_file(key, path)
+            except KeyError:
+                continue
+            self._record_synced(file_id, relative, path)
+            downloaded = True
+        if downloaded:
+            self.touch(file_id, update_size=True)
+        if results:
+            with self._lock:
+                self._results_fetched[file_id] = listed_at
+        return self.exists(file_id)
+
+    def save_results(self, file_id):
+        """Record new results for file_id: re-measure it and upload new files to the backend"""
+        self.touch(file_id, update_size=True)
+        if self.backend is None or not self.exists(file_id):
+            return
+        file_dir = self.file_dir(file_id)
+        stored = self.backend.list(self._key(file_id))
+        with self._connect() as conn:
+            synced = {
+                row["path"]: row["sha256"]
+                for row in conn.execute("SELECT path, sha256 FROM synced WHERE file_id = ?", (file_id,))
+            }
+        for path in file_dir.rglob("*"):
+            relative = path.relative_to(file_dir).as_posix()
+            if not path.is_file() or _is_transient(relative):
+                continue
+            key = self._key(file_id, relative)
+            # A re-conversion can rewrite a file with different content of the same size, so
+            # compare against the hash of what was last uploaded (or downloaded), not the size
+            if stored.get(key) == path.stat().st_size and synced.get(relative) == file_sha256(path):
+                continue
+            self.backend.put_file(key, path)
+            self._record_synced(file_id, relative, path)
+
+    def _record_synced(self, file_id, relative, path):
+        """Remember the content the backend holds for one file"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO synced (file_id, path, size_bytes, sha256) VALUES (?, ?, ?, ?)",
+                (file_id, relative, path.stat().st_size, file_sha256(path))
+            )
+
+    # ---------- pins ----------
+
+    def pin(self, file_id):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pins (file_id, owner, count, leased_until) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(file_id, owner) DO UPDATE SET count = count + 1, leased_until = excluded.leased_until",
+                (file_id, self._owner, time.time() + self.pin_lease_seconds)
+            )
+
+    def unpin(self, file_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE pins SET count = count - 1 WHERE file_id = ? AND owner = ?", (file_id, self._owner))
+            conn.execute("DELETE FROM pins WHERE file_id = ? AND owner = ? AND count <= 0", (file_id, self._owner))
+
+    def renew_pins(self):
+        """Extend the lease of this process's pins (conversions can outlast one lease)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE pins SET leased_until = ? WHERE owner = ?", (time.time() + self.pin_lease_seconds, self._owner)
+            )
+
+    def _pinned(self, conn):
+        return {
+            row["file_id"]
+            for row in conn.execute("SELECT DISTINCT file_id FROM pins WHERE leased_until > ?", (time.time(),))
+        }
+
+    @contextmanager
+    def in_use(self, file_id):
+        """Keep the sweeper away from file_id for the duration of the block"""
+        self.pin(file_id)
+        try:
+            yield
+        finally:
+            self.unpin(file_id)
+
+    # ---------- cleanup ----------
+
+    def delete(self, file_id):
+        with self._lock:
+            self._results_fetched.pop(file_id, None)
+        shutil.rmtree(self.file_dir(file_id), ignore_errors=True)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM synced WHERE file_id = ?", (file_id,))
+
+    def sweep(self, keep=()):
+        """
+        Delete files not accessed within ttl_seconds, then least-recently-accessed files until
+        the total is under quota_bytes. Files pinned by any process and file_ids in `keep`
+        (e.g. queued jobs) are never deleted. Returns {"expired", "evicted", "freed_bytes"}.
+        """
+        self.renew_pins()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pins WHERE leased_until <= ?", (time.time(),))
+            rows = conn.execute("SELECT file_id, size_bytes, last_access FROM files ORDER BY last_access").fetchall()
+            protected = set(keep) | self._pinned(conn)
+
+        total_bytes = sum(row["size_bytes"] for row in rows)
+        now = time.time()
+        result = {"expired": 0, "evicted": 0, "freed_bytes": 0}
+
+        for row in rows:
+            if row["file_id"] in protected:
+                continue
+            expired = self.ttl_seconds and now - row["last_access"] > self.ttl_seconds
+            over_quota = self.quota_bytes and total_bytes > self.quota_bytes
+            if not expired and not over_quota:
+                continue
+            self.delete(row["file_id"])
+            total_bytes -= row["size_bytes"]
+            result["expired" if expired else "evicted"] += 1
+            result["freed_bytes"] += row["size_bytes"]
+
+        with self._lock:
+            self.expired += result["expired"]
+            self.evicted += result["evicted"]
+            self.freed_bytes += result["freed_bytes"]
+        return result
+
+    def migrate_flat_layout(self, legacy_dir):
+        """
+        Move uploads from the old flat layout (legacy_dir/<id>.pdf, <id>.sha256 and
+        <id>_<engine>_<force>/ result folders) into per-file directories. Returns the count moved.
+        """
+        legacy_dir = Path(legacy_dir)
+        moved = 0
+        for pdf_file in legacy_dir.glob("*.pdf"):
+            file_id = pdf_file.stem
+            if not self.valid_file_id(file_id):
+                continue
+            file_dir = self.file_dir(file_id)
+            file_dir.mkdir(parents=True, exist_ok=True)
+            for path in [pdf_file, legacy_dir / f"{file_id}.sha256", *legacy_dir.glob(f"{file_id}_*")]:
+                if path.exists():
+                    shutil.move(str(path), str(file_dir / path.name))
+            self.register(file_id)
+            moved += 1
+        return moved
+
+    def stats(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) AS files, COALESCE(SUM(size_bytes), 0) AS size_bytes FROM files").fetchone()
+            pinned = len(self._pinned(conn))
+        with self._lock:
+            return {
+                "backend": self.backend.name if self.backend is not None else "none",
+                "files": row["files"],
+                "size_mb": round(row["size_bytes"] / (1024 * 1024), 1),
+                "quota_mb": self.quota_bytes // (1024 * 1024),
+                "ttl_hours": round(self.ttl_seconds / 3600, 1),
+                "pinned": pinned,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "freed_mb": round(self.freed_bytes / (1024 * 1024), 1),
+            }
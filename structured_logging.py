@@ -0,0 +1,92 @@
+# Structured logging - JSON log records tagged with the file_id / job_id being worked on
+# Context is kept in contextvars, so concurrent requests (threads, asyncio tasks) each tag
+# their own records and nothing gets interleaved into one another's lines.
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+LOG_FORMAT = os.environ.get("PDF_LOG_FORMAT", "json").lower()  # "json" or "text"
+LOG_LEVEL = os.environ.get("PDF_LOG_LEVEL", "INFO").upper()
+# Per-table / per-image records are DEBUG on ITEMS_LOGGER - off unless asked for
+LOG_ITEMS = os.environ.get("PDF_LOG_ITEMS", "false").lower() in ("1", "true", "yes", "on")
+
+ITEMS_LOGGER = "pdf.items"
+
+_context = contextvars.ContextVar("pdf_log_context", default={})
+
+@contextmanager
+def log_context(**fields):
+    """Tag every record logged inside this block (on this thread / task) with fields"""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copy the current log_context fields onto each record"""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+# Attributes every LogRecord has - anything else was passed as extra= or by log_context
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, then context and extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the context fields appended as key=value"""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return line
+
+def configure_logging(log_format=None, level=None, log_items=None):
+    """
+    Route the root logger to stderr in LOG_FORMAT, with log_context tagging. Safe to call more
+    than once (e.g. in each worker process); the previous handler is replaced.
+    """
+    log_format = (log_format or LOG_FORMAT).lower()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(ContextFilter())
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if getattr(existing, "_pdf_structured", False):
+            root.removeHandler(existing)
+    handler._pdf_structured = True
+    root.addHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
+
+    items_enabled = LOG_ITEMS if log_items is None else log_items
+    logging.getLogger(ITEMS_LOGGER).setLevel(logging.DEBUG if items_enabled else logging.INFO)
@@ -0,0 +1,215 @@
+# Worker Pool - runs blocking PDF conversions off the event loop
+# Tasks wait in a bounded queue and are handed to a thread or process pool only when a
+# worker is free, so queue depth and wait time are known and overload is rejected early.
+# Which waiting task runs next is up to the scheduler (priority classes, per-client fair share).
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from model_server import ModelServerExecutor
+from scheduler import DEFAULT_PRIORITY, FairQueue
+
+class QueueFullError(Exception):
+    """Raised when the pool's queue is full - callers should retry after `retry_after` seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ClientQueueFullError(QueueFullError):
+    """Raised when one client already has its share of the queue - other clients can still submit"""
+
+class _Task:
+    def __init__(self, fn, args, kwargs, priority=DEFAULT_PRIORITY, client=None, cost=1.0):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.client = client
+        self.cost = cost
+        self.future = Future()
+        self.enqueued_at = time.time()
+        self.started_at = None
+
+class ConversionWorkerPool:
+    """
+    Bounded worker pool for blocking conversion work.
+
+    Args:
+        mode: "thread" (shares the in-process converter pool), "process" (one converter pool
+            per worker process, no GIL contention) or "server" (conversions run on a shared
+            model server process, see model_server.py)
+        max_workers: Conversions running at the same time (default: CPU count)
+        max_queue: Conversions allowed to wait for a worker before submit() rejects
+        max_queue_per_client: Conversions one client may have waiting (0 = no limit of its own)
+        initializer / initargs: Run once in every worker process (process mode only)
+        scheduler: FairQueue ordering waiting tasks (default: fair share with default weights)
+        server_socket: Model server Unix socket (server mode only)
+    """
+
+    def __init__(self, mode="thread", max_workers=None, max_queue=16, initializer=None, initargs=(),
+                 max_queue_per_client=0, scheduler=None, server_socket=None):
+        if mode not in ("thread", "process", "server"):
+            raise ValueError(f"Unsupported worker mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.max_queue = max(0, int(max_queue))
+        self.max_queue_per_client = max(0, int(max_queue_per_client))
+
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=initializer,
+                initargs=initargs
+            )
+        elif mode == "server":
+            self._executor = ModelServerExecutor(server_socket, self.max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="pdf-worker"
+            )
+
+        self._manager = None
+        self._pending = scheduler if scheduler is not None else FairQueue()
+        self._active = 0
+        self._lock = threading.RLock()
+
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) in the default priority class; returns a concurrent.futures.Future"""
+        return self.schedule(fn, args, kwargs)
+
+    def schedule(self, fn, args=(), kwargs=None, priority=DEFAULT_PRIORITY, client=None, cost=1.0):
+        """
+        Queue fn(*args, **kwargs) for `client` in a priority class, with an estimated cost
+        (see scheduler.estimate_cost); returns a concurrent.futures.Future
+        """
+        with self._lock:
+            if self._active >= self.max_workers:
+                if len(self._pending) >= self.max_queue:
+                    self.rejected += 1
+                    raise QueueFullError(
+                        f"Conversion queue is full ({len(self._pending)} waiting, {self._active} running)",
+                        retry_after=self._retry_after_locked()
+                    )
+                if self.max_queue_per_client and self._pending.pending_for(client) >= self.max_queue_per_client:
+                    self.rejected += 1
+                    raise ClientQueueFullError(
+                        f"Too many conversions waiting for this client ({self._pending.pending_for(client)})",
+                        retry_after=self._retry_after_locked()
+                    )
+
+            task = _Task(fn, args, kwargs or {}, priority, client, cost)
+            self._pending.push(task, priority, client, cost)
+            self.submitted += 1
+            self._dispatch_locked()
+
+        return task.future
+
+    def make_queue(self):
+        """
+        Queue that tasks on this pool can put() results on as they go (e.g. per-document
+        batch results): a plain queue.Queue for threads, a manager proxy for processes (held
+        by the model server in server mode).
+        """
+        if self.mode == "thread":
+            return queue.Queue()
+        if self.mode == "server":
+            return self._executor.make_queue()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            return self._manager.Queue()
+
+    def _dispatch_locked(self):
+        while self._active < self.max_workers and self._pending:
+            task = self._pending.pop()[0]
+
+            # Skip tasks that were cancelled while they were still queued
+            if not task.future.set_running_or_notify_cancel():
+                continue
+
+            task.started_at = time.time()
+            self.started += 1
+            wait_seconds = task.started_at - task.enqueued_at
+            self._pending.record_wait(task.priority, wait_seconds)
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+            self._active += 1
+
+            try:
+                inner = self._executor.submit(task.fn, *task.args, **task.kwargs)
+            except Exception as e:
+                self._active -= 1
+                self.failed += 1
+                task.future.set_exception(e)
+                continue
+
+            inner.add_done_callback(lambda inner, task=task: self._on_done(task, inner))
+
+    def _on_done(self, task, inner):
+        with self._lock:
+            self._active -= 1
+            self.run_seconds_total += time.time() - task.started_at
+            if inner.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._dispatch_locked()
+
+        if inner.exception() is None:
+            task.future.set_result(inner.result())
+        else:
+            task.future.set_exception(inner.exception())
+
+    def _retry_after_locked(self):
+        # Rough time until a queue slot frees up, based on average run time so far
+        finished = self.completed + self.failed
+        avg_run = self.run_seconds_total / finished if finished else 30.0
+        waves = (len(self._pending) + self._active) / self.max_workers
+        return max(1, int(round(avg_run * waves)))
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._pending),
+                "active_workers": self._active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "wait_seconds_avg": round(self.wait_seconds_total / self.started, 3) if self.started else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+                "run_seconds_avg": round(self.run_seconds_total / finished, 3) if finished else 0.0,
+                "scheduler": self._pending.stats(),
+            }
+
+    def model_server_stats(self):
+        """The model server's own counters and converter pool (server mode only, else None)"""
+        return self._executor.stats() if self.mode == "server" else None
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for task in self._pending.drain():
+                task.future.cancel()
+        self._executor.shutdown(wait=wait)
+        if self._manager is not None:
+            self._manager.shutdown()